@@ -0,0 +1,115 @@
+"""
+Import Time Benchmark
+
+This script measures how long the modules loaded by screen worker processes
+take to import, using the interpreter's ``-X importtime`` report:
+
+- Every module is imported in a fresh interpreter, several times, and the
+  median cumulative import time is compared with its target
+- Modules that must not be pulled in at import time (plotting, sympy, and
+  NumPy and pandas on the constraint solver path) are reported as violations
+- The exit status is non-zero when a target is missed, so the check can run
+  in CI
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5]
+
+Functions:
+    measure_import: Cumulative import time and imported modules of one module
+    check_imports: Compare every module of IMPORT_TARGETS with its target
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# module: (median cumulative import time target in ms, modules it must not import)
+IMPORT_TARGETS = {
+    'src.models.ERBB_Boolean': (50, ['matplotlib', 'networkx', 'sympy']),
+    'src.models.compiled': (100, ['matplotlib', 'networkx', 'sympy', 'numpy', 'pandas']),
+    'src.analysis.knockout_analysis': (300, ['matplotlib', 'sympy', 'numpy', 'pandas']),
+}
+
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter and parse its -X importtime report
+
+    Parameters:
+    -----------
+    module : str
+        Dotted name of the module
+
+    Returns:
+    --------
+    tuple : (cumulative import time of the module in ms, set of imported module names)
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative, imported = None, set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        if not total.strip().isdigit():
+            continue  # header line
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, imported
+
+
+def check_imports(repeat=5):
+    """
+    Measure every module of IMPORT_TARGETS and compare it with its target
+
+    Parameters:
+    -----------
+    repeat : int
+        Fresh interpreters per module; the median time is reported
+
+    Returns:
+    --------
+    list : One dict per module with the median time, target and forbidden imports
+    """
+    results = []
+    for module, (target, forbidden) in IMPORT_TARGETS.items():
+        times, imported = [], set()
+        for _ in range(repeat):
+            elapsed, names = measure_import(module)
+            times.append(elapsed)
+            imported |= names
+        median = statistics.median(times)
+        violations = sorted(m for m in forbidden if m in imported)
+        results.append({
+            'module': module,
+            'median_ms': median,
+            'target_ms': target,
+            'forbidden_imports': violations,
+            'ok': median <= target and not violations
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of the worker-side modules')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module')
+    args = parser.parse_args()
+
+    results = check_imports(args.repeat)
+    for r in results:
+        status = 'ok' if r['ok'] else 'FAILED'
+        extra = f"  imports {', '.join(r['forbidden_imports'])}" if r['forbidden_imports'] else ''
+        print(f"{r['module']:<36} {r['median_ms']:8.1f} ms  (target {r['target_ms']} ms)  {status}{extra}")
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark Suite
+
+This script times the main analyses on the two ERBB models and on synthetic
+random networks of increasing size, and compares the results with a stored
+baseline so that regressions show up locally:
+
+- Stable states (constraint solver with and without network reduction, and
+  enumeration for small networks)
+- Knockout screens, exact basins (small networks only), biomarker and drug
+  target scoring, SBML-qual loading
+- Every case reports the median wall time, the peak memory traced by
+  tracemalloc (in a separate run, so tracing does not slow the timed runs) and
+  the number of states produced or visited per second where that is defined
+
+Usage:
+    python benchmarks/run_benchmarks.py [--quick] [--sizes 20 100 500] [--in-degree 2]
+        [--filter stable] [--repeat 3] [--save-baseline] [--check] [--output results.csv]
+        [--instrument spans.json] [--profile]
+
+Functions:
+    benchmark_models: The ERBB models and the synthetic networks to run on
+    benchmark_cases: The benchmark cases of one model
+    measure: Wall time and peak memory of one case
+    run_suite: Run every case and compare with the baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+import pandas as pd
+
+from src.models.model_file import load_model_file
+from src.models.random_network import random_network
+from src.models.sbml import read_sbml_qual, write_sbml_qual
+from src.analysis.fixed_points import fixed_points
+from src.analysis.knockout_analysis import screen_perturbations
+from src.analysis.state_space import compute_basins
+from src.analysis.biomarker_analysis import analyze_biomarkers
+from src.analysis.drug_targets import identify_drug_targets
+from src.utils import instrumentation
+
+DEFAULT_BASELINE = os.path.join(PROJECT_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_SIZES = [20, 50, 100, 200, 500]
+QUICK_SIZES = [20, 100]
+
+# Largest networks whose whole state space is enumerated
+MAX_ENUMERATED_NODES = 20
+
+# Knockouts per screen, and perturbations pooled by the biomarker analysis
+MAX_SCREEN_KNOCKOUTS = 50
+MAX_BIOMARKER_PERTURBATIONS = 20
+
+# A case is a regression when it is this much slower than its baseline
+DEFAULT_TOLERANCE = 1.5
+
+
+def benchmark_models(sizes, in_degree=2, degree_distribution='fixed', seed=0):
+    """
+    The models to benchmark: the two ERBB models and one random network per size
+
+    Returns:
+    --------
+    dict : {name: (CompiledModel, cell cycle markers)}
+    """
+    models = {}
+    for name in ('original', 'refined'):
+        path = os.path.join(PROJECT_DIR, 'data', 'models', f'ERBB_{name}_model.cbn')
+        models[f'erbb_{name}'] = (load_model_file(path), ['CDK2', 'CDK4', 'pRB'])
+    for n in sizes:
+        compiled = random_network(n, in_degree, seed=seed + n, degree_distribution=degree_distribution)
+        models[f'random_{n}_k{in_degree:g}'] = (compiled, list(compiled.nodes[-3:]))
+    return models
+
+
+def benchmark_cases(compiled, markers, workdir):
+    """
+    The benchmark cases of one model
+
+    Every case is (name, function, states) where ``states`` maps the result of
+    the function to the number of states produced or visited, or is None.
+    """
+    knockouts = list(compiled.nodes[:MAX_SCREEN_KNOCKOUTS])
+    sbml_path = os.path.join(workdir, f'model_{compiled.n}_{id(compiled)}.sbml')
+    write_sbml_qual(compiled, sbml_path)
+
+    cases = [
+        ('stable_states_sat', lambda: fixed_points(compiled, backend='sat'), len),
+        ('stable_states_sat_reduced', lambda: fixed_points(compiled, backend='sat', reduce=True), len),
+        ('knockout_screen', lambda: screen_perturbations(compiled, knockouts, markers, processes=1),
+         lambda r: int(r['dataframe']['stable_states_count'].sum())),
+        ('biomarkers', lambda: analyze_biomarkers(compiled, knockouts[:MAX_BIOMARKER_PERTURBATIONS], markers),
+         lambda r: r['state_count']),
+        ('drug_targets', lambda: identify_drug_targets(compiled), None),
+        ('sbml_load', lambda: read_sbml_qual(sbml_path), None),
+    ]
+    if compiled.n <= MAX_ENUMERATED_NODES:
+        space = 1 << compiled.n
+        cases.append(('stable_states_enumerate',
+                      lambda: fixed_points(compiled, backend='enumerate', reduce=False), lambda r: space))
+        cases.append(('basins_exact', lambda: compute_basins(compiled), lambda r: space))
+    return cases
+
+
+def measure(func, repeat=3):
+    """
+    Median wall time and traced peak memory of a function
+
+    Returns:
+    --------
+    tuple : (median seconds, peak bytes, result of the last run)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak, result
+
+
+def _load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('cases', {})
+
+
+def run_suite(sizes, in_degree=2, degree_distribution='fixed', repeat=3, name_filter=None,
+              baseline_path=DEFAULT_BASELINE, tolerance=DEFAULT_TOLERANCE):
+    """
+    Run every benchmark case and compare it with the baseline
+
+    Returns:
+    --------
+    pandas DataFrame : One row per case with wall_s, peak_mb, states,
+        states_per_s, baseline_s, ratio and regression
+    """
+    baseline = _load_baseline(baseline_path)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for model_name, (compiled, markers) in benchmark_models(sizes, in_degree, degree_distribution).items():
+            for case_name, func, count in benchmark_cases(compiled, markers, workdir):
+                key = f'{model_name}/{case_name}'
+                if name_filter and name_filter not in key:
+                    continue
+                wall, peak, result = measure(func, repeat)
+                states = count(result) if count else None
+                reference = baseline.get(key, {}).get('wall_s')
+                ratio = wall / reference if reference else None
+                rows.append({
+                    'case': key,
+                    'nodes': compiled.n,
+                    'wall_s': wall,
+                    'peak_mb': peak / 2 ** 20,
+                    'states': states,
+                    'states_per_s': states / wall if states is not None and wall > 0 else None,
+                    'baseline_s': reference,
+                    'ratio': ratio,
+                    'regression': ratio is not None and ratio > tolerance
+                })
+                print(f"{key:<48} {wall * 1e3:10.2f} ms  {peak / 2 ** 20:8.2f} MB"
+                      + (f"  x{ratio:.2f} of baseline" if ratio is not None else ''))
+    return pd.DataFrame(rows)
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    """Store the wall time, peak memory and throughput of every case as the new baseline"""
+    payload = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cases': {
+            row['case']: {'wall_s': row['wall_s'], 'peak_mb': row['peak_mb'], 'states_per_s': row['states_per_s']}
+            for row in results.to_dict('records')
+        }
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Baseline saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analyses on the ERBB and synthetic networks')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Sizes of the random networks')
+    parser.add_argument('--quick', action='store_true', help=f'Only sizes {QUICK_SIZES}, one timed run')
+    parser.add_argument('--in-degree', type=float, default=2, help='Regulators per node of the random networks')
+    parser.add_argument('--poisson', action='store_true', help='Poisson distributed in-degree')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (median reported)')
+    parser.add_argument('--filter', help='Only run cases whose name contains this text')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Slowdown ratio above which a case is a regression')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 on a regression')
+    parser.add_argument('--output', help='Write the results to a .csv or .json file')
+    parser.add_argument('--instrument', help='Record spans and counters and write them to a .csv or .json file')
+    parser.add_argument('--profile', action='store_true', help='With --instrument, also print a cProfile summary')
+    args = parser.parse_args()
+
+    if args.instrument:
+        instrumentation.enable(profile=args.profile)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    repeat = 1 if args.quick else args.repeat
+    results = run_suite(sizes, args.in_degree, 'poisson' if args.poisson else 'fixed', repeat,
+                        args.filter, args.baseline, args.tolerance)
+
+    if args.output:
+        if args.output.endswith('.json'):
+            results.to_json(args.output, orient='records', indent=2)
+        else:
+            results.to_csv(args.output, index=False)
+        print(f"Results saved to {args.output}")
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    if args.instrument:
+        instrumentation.disable()
+        instrumentation.export(args.instrument)
+        if args.profile:
+            print(instrumentation.profile_stats())
+
+    regressions = results[results['regression']]
+    if len(regressions):
+        print(f"\n{len(regressions)} regressions (slower than x{args.tolerance} of baseline):")
+        for row in regressions.to_dict('records'):
+            print(f"  - {row['case']}: {row['wall_s'] * 1e3:.2f} ms vs {row['baseline_s'] * 1e3:.2f} ms")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
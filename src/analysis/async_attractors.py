@@ -0,0 +1,238 @@
+"""
+ERBB Signaling Network Asynchronous Attractor Module
+
+This module finds the attractors of the asynchronous (one node at a time)
+dynamics, i.e. the terminal strongly connected components of the asynchronous
+state graph. Complex attractors, which are invisible to ``model.stable_states``,
+are found together with the fixed points. It includes functions to:
+
+- Build the asynchronous state graph of a region of the state space in CSR form
+- Compute forward and backward reachable sets with vectorized breadth-first search
+- Extract terminal strongly connected components with basin pruning
+
+Input nodes (rule ``x = x``) never change, so the state space is split into one
+independent region per input configuration, or reduced to the states reachable
+from given initial states, before any graph is built.
+
+Functions:
+    input_regions: Split the state space by input node configuration
+    reachable_states: States reachable from initial states under asynchronous update
+    async_graph: CSR forward and backward edges of a region
+    async_attractors: Find all asynchronous attractors of a model
+"""
+
+import itertools
+
+import numpy as np
+
+from src.models.compiled import CompiledModel, compile_model, popcount
+
+# Largest network whose asynchronous state graph is built: 2^n states plus up
+# to n * 2^n int64 CSR edges in each direction (several GB at 24 nodes)
+MAX_ASYNC_NODES = 24
+
+
+def _expand(indptr, indices, frontier):
+    """All CSR neighbours of the frontier nodes, in one gather"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return indices[:0]
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    return indices[offsets + np.arange(total)]
+
+
+def _reach(indptr, indices, sources, allowed=None):
+    """
+    Breadth-first search over a CSR graph
+
+    Returns:
+    --------
+    tuple : (seen mask, nodes in discovery order)
+    """
+    seen = np.zeros(len(indptr) - 1, dtype=bool)
+    frontier = np.unique(sources)
+    seen[frontier] = True
+    order = [frontier]
+    while frontier.size:
+        neighbours = _expand(indptr, indices, frontier)
+        neighbours = neighbours[~seen[neighbours]]
+        if allowed is not None:
+            neighbours = neighbours[allowed[neighbours]]
+        frontier = np.unique(neighbours)
+        seen[frontier] = True
+        order.append(frontier)
+    return seen, np.concatenate(order)
+
+
+def input_regions(compiled, inputs=None):
+    """
+    Split the state space into the subspaces of fixed input configurations
+
+    Parameters:
+    -----------
+    compiled : CompiledModel
+        The compiled network
+    inputs : dict, optional
+        Restrict input nodes to the given values {name: bool}
+
+    Returns:
+    --------
+    list : One sorted uint32 array of states per input configuration
+    """
+    input_bits = [i for i, rule in enumerate(compiled.rules) if rule == ('var', i)]
+    inputs = {compiled.index[str(k)]: bool(v) for k, v in (inputs or {}).items()}
+    free_bits = [i for i in range(compiled.n) if i not in input_bits and i not in inputs]
+
+    # Deposit a counter into the free bit positions; this keeps the states sorted
+    counter = np.arange(1 << len(free_bits), dtype=np.uint32)
+    base = np.zeros(len(counter), dtype=np.uint32)
+    for k, bit in enumerate(free_bits):
+        base |= ((counter >> np.uint32(k)) & np.uint32(1)) << np.uint32(bit)
+    fixed = sum(1 << i for i, value in inputs.items() if value)
+
+    regions = []
+    open_inputs = [i for i in input_bits if i not in inputs]
+    for values in itertools.product((0, 1), repeat=len(open_inputs)):
+        offset = fixed + sum(1 << i for i, v in zip(open_inputs, values) if v)
+        regions.append(base | np.uint32(offset))
+    return regions
+
+
+def reachable_states(compiled, initial_states):
+    """
+    States reachable from the initial states under asynchronous update
+
+    The graph is explored implicitly from the compiled rules, so only the
+    reachable part of the state space is ever evaluated.
+
+    Returns:
+    --------
+    numpy array : Sorted uint32 array of reachable states
+    """
+    seen = np.zeros(1 << compiled.n, dtype=bool)
+    frontier = np.unique(np.asarray(initial_states, dtype=np.uint32))
+    seen[frontier] = True
+    order = [frontier]
+    while frontier.size:
+        diff = compiled.step(frontier) ^ frontier
+        neighbours = []
+        for i in range(compiled.n):
+            bit = np.uint32(1 << i)
+            neighbours.append(frontier[(diff & bit) != 0] ^ bit)
+        neighbours = np.concatenate(neighbours)
+        frontier = np.unique(neighbours[~seen[neighbours]])
+        seen[frontier] = True
+        order.append(frontier)
+    return np.sort(np.concatenate(order))
+
+
+def async_graph(compiled, states):
+    """
+    Build the asynchronous state graph of a region in CSR form
+
+    A state has one outgoing edge per node whose rule disagrees with its current
+    value. The region must be closed under asynchronous update (an input
+    subspace or a reachable set). Nodes of the graph are positions in ``states``.
+
+    Returns:
+    --------
+    tuple : (indptr, indices, reverse_indptr, reverse_indices)
+    """
+    size = len(states)
+    diff = compiled.step(states) ^ states
+    counts = popcount(diff)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.empty(indptr[-1], dtype=np.int64)
+
+    # Fill every row in bit order: the slot of a flip is the number of lower flips
+    contiguous = size == (1 << compiled.n)
+    for i in range(compiled.n):
+        bit = np.uint32(1 << i)
+        rows = np.flatnonzero(diff & bit)
+        slots = indptr[rows] + popcount(diff[rows] & np.uint32((1 << i) - 1))
+        targets = states[rows] ^ bit
+        indices[slots] = targets if contiguous else np.searchsorted(states, targets)
+
+    # Reverse edges for backward reachability
+    sources = np.repeat(np.arange(size, dtype=np.int64), counts)
+    order = np.argsort(indices, kind='stable')
+    reverse_indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=size), out=reverse_indptr[1:])
+    return indptr, indices, reverse_indptr, sources[order]
+
+
+def _terminal_sccs(indptr, indices, reverse_indptr, reverse_indices):
+    """
+    Terminal strongly connected components of a CSR graph
+
+    Fixed points (no outgoing edge) are taken first. Every time an attractor is
+    found its whole backward reachable set is removed, so each search starts from
+    a state that cannot reach any known attractor. From such a state we descend:
+    if the forward set F(s) is not contained in the backward set of s, we move to
+    the farthest state of F(s) outside it, whose forward set is strictly smaller.
+    """
+    size = len(indptr) - 1
+    remaining = np.ones(size, dtype=bool)
+    attractors = []
+
+    fixed = np.flatnonzero(indptr[1:] == indptr[:-1])
+    if fixed.size:
+        attractors.extend(fixed[:, None])
+        basin, _ = _reach(reverse_indptr, reverse_indices, fixed)
+        remaining &= ~basin
+
+    while remaining.any():
+        start = int(np.argmax(remaining))
+        while True:
+            forward, order = _reach(indptr, indices, [start])
+            backward, _ = _reach(reverse_indptr, reverse_indices, [start], allowed=forward)
+            escape = order[~backward[order]]
+            if not escape.size:
+                break
+            start = int(escape[-1])
+        attractor = np.flatnonzero(forward)
+        attractors.append(attractor)
+        basin, _ = _reach(reverse_indptr, reverse_indices, attractor)
+        remaining &= ~basin
+    return attractors
+
+
+def async_attractors(model, initial_states=None, inputs=None):
+    """
+    Find all attractors of the asynchronous dynamics
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    initial_states : list, optional
+        Only search the states reachable from these states (dicts or packed integers)
+    inputs : dict, optional
+        Only search the input configurations with these values {name: bool}
+
+    Returns:
+    --------
+    list : One sorted uint32 array of packed states per attractor
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if compiled.n > MAX_ASYNC_NODES:
+        raise ValueError(
+            f"Asynchronous state graph of {compiled.n} nodes is too large "
+            f"(MAX_ASYNC_NODES={MAX_ASYNC_NODES})"
+        )
+
+    if initial_states is not None:
+        codes = [s if isinstance(s, (int, np.integer)) else compiled.encode(s) for s in initial_states]
+        regions = [reachable_states(compiled, codes)]
+    else:
+        regions = input_regions(compiled, inputs)
+
+    attractors = []
+    for states in regions:
+        graph = async_graph(compiled, states)
+        attractors.extend(states[a] for a in _terminal_sccs(*graph))
+    attractors.sort(key=lambda a: int(a[0]))
+    return attractors
@@ -4,22 +4,23 @@ ERBB Signaling Network Attractor Analysis Module
 This module provides tools for analyzing attractors in Boolean network models
 of the ERBB signaling pathway. It includes functions to:
 
-- Find stable states and cyclic attractors in Boolean models
+- Find stable states and cyclic attractors in Boolean models, under
+  synchronous or asynchronous update
 - Visualize basins of attraction for specific attractors
 - Analyze attractor properties and phenotypes
-- Cache computation results for efficiency
+- Cache computation results, keyed on the model rules, for efficiency
+- Stream attractors one by one as they are found, with an early stop
 
 Functions:
     analyze_attractors: Find all attractors in a Boolean network model
+    iter_attractors: Yield attractors one by one, stopping at a condition
     visualize_attractor_basin: Visualize the basin of attraction for a specific attractor
     print_attractor_details: Print detailed information about all attractors
     determine_cell_division_phenotype: Determine if a state represents cell division
 """
 
-import os
 import pickle
 import time
-import hashlib
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -30,6 +31,15 @@ from tabulate import tabulate
 from collections import defaultdict
 import itertools
 
+from src.models.compiled import compile_model
+from src.models.reduction import reduce_model
+from src.models.state_set import StateSet
+from src.utils.cache import get_cache
+from src.utils.instrumentation import span, timed
+from src.analysis.state_space import successor_table, find_cycles, compute_basins
+from src.analysis.async_attractors import async_attractors
+from src.analysis.fixed_points import iter_fixed_points, stable_state_set
+
 
 def safe_bool(value):
     """Safely convert a SymPy expression or other value to boolean"""
@@ -60,7 +70,9 @@ def safe_bool(value):
         return False
 
 
-def analyze_attractors(model, use_cache=True, cache_dir='../cache'):
+@timed('attractors')
+def analyze_attractors(model, use_cache=True, cache_dir='../cache', exact_basins=False,
+                       detect_cycles=True, mode='sync', backend='boon'):
     """
     Find and analyze all attractors (stable states and cycles) in the Boolean network model
     
@@ -72,100 +84,280 @@ def analyze_attractors(model, use_cache=True, cache_dir='../cache'):
         Whether to use cached results if available
     cache_dir : str
         Directory to store cached results
+    exact_basins : bool
+        Whether to enumerate the whole synchronous state space and add the exact
+        synchronous basin size of every attractor as 'basins_df'
+    detect_cycles : bool
+        Whether to search the state space for cyclic (or complex) attractors
+    mode : str
+        'sync' for synchronous limit cycles, 'async' for the complex attractors
+        (terminal strongly connected components) of the asynchronous dynamics
+    backend : str
+        Stable state solver: 'boon' (model.stable_states), 'sat' (constraint
+        solver, scales to large networks) or 'enumerate'
         
     Returns:
     --------
     dict : Dictionary containing attractor analysis results
     """
-    # Create a unique identifier for this model
-    # We'll use the model's variables and descriptions to create a hash
-    model_hash = hashlib.md5(str(sorted([str(v) for v in model.variables])).encode()).hexdigest()
-    cache_file = os.path.join(cache_dir, f"attractors_{model_hash}.pkl")
+    if mode not in ('sync', 'async'):
+        raise ValueError(f"Unknown update mode '{mode}', expected 'sync' or 'async'")
     
-    # Create cache directory if it doesn't exist
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
+    # Key the cache on the canonical rules plus the analysis parameters
+    cache = get_cache(cache_dir)
+    cache_key = cache.key(model, 'attractors', mode=mode, detect_cycles=detect_cycles)
     
     # Try to load from cache first
-    if use_cache and os.path.exists(cache_file):
-        print(f"Loading cached attractor results from {cache_file}")
-        try:
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
-        except (pickle.PickleError, IOError) as e:
-            print(f"Could not load cache: {str(e)}")
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"Loading cached attractor results from {cache.path(cache_key)}")
+            if exact_basins and cached.get('basins_df') is None:
+                synchronous = [a for a in cached['all_attractors'] if a['type'] in ('Stable State', 'Cycle')]
+                cached['basins_df'] = _exact_basins(compile_model(model), synchronous)
+                _store_in_cache(cache, cache_key, cached)
+            return cached
     
     print("Starting stable states calculation...")
     start_time = time.time()
     
     # Use stable_states method which is more reliable than equilibria
+    compiled = compile_model(model)
     try:
-        stable_states = model.stable_states
+        with span('stable_states'):
+            stable_states = stable_state_set(model, backend)
         print(f"Computation complete: Found {len(stable_states)} stable states")
         print(f"Calculation took {time.time() - start_time:.2f} seconds")
     except Exception as e:
         print(f"Error computing stable states: {str(e)}")
-        stable_states = []
+        stable_states = StateSet(compiled.nodes)
     
-    if not stable_states:
-        print("WARNING: No stable states found for this model.")
-        # Return empty results structure
-        return {
+    # Limit cycles need the full synchronous successor map, complex attractors the async state graph.
+    # Constant nodes keep their value in every attractor, so both are searched on the reduced network
+    succ = None
+    cycles = []
+    if detect_cycles:
+        try:
+            start_time = time.time()
+            with span('cycles'):
+                reduced = reduce_model(compiled)
+                if reduced.compiled.n < compiled.n:
+                    print(f"Reduced network from {compiled.n} to {reduced.compiled.n} nodes")
+                if mode == 'async':
+                    cycles = [sorted(reduced.lift(a)) for a in async_attractors(reduced.compiled) if len(a) > 1]
+                else:
+                    table = successor_table(reduced.compiled)
+                    if reduced.compiled.n == compiled.n:
+                        succ = table
+                    cycles = [reduced.lift(c) for c in find_cycles(table) if len(c) > 1]
+            print(f"Found {len(cycles)} cyclic attractors in {time.time() - start_time:.2f} seconds")
+        except ValueError as e:
+            print(f"Skipping cycle detection: {str(e)}")
+    
+    if not len(stable_states) and not cycles:
+        print("WARNING: No attractors found for this model.")
+        # Return empty results structure, cached like any other result
+        result = {
             'all_attractors': [],
             'stable_states': [],
             'cycles': [],
             'stable_states_df': None,
+            'state_set': stable_states,
             'count': 0,
             'stable_count': 0,
-            'cycle_count': 0
+            'cycle_count': 0,
+            'mode': mode
         }
+        _store_in_cache(cache, cache_key, result)
+        return result
     
-    # Process attractors into a more structured format
+    # Process attractors into a more structured format; states stay bit-packed
+    # until they are converted to dictionaries keyed like model.desc
     processed_attractors = []
+    total_nodes = compiled.n
+    key_of = {str(v): v for v in model.desc}
+    keys = [key_of.get(name, name) for name in compiled.nodes]
     
     # Add stable states as attractors with length 1
-    for i, state in enumerate(stable_states):
-        # Calculate active nodes percentage
-        total_nodes = len(model.variables)
-        active_nodes_count = sum(1 for var, val in state.items() if safe_bool(val))
-        
-        # Convert all values in the state to Python booleans
-        clean_state = {k: safe_bool(v) for k, v in state.items()}
-        
+    active_counts = stable_states.to_matrix().sum(axis=1)
+    for i, state in enumerate(stable_states.to_dicts(keys)):
         attractor_info = {
             'id': i + 1,
             'type': 'Stable State',
             'length': 1,
-            'states': [clean_state],
-            'active_percentage': (active_nodes_count / total_nodes) * 100
+            'states': [state],
+            'active_percentage': (int(active_counts[i]) / total_nodes) * 100
         }
         processed_attractors.append(attractor_info)
     
+    # Add cycles with their states in update order (sorted for complex attractors)
+    processed_cycles = []
+    cycle_sets = [StateSet.from_codes(compiled.nodes, cycle) for cycle in cycles]
+    for cycle in cycle_sets:
+        cycle_states = cycle.to_dicts(keys)
+        active_nodes_count = cycle.to_matrix().sum() / len(cycle)
+        processed_cycles.append({
+            'id': len(processed_attractors) + len(processed_cycles) + 1,
+            'type': 'Complex Attractor' if mode == 'async' else 'Cycle',
+            'length': len(cycle_states),
+            'states': cycle_states,
+            'active_percentage': (active_nodes_count / total_nodes) * 100
+        })
+    
+    stable_attractors = processed_attractors
+    processed_attractors = stable_attractors + processed_cycles
+    
     result = {
         'all_attractors': processed_attractors,
-        'stable_states': processed_attractors,  # All attractors are stable states for now
-        'cycles': [],  # No cycles detected yet
-        'stable_states_df': pd.DataFrame(
-            [{str(k): int(safe_bool(v)) for k, v in s.items()} for s in stable_states]
-        ) if stable_states else None,
+        'stable_states': stable_attractors,
+        'cycles': processed_cycles,
+        'stable_states_df': _stable_states_frame(stable_states),
+        # Every attractor state, bit-packed, in the order of all_attractors
+        'state_set': StateSet.concat([stable_states] + cycle_sets),
         'count': len(processed_attractors),
-        'stable_count': len(processed_attractors),
-        'cycle_count': 0
+        'stable_count': len(stable_attractors),
+        'cycle_count': len(processed_cycles),
+        'mode': mode
     }
     
+    if exact_basins:
+        # Basins are those of the synchronous dynamics
+        synchronous = [a for a in processed_attractors if a['type'] in ('Stable State', 'Cycle')]
+        with span('basins'):
+            result['basins_df'] = _exact_basins(compiled, synchronous, succ)
+    
     # Cache the results for future use
+    _store_in_cache(cache, cache_key, result)
+    
+    return result
+
+
+def iter_attractors(model, mode='sync', detect_cycles=True, where=None, until=None, overrides=None):
+    """
+    Yield the attractors of the model one by one, as they are found
+    
+    Stable states come first, straight from the constraint solver, so they are
+    available on networks of any size without building the attractor list;
+    cyclic attractors follow once the (reduced) state space has been searched.
+    Stopping the iteration stops the search.
+    
+    Parameters:
+    -----------
+    model : BooN model
+        The Boolean network model
+    mode : str
+        'sync' for synchronous limit cycles, 'async' for complex attractors
+    detect_cycles : bool
+        Whether to search for cyclic (or complex) attractors after the stable states
+    where : dict, optional
+        Node values at least one state of the attractor must have, e.g.
+        {'pRB': False, 'p27': True}; pushed into the solver for stable states
+    until : callable or dict, optional
+        Stop after the first yielded attractor for which until(attractor) is
+        true; a dict of node values stops at the first attractor with a state
+        having these values
+    overrides : dict, optional
+        Perturbed nodes {name: bool}
+    
+    Yields:
+    -------
+    dict : Attractor in the format of analyze_attractors()['all_attractors'],
+        with the packed states as 'codes'; ids count from 1 in yield order
+    """
+    if mode not in ('sync', 'async'):
+        raise ValueError(f"Unknown update mode '{mode}', expected 'sync' or 'async'")
+    compiled = compile_model(model)
+    key_of = {str(v): v for v in model.desc}
+    keys = [key_of.get(name, name) for name in compiled.nodes]
+    where_mask, where_values = compiled.clamp(where or {})
+    stop_mask = stop_values = None
+    if isinstance(until, dict):
+        stop_mask, stop_values = compiled.clamp(until)
+    
+    def attractor(attractor_id, kind, codes):
+        states = StateSet.from_codes(compiled.nodes, codes)
+        return {
+            'id': attractor_id,
+            'type': kind,
+            'length': len(codes),
+            'states': states.to_dicts(keys),
+            'active_percentage': (states.to_matrix().sum() / len(states) / compiled.n) * 100,
+            'codes': list(codes)
+        }
+    
+    def stop(found):
+        if stop_mask is not None:
+            return any(code & stop_mask == stop_values for code in found['codes'])
+        return callable(until) and until(found)
+    
+    attractor_id = 0
+    for code in iter_fixed_points(compiled, overrides, conditions=where):
+        attractor_id += 1
+        found = attractor(attractor_id, 'Stable State', [code])
+        yield found
+        if stop(found):
+            return
+    if not detect_cycles:
+        return
+    
+    # As in analyze_attractors, cycles are searched on the network without its constants
+    try:
+        with span('cycles'):
+            reduced = reduce_model(compiled, overrides)
+            if mode == 'async':
+                cycles = async_attractors(reduced.compiled)
+            else:
+                cycles = find_cycles(successor_table(reduced.compiled))
+    except ValueError as e:
+        print(f"Skipping cycle detection: {str(e)}")
+        return
+    kind = 'Complex Attractor' if mode == 'async' else 'Cycle'
+    # Lift each cycle back to the full network only when it is reached
+    for cycle in cycles:
+        if len(cycle) < 2:
+            continue
+        codes = sorted(reduced.lift(cycle)) if mode == 'async' else reduced.lift(cycle)
+        if not any(code & where_mask == where_values for code in codes):
+            continue
+        attractor_id += 1
+        found = attractor(attractor_id, kind, codes)
+        yield found
+        if stop(found):
+            return
+
+
+def _stable_states_frame(stable_states):
+    """Stable states as a DataFrame of 0/1 (one row per state), or None"""
+    if not len(stable_states):
+        return None
+    with span('pandas'):
+        return stable_states.to_dataframe(int)
+
+
+def _store_in_cache(cache, cache_key, result):
+    """Write a result to the cache, reporting but not raising I/O problems"""
     try:
-        print(f"Saving results to cache file: {cache_file}")
-        with open(cache_file, 'wb') as f:
-            pickle.dump(result, f)
-    except (IOError, pickle.PickleError) as e:
+        print(f"Saving results to cache file: {cache.path(cache_key)}")
+        cache.put(cache_key, result)
+    except (IOError, OSError, pickle.PickleError) as e:
         print(f"Could not cache results: {str(e)}")
+
+
+def _exact_basins(compiled, attractors, succ=None):
+    """Exact basin table of the synchronous dynamics, matched to the attractor ids"""
+    print("Computing exact basins over the full state space...")
+    start_time = time.time()
+    basins = compute_basins(compiled, succ)
     
-    return result
+    # Every state of an attractor is labelled with the smallest state of its cycle
+    ids = {min(compiled.encode(state) for state in a['states']): a['id'] for a in attractors}
+    basins.insert(0, 'attractor_id', [ids.get(rep) for rep in basins['representative']])
+    print(f"Basin computation took {time.time() - start_time:.2f} seconds")
+    return basins
 
 
 def visualize_attractor_basin(model, attractor_id, max_states=50, cached_results=None, 
-                              use_cache=True, cache_dir='../cache'):
+                              use_cache=True, cache_dir='../cache', n_trajectories=20):
     """
     Visualize the basin of attraction for a specific attractor
     
@@ -183,6 +375,8 @@ def visualize_attractor_basin(model, attractor_id, max_states=50, cached_results
         Whether to try loading from cache if cached_results not provided
     cache_dir : str
         Directory where cache files are stored
+    n_trajectories : int
+        Number of random trajectories to simulate (capped by max_states - 1)
         
     Returns:
     --------
@@ -195,172 +389,76 @@ def visualize_attractor_basin(model, attractor_id, max_states=50, cached_results
         print("Warning: max_states parameter must be an integer. Using default value of 50.")
         max_states = 50
         
-    # Try to get stable states either from provided cached results, from cache file, or by computing
-    stable_states = None
-    target_state = None
-    
-    # Option 1: Use provided cached results
-    if cached_results and 'stable_states' in cached_results and cached_results['stable_states']:
+    # Stable states come bit-packed from the 'state_set' of the attractor results
+    # (stable states first, in id order), the result cache, or are computed
+    results = None
+    if cached_results and cached_results.get('stable_states'):
         print("Using provided cached attractors for visualization")
-        if attractor_id > len(cached_results['stable_states']):
-            raise ValueError(
-                f"Attractor ID {attractor_id} doesn't exist. "
-                f"Only {len(cached_results['stable_states'])} attractors found."
-            )
-        # Make sure we're getting a clean dictionary with python booleans, not SymPy expressions
-        raw_state = cached_results['stable_states'][attractor_id - 1]['states'][0]
-        target_state = {}
-        for k, v in raw_state.items():
-            try:
-                target_state[k] = safe_bool(v)
-            except Exception:
-                print(f"Warning: Could not convert {k}={v} to boolean, defaulting to False")
-                target_state[k] = False
-    
-    # Option 2: Try loading from cache file
+        results = cached_results
     elif use_cache:
-        model_hash = hashlib.md5(
-            str(sorted([str(v) for v in model.variables])).encode()
-        ).hexdigest()
-        cache_file = os.path.join(cache_dir, f"attractors_{model_hash}.pkl")
-        
-        if os.path.exists(cache_file):
-            print(f"Loading attractor basin visualization data from cache: {cache_file}")
-            try:
-                with open(cache_file, 'rb') as f:
-                    cached_data = pickle.load(f)
-                    if 'stable_states' in cached_data and cached_data['stable_states']:
-                        if attractor_id > len(cached_data['stable_states']):
-                            raise ValueError(
-                                f"Attractor ID {attractor_id} doesn't exist. "
-                                f"Only {len(cached_data['stable_states'])} attractors found."
-                            )
-                        raw_state = cached_data['stable_states'][attractor_id - 1]['states'][0]
-                        target_state = {}
-                        for k, v in raw_state.items():
-                            try:
-                                target_state[k] = safe_bool(v)
-                            except Exception:
-                                print(f"Warning: Could not convert {k}={v} to boolean, defaulting to False")
-                                target_state[k] = False
-                        print(f"Successfully loaded attractor {attractor_id} from cache")
-            except (IOError, pickle.PickleError) as e:
-                print(f"Could not load from cache: {str(e)}")
-                target_state = None
-    
-    # Option 3: Calculate from scratch if no cache available
-    if target_state is None:
+        cache = get_cache(cache_dir)
+        cache_key = cache.key(model, 'attractors', mode='sync', detect_cycles=True)
+        cached_data = cache.get(cache_key)
+        if cached_data and cached_data.get('stable_states'):
+            print(f"Loading attractor basin visualization data from cache: {cache.path(cache_key)}")
+            results = cached_data
+    
+    if results is not None:
+        stable_states = results['state_set'][:len(results['stable_states'])]
+    else:
         print("Computing stable states for basin visualization (no cache available)...")
         try:
-            stable_states = model.stable_states
-            if not stable_states:
-                raise ValueError("No stable states found in this model")
-                
-            if attractor_id > len(stable_states):
-                raise ValueError(
-                    f"Attractor ID {attractor_id} doesn't exist. "
-                    f"Only {len(stable_states)} attractors found."
-                )
-                
-            raw_state = stable_states[attractor_id - 1]
-            target_state = {}
-            for k, v in raw_state.items():
-                try:
-                    target_state[k] = safe_bool(v)
-                except Exception:
-                    print(f"Warning: Could not convert {k}={v} to boolean, defaulting to False")
-                    target_state[k] = False
-            print(f"Computed stable states, using attractor {attractor_id} for basin visualization")
+            stable_states = stable_state_set(model)
         except Exception as e:
             raise ValueError(f"Error computing stable states: {str(e)}") from e
+        if not len(stable_states):
+            raise ValueError("No stable states found in this model")
+    if attractor_id > len(stable_states):
+        raise ValueError(
+            f"Attractor ID {attractor_id} doesn't exist. "
+            f"Only {len(stable_states)} attractors found."
+        )
     
     # Create a state transition graph
     graph = nx.DiGraph()
     
-    # Now create a string-based representation for the target state to avoid any boolean evaluation issues
-    # We'll use strings like "k1=True,k2=False,..." as node identifiers
-    def state_to_str(state_dict):
-        """Convert a state dictionary to a stable string representation"""
-        return ",".join(f"{k}={state_dict[k]}" for k in sorted(state_dict.keys()))
-    
-    target_state_str = state_to_str(target_state)
+    # Compile the update rules once; states are packed into integers and used as graph nodes
+    compiled = compile_model(model)
+    target_code = stable_states[attractor_id - 1]
+    print(f"Using stable state {attractor_id} for basin visualization")
     
     # Add the attractor state to the graph
-    graph.add_node(target_state_str, color='red', attractor=True)
+    graph.add_node(target_code, color='red', attractor=True)
+    basin_states = {target_code}
     
-    # Generate some random initial states and trace their trajectories
-    basin_states = set([target_state_str])
+    # Generate random initial states and simulate all trajectories in one batch
+    trajectory_count = min(max_states - 1, n_trajectories)
+    initial_states = compiled.from_matrix(np.random.randint(2, size=(trajectory_count, compiled.n)))
+    max_steps = 100
+    history = compiled.simulate(initial_states, max_steps)
     
-    # Generate random initial states and simulate
-    for _ in range(min(max_states-1, 20)):
-        # Create a random state with Python booleans
-        random_state = {}
-        for var in model.variables:
-            random_state[var] = bool(np.random.randint(2))
+    for j in range(trajectory_count):
+        path = [int(code) for code in history[:, j]]
+        first_visit = {}
         
-        # Simulate trajectory - ensure we're working with Python booleans
-        curr_state = {k: bool(v) for k, v in random_state.items()}
-        state_history = []
-        
-        # Run the simulation until we reach a fixed point or a cycle
-        max_steps = 100
-        for step in range(max_steps):
-            # Convert the state to a string representation
-            curr_state_str = state_to_str(curr_state)
-            state_history.append(curr_state_str)
-            
-            # Update the state using the model's update rules
-            next_state = {}
-            for var in model.variables:
-                if var in model.desc:
-                    # Evaluate the Boolean expression for this variable
-                    update_rule = model.desc[var]
-                    if isinstance(update_rule, bool):
-                        next_state[var] = update_rule
-                    else:
-                        # Try to evaluate the symbolic expression safely
-                        try:
-                            # Create substitution dictionary with clean Python booleans
-                            substitution = {v: curr_state.get(v, False) for v in model.variables}
-                            # Evaluate the rule
-                            result = update_rule.subs(substitution)
-                            # Safely convert to Python boolean
-                            next_state[var] = safe_bool(result)
-                        except Exception:
-                            # Fall back to current state if evaluation fails
-                            next_state[var] = curr_state.get(var, False)
-                else:
-                    next_state[var] = curr_state.get(var, False)
-            
-            # Ensure we have plain Python booleans
-            curr_state = {k: bool(v) for k, v in next_state.items()}
-            
-            # Convert to string representation for comparison
-            curr_state_str = state_to_str(curr_state)
-            
-            # Check if we've reached the target attractor
-            if curr_state_str == target_state_str:
+        # Walk the trajectory until we reach the target attractor or a cycle
+        for step, code in enumerate(path):
+            if code == target_code:
                 # Add all states in the trajectory to the basin graph
-                state_history.append(curr_state_str)
-                for i in range(len(state_history) - 1):
-                    s1, s2 = state_history[i], state_history[i + 1]
+                for s1, s2 in zip(path[:step], path[1:step + 1]):
                     if s1 not in basin_states:
                         graph.add_node(s1, color='lightblue', attractor=False)
                         basin_states.add(s1)
-                    if s2 not in basin_states and s2 != target_state_str:
+                    if s2 not in basin_states:
                         graph.add_node(s2, color='lightblue', attractor=False)
                         basin_states.add(s2)
                     graph.add_edge(s1, s2)
                 break
             
             # Check if we're in a cycle (detected by revisiting a state)
-            if curr_state_str in state_history[:-1]:  # Exclude the state we just added
-                # Add the cycle to the graph
-                cycle_start_idx = state_history.index(curr_state_str)
-                cycle = state_history[cycle_start_idx:] + [curr_state_str]
-                
-                for i in range(len(cycle) - 1):
-                    s1, s2 = cycle[i], cycle[i + 1]
+            if code in first_visit:
+                cycle = path[first_visit[code]:step + 1]
+                for s1, s2 in zip(cycle[:-1], cycle[1:]):
                     if s1 not in basin_states:
                         graph.add_node(s1, color='orange', attractor=False)
                         basin_states.add(s1)
@@ -369,10 +467,9 @@ def visualize_attractor_basin(model, attractor_id, max_states=50, cached_results
                         basin_states.add(s2)
                     graph.add_edge(s1, s2)
                 break
-            
-            # Break if we've reached the maximum number of steps
-            if step == max_steps - 1:
-                print(f"Warning: Reached maximum steps ({max_steps}) without finding attractor or cycle")
+            first_visit[code] = step
+        else:
+            print(f"Warning: Reached maximum steps ({max_steps}) without finding attractor or cycle")
     
     # Draw the basin
     plt.figure(figsize=(10, 8))
@@ -403,7 +500,15 @@ def visualize_attractor_basin(model, attractor_id, max_states=50, cached_results
     }
     nx.draw_networkx_labels(graph, pos, labels=attractor_nodes, font_size=10, font_weight='bold')
     
-    plt.title(f"Basin of Attraction for Attractor {attractor_id}")
+    title = f"Basin of Attraction for Attractor {attractor_id}"
+    
+    # Report the exact basin size when the full state space was enumerated
+    basins = cached_results.get('basins_df') if cached_results else None
+    if basins is not None:
+        row = basins[basins['attractor_id'] == attractor_id]
+        if not row.empty:
+            title += f" ({int(row['basin_size'].iloc[0])} states, {row['basin_fraction'].iloc[0]:.1%} of the state space)"
+    plt.title(title)
     plt.axis('off')
     plt.tight_layout()
     
@@ -423,6 +528,17 @@ def print_attractor_details(attractors_result):
         df = pd.DataFrame([state_dict])
         print(tabulate(df, headers='keys', tablefmt='grid'))
         print(f"Active nodes: {ss['active_percentage']:.1f}%\n")
+    
+    if attractors_result['cycles']:
+        print("\nCyclic Attractors:")
+    for cycle in attractors_result['cycles']:
+        if cycle['type'] == 'Cycle':
+            print(f"Cycle {cycle['id']} (period {cycle['length']}):")
+        else:
+            print(f"{cycle['type']} {cycle['id']} ({cycle['length']} states):")
+        df = pd.DataFrame([{str(k): int(v) for k, v in state.items()} for state in cycle['states']])
+        print(tabulate(df, headers='keys', tablefmt='grid'))
+        print(f"Average active nodes: {cycle['active_percentage']:.1f}%\n")
 
 
 def determine_cell_division_phenotype(state, threshold=0.6):
@@ -0,0 +1,286 @@
+"""
+ERBB Signaling Network Basin Quantification Module
+
+This module measures which share of the state space flows to every attractor
+of the synchronous dynamics. It includes functions to:
+
+- Count basins exactly by enumerating all 2^n states when the network is small
+- Estimate basin fractions by stratified Monte Carlo sampling otherwise, with
+  normal confidence intervals from the stratified variance
+- Follow every sampled trajectory to its attractor with vectorized cycle
+  detection (Brent's algorithm) and label it by its smallest state
+- Distribute the samples over a process pool, each batch drawing from its own
+  spawned SeedSequence, so estimates depend only on the seed
+
+Strata are the configurations of a few nodes (the input nodes by default);
+every configuration covers the same number of states and gets the same number
+of samples.
+
+Functions:
+    perturbed_model: Compiled model with perturbed nodes replaced by constants
+    trace_attractors: Attractor representative and period reached from packed states
+    estimate_basins: Exact or sampled basin fraction of every attractor
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+from src.analysis.state_space import compute_basins
+from src.utils.instrumentation import count, span
+
+# Networks up to this size are enumerated exactly (2^n states)
+MAX_EXACT_NODES = 20
+
+# Samples traced together in one vectorized batch
+DEFAULT_BATCH_SIZE = 50_000
+
+# Most strata: 2^MAX_STRATA_NODES node configurations
+MAX_STRATA_NODES = 10
+
+
+def perturbed_model(model, perturbation=None):
+    """
+    Compiled model with the rules of perturbed nodes replaced by constants
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    perturbation : str, tuple, list or dict, optional
+        Knockouts or overexpressions in any form accepted by
+        knockout_analysis.perturbation_label
+
+    Returns:
+    --------
+    CompiledModel : The perturbed network
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if not perturbation:
+        return compiled
+    from src.analysis.knockout_analysis import perturbation_label
+    rules = list(compiled.rules)
+    for node, value in perturbation_label(perturbation)[1].items():
+        if node not in compiled.index:
+            raise KeyError(f"Unknown node '{node}'")
+        rules[compiled.index[node]] = ('const', bool(value))
+    return CompiledModel(compiled.nodes, rules)
+
+
+def trace_attractors(compiled, states, max_steps=100_000):
+    """
+    Follow synchronous trajectories to their attractors
+
+    Parameters:
+    -----------
+    compiled : CompiledModel
+        The compiled network (at most 64 nodes)
+    states : numpy array
+        Packed initial states
+    max_steps : int
+        Give up on trajectories that have not closed a cycle after this many steps
+
+    Returns:
+    --------
+    tuple : (representative, period) arrays; the representative is the smallest
+        state of the attractor, unresolved trajectories have period 0
+    """
+    states = np.asarray(states, dtype=np.uint64)
+    size = len(states)
+    # Brent's cycle detection, run on the unresolved trajectories only
+    tortoise = states.copy()
+    hare = compiled.step(states)
+    power = np.ones(size, dtype=np.int64)
+    period = np.ones(size, dtype=np.int64)
+    active = np.flatnonzero(tortoise != hare)
+    steps = 0
+    while active.size and steps < max_steps:
+        restart = power[active] == period[active]
+        if restart.any():
+            moved = active[restart]
+            tortoise[moved] = hare[moved]
+            power[moved] *= 2
+            period[moved] = 0
+        hare[active] = compiled.step(hare[active])
+        period[active] += 1
+        active = active[tortoise[active] != hare[active]]
+        steps += 1
+    period[active] = 0
+
+    # The hare is on the cycle: walk around it once keeping the smallest state
+    representative = hare.copy()
+    current = hare.copy()
+    walking = np.flatnonzero(period > 1)
+    for k in range(1, int(period.max()) if size else 0):
+        walking = walking[period[walking] > k]
+        if not walking.size:
+            break
+        current[walking] = compiled.step(current[walking])
+        representative[walking] = np.minimum(representative[walking], current[walking])
+    return representative, period
+
+
+def _sample_states(compiled, size, strata_bits, stratum, rng):
+    """Uniform random packed states with the strata nodes set to one configuration"""
+    states = rng.integers(0, (1 << compiled.n) - 1, size=size, dtype=np.uint64, endpoint=True)
+    mask = sum(1 << b for b in strata_bits)
+    values = sum(1 << b for k, b in enumerate(strata_bits) if (stratum >> k) & 1)
+    return (states & np.uint64(~mask & 0xFFFFFFFFFFFFFFFF)) | np.uint64(values)
+
+
+def _sample_batch(compiled, strata_bits, max_steps, job):
+    """Trace one batch of samples of a stratum; returns (stratum, representatives, periods, counts)"""
+    stratum, size, seed = job
+    rng = np.random.default_rng(seed)
+    representative, period = trace_attractors(compiled, _sample_states(compiled, size, strata_bits, stratum, rng),
+                                              max_steps)
+    # Keep the batch result small: one entry per attractor reached
+    pairs, counts = np.unique(np.stack([representative, period.astype(np.uint64)]), axis=1, return_counts=True)
+    return stratum, pairs[0], pairs[1].astype(np.int64), counts
+
+
+_worker_state = {}
+
+
+def _init_worker(*args):
+    """Keep the compiled model and sampling settings in the worker process"""
+    _worker_state['args'] = args
+
+
+def _worker_batch(job):
+    return _sample_batch(*_worker_state['args'], job)
+
+
+def _attractor_ids(compiled, attractors):
+    """Map the smallest state of every attractor to its id"""
+    if attractors is None:
+        return {}
+    if isinstance(attractors, dict):
+        attractors = attractors.get('all_attractors', [])
+    return {min(compiled.encode(state) for state in a['states']): a['id'] for a in attractors
+            if a['type'] in ('Stable State', 'Cycle')}
+
+
+def _default_strata(compiled):
+    """Input nodes (rule ``x = x``), which never change and split the dynamics"""
+    return [compiled.nodes[i] for i, rule in enumerate(compiled.rules) if rule == ('var', i)]
+
+
+def estimate_basins(model, attractors=None, perturbation=None, method='auto', n_samples=100_000,
+                    strata=None, confidence=0.95, seed=None, processes=1, batch_size=DEFAULT_BATCH_SIZE,
+                    max_exact_nodes=MAX_EXACT_NODES, max_steps=100_000):
+    """
+    Fraction of the state space that flows to every attractor under synchronous update
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    attractors : dict or list, optional
+        Result of analyze_attractors (or its 'all_attractors' list); adds the
+        matching 'attractor_id' to every row
+    perturbation : str, tuple, list or dict, optional
+        Knockouts or overexpressions; the perturbed nodes become constants
+    method : str
+        'exact', 'sample', or 'auto' (exact up to max_exact_nodes nodes)
+    n_samples : int
+        Number of sampled initial states
+    strata : list, optional
+        Nodes whose configurations stratify the sample; the input nodes by default
+    confidence : float
+        Confidence level of the intervals
+    seed : int, optional
+        Seed of the SeedSequence every batch draws its generator from
+    processes : int, optional
+        Worker processes (None uses all cores, 1 runs in this process)
+    batch_size : int
+        Samples traced together
+    max_exact_nodes : int
+        Largest network enumerated exactly with method='auto'
+    max_steps : int
+        Trajectories still transient after this many steps are reported as unresolved
+
+    Returns:
+    --------
+    pandas DataFrame : One row per attractor, largest basin first, with columns
+        attractor_id, representative, type, period, basin_fraction, ci_low,
+        ci_high, samples (basin size when exact) and method
+    """
+    compiled = perturbed_model(model, perturbation)
+    if method == 'auto':
+        method = 'exact' if compiled.n <= max_exact_nodes else 'sample'
+    if method not in ('exact', 'sample'):
+        raise ValueError(f"Unknown basin method '{method}', expected 'exact', 'sample' or 'auto'")
+    ids = _attractor_ids(compiled, attractors)
+
+    if method == 'exact':
+        with span('basins.exact'):
+            basins = compute_basins(compiled)
+        table = pd.DataFrame({
+            'attractor_id': [ids.get(int(rep)) for rep in basins['representative']],
+            'representative': basins['representative'],
+            'type': basins['type'],
+            'period': basins['period'],
+            'basin_fraction': basins['basin_fraction'],
+            'ci_low': basins['basin_fraction'],
+            'ci_high': basins['basin_fraction'],
+            'samples': basins['basin_size'],
+            'method': 'exact'
+        })
+        return table.sort_values('basin_fraction', ascending=False, ignore_index=True)
+
+    if compiled.n > 64:
+        raise ValueError(f"Basin sampling supports at most 64 nodes, the model has {compiled.n}")
+    if strata is None:
+        strata = _default_strata(compiled)
+    strata_bits = [compiled.index[str(node)] for node in strata][:MAX_STRATA_NODES]
+    n_strata = 1 << len(strata_bits)
+    per_stratum = max(1, -(-n_samples // n_strata))
+
+    jobs = []
+    for stratum in range(n_strata):
+        for start in range(0, per_stratum, batch_size):
+            jobs.append((stratum, min(batch_size, per_stratum - start)))
+    jobs = [job + (seed_seq,) for job, seed_seq in zip(jobs, np.random.SeedSequence(seed).spawn(len(jobs)))]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    with span('basins.sample'):
+        if processes <= 1 or len(jobs) <= 1:
+            batches = [_sample_batch(compiled, strata_bits, max_steps, job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(compiled, strata_bits, max_steps)) as pool:
+                batches = list(pool.map(_worker_batch, jobs))
+    count('basins.samples', per_stratum * n_strata)
+
+    # Hits of every attractor per stratum
+    hits = {}
+    for stratum, representatives, attractor_periods, counts in batches:
+        for rep, period, c in zip(representatives.tolist(), attractor_periods.tolist(), counts.tolist()):
+            key = (rep, period) if period else (None, 0)
+            hits.setdefault(key, np.zeros(n_strata))[stratum] += c
+
+    # Strata have equal size, so the estimate is the mean of the stratum proportions
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rows = []
+    for (rep, period), stratum_hits in hits.items():
+        proportions = stratum_hits / per_stratum
+        fraction = proportions.mean()
+        stderr = np.sqrt((proportions * (1 - proportions) / per_stratum).sum()) / n_strata
+        rows.append({
+            'attractor_id': ids.get(rep) if rep is not None else None,
+            'representative': rep,
+            'type': 'Unresolved' if rep is None else 'Stable State' if period == 1 else 'Cycle',
+            'period': period,
+            'basin_fraction': fraction,
+            'ci_low': max(0.0, fraction - z * stderr),
+            'ci_high': min(1.0, fraction + z * stderr),
+            'samples': int(stratum_hits.sum()),
+            'method': 'sample'
+        })
+    return pd.DataFrame(rows).sort_values('basin_fraction', ascending=False, ignore_index=True)
@@ -1,59 +1,214 @@
-def analyze_biomarkers(model):
+"""
+ERBB Signaling Network Biomarker Module
+
+This module ranks the nodes of a Boolean network as biomarkers. All metrics
+are array operations on a boolean matrix of states x nodes, so the stable
+states of many perturbation conditions can be analyzed at once:
+
+- Stability: how constant a node is across the states
+- Influence: number of other nodes it regulates (from the interaction index)
+- Entropy of every node and its mutual information with phenotype markers
+- Activity of every node in every condition
+
+Functions:
+    state_matrix: Stable states of a model under many perturbations as one StateSet
+    biomarker_metrics: Biomarker metrics of every node of a state matrix
+    analyze_biomarkers: Analyze potential biomarkers of a model
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+from src.models.state_set import StateSet
+from src.analysis.drug_targets import interaction_index
+from src.analysis.fixed_points import fixed_points
+from src.analysis.knockout_analysis import perturbation_label
+
+# Phenotype markers whose mutual information with every node is reported
+DEFAULT_PHENOTYPE_MARKERS = ['CDK2', 'CDK4', 'pRB']
+
+
+def state_matrix(model, perturbations=None, include_wild_type=True, backend='sat'):
+    """
+    Collect the stable states of a model under many perturbations into one matrix
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    perturbations : list, optional
+        Perturbations in any form accepted by perturbation_label
+    include_wild_type : bool
+        Whether to include the stable states of the unperturbed model
+    backend : str
+        Fixed point solver, 'sat' or 'enumerate'
+
+    Returns:
+    --------
+    tuple : (StateSet of all states, array of condition labels per state)
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    jobs = [('None (Wild-type)', {})] if include_wild_type else []
+    jobs.extend(perturbation_label(p) for p in perturbations or [])
+
+    codes, conditions = [], []
+    for label, overrides in jobs:
+        states = fixed_points(compiled, overrides, backend=backend)
+        codes.extend(states)
+        conditions.extend([label] * len(states))
+    return StateSet.from_codes(compiled.nodes, codes), np.array(conditions, dtype=object)
+
+
+def _entropy(p):
+    """Binary entropy in bits of an array of probabilities"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    return np.nan_to_num(terms)
+
+
+def _mutual_information(X, Y):
+    """
+    Mutual information in bits between every column of X and every column of Y
+
+    Both are boolean matrices with the same rows; the four joint counts of all
+    pairs follow from the counts of X over the rows where each column of Y is
+    on, so the state matrix is never converted to floats.
+    """
+    total = len(X)
+    n11 = np.stack([np.count_nonzero(X[y], axis=0) for y in Y.T], axis=1).astype(np.float64)
+    n1_ = np.count_nonzero(X, axis=0).astype(np.float64)[:, None]
+    n_1 = np.count_nonzero(Y, axis=0).astype(np.float64)[None, :]
+    joint = [n11, n1_ - n11, n_1 - n11, total - n1_ - n_1 + n11]
+    margins = [(n1_, n_1), (n1_, total - n_1), (total - n1_, n_1), (total - n1_, total - n_1)]
+    mi = np.zeros_like(n11)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for count, (a, b) in zip(joint, margins):
+            mi += np.nan_to_num(count / total * np.log2(count * total / (a * b)))
+    return mi
+
+
+def biomarker_metrics(matrix, nodes=None, influence=None, markers=None, conditions=None):
+    """
+    Compute the biomarker metrics of every node of a state matrix
+
+    Parameters:
+    -----------
+    matrix : StateSet or numpy array
+        The states, or a boolean matrix of states x nodes
+    nodes : list, optional
+        Node names of the matrix columns (taken from a StateSet)
+    influence : array, optional
+        Number of nodes regulated by every node
+    markers : list, optional
+        Phenotype markers for the mutual information (DEFAULT_PHENOTYPE_MARKERS)
+    conditions : array, optional
+        Condition label of every state row
+
+    Returns:
+    --------
+    tuple : (DataFrame with one row per node, DataFrame of the active percentage
+        of every node per condition or None)
+    """
+    if markers is None:
+        markers = DEFAULT_PHENOTYPE_MARKERS
+    if isinstance(matrix, StateSet):
+        nodes = matrix.nodes if nodes is None else nodes
+        matrix = matrix.to_matrix()
+    matrix = np.asarray(matrix, dtype=bool)
+    nodes = list(nodes)
+    n_states = len(matrix)
+
+    active = matrix.mean(axis=0) if n_states else np.zeros(len(nodes))
+    metrics = pd.DataFrame({
+        'node': nodes,
+        'active_percentage': active * 100,
+        # Very stable (always on or always off) nodes can be good biomarkers
+        'stability_score': np.maximum(active, 1 - active) * 100,
+        'influence_score': np.zeros(len(nodes), dtype=np.int64) if influence is None else influence,
+        'entropy': _entropy(active)
+    })
+
+    present = [m for m in markers if m in nodes]
+    if present and n_states:
+        columns = matrix[:, [nodes.index(m) for m in present]]
+        mi = _mutual_information(matrix, columns)
+        for k, marker in enumerate(present):
+            metrics[f'mi_{marker}'] = mi[:, k]
+        # The phenotype allows cell cycle progression if any marker is active
+        metrics['phenotype_mi'] = _mutual_information(matrix, columns.any(axis=1)[:, None])[:, 0]
+
+    # Calculate a combined biomarker score
+    metrics['biomarker_score'] = metrics['stability_score'] * 0.6 + metrics['influence_score'] * 0.4
+
+    by_condition = None
+    if conditions is not None and n_states:
+        codes, labels = pd.factorize(np.asarray(conditions))
+        # Active counts over the rows of every condition, contiguous after a stable
+        # sort; counted on the boolean rows, without a one-hot or integer copy
+        grouped = matrix
+        if np.any(np.diff(codes) < 0):
+            order = np.argsort(codes, kind='stable')
+            codes, grouped = codes[order], matrix[order]
+        sizes = np.bincount(codes, minlength=len(labels))
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+        counts = np.empty((len(labels), len(nodes)), dtype=np.int64)
+        for k in range(len(labels)):
+            counts[k] = np.count_nonzero(grouped[bounds[k]:bounds[k + 1]], axis=0)
+        by_condition = pd.DataFrame(counts / sizes[:, None] * 100, index=list(labels), columns=nodes)
+    return metrics, by_condition
+
+
+def analyze_biomarkers(model, perturbations=None, markers=None, backend='sat'):
     """
     Analyze potential biomarkers based on node stability and influence
-    
+
     Parameters:
     -----------
-    model : BooN model
+    model : BooN model or CompiledModel
         The Boolean network model
-    
+    perturbations : list, optional
+        Also pool the stable states of these perturbations (knockouts, ...)
+    markers : list, optional
+        Phenotype markers for the mutual information (DEFAULT_PHENOTYPE_MARKERS)
+    backend : str
+        Fixed point solver, 'sat' or 'enumerate'
+
     Returns:
     --------
     dict : Dictionary of biomarker analysis results
     """
-    # Get stable states
-    stable_states = model.stable_states
-    
-    biomarkers = []
-    
-    # Calculate stability of each node across stable states
-    for var in model.variables:
-        var_name = str(var)
-        
-        # Count active states
-        active_count = sum(1 for state in stable_states if state.get(var, False))
-        active_percentage = (active_count / len(stable_states)) * 100 if stable_states else 0
-        
-        # Very stable (always on or always off) nodes can be good biomarkers
-        stability_score = max(active_percentage, 100 - active_percentage)
-        
-        # Nodes that determine many other nodes' states are potentially good biomarkers
-        influence_score = sum(1 for other_var in model.variables 
-                            if var_name in str(model.desc.get(other_var, '')))
-        
-        # Calculate a combined biomarker score
-        biomarker_score = (stability_score * 0.6) + (influence_score * 0.4)
-        
-        biomarkers.append({
-            'node': var_name,
-            'stability_score': stability_score,
-            'influence_score': influence_score,
-            'biomarker_score': biomarker_score
-        })
-    
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    states, conditions = state_matrix(compiled, perturbations, backend=backend)
+
+    # Nodes that determine many other nodes' states are potentially good biomarkers
+    edges = interaction_index(compiled)
+    edges = edges[edges['source'] != edges['target']]
+    influence = np.bincount(edges['source'].map(compiled.index).to_numpy(dtype=np.int64),
+                            minlength=compiled.n)
+
+    metrics, by_condition = biomarker_metrics(
+        states, compiled.nodes, influence, markers, conditions if perturbations else None
+    )
+
     # Sort biomarkers by score, descending
-    biomarkers.sort(key=lambda x: x['biomarker_score'], reverse=True)
-    
+    metrics = metrics.sort_values('biomarker_score', ascending=False, kind='stable').reset_index(drop=True)
+    biomarkers = metrics.to_dict('records')
+
     # Group biomarkers by quality
     excellent = [b for b in biomarkers if b['biomarker_score'] > 80]
     good = [b for b in biomarkers if 60 <= b['biomarker_score'] <= 80]
     moderate = [b for b in biomarkers if 40 <= b['biomarker_score'] < 60]
     poor = [b for b in biomarkers if b['biomarker_score'] < 40]
-    
+
     return {
         'all_biomarkers': biomarkers,
         'excellent': excellent,
         'good': good,
         'moderate': moderate,
-        'poor': poor
-    }
\ No newline at end of file
+        'poor': poor,
+        'metrics': metrics,
+        'by_condition': by_condition,
+        'state_count': len(states),
+        'state_set': states
+    }
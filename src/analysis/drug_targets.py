@@ -1,53 +1,153 @@
-import networkx as nx
-from sympy import symbols
+"""
+ERBB Signaling Network Drug Target Module
 
-def identify_drug_targets(model):
+This module ranks the nodes of a Boolean network as drug target candidates.
+Structural metrics come from a regulator/target adjacency index built once
+from the compiled rules, and effect metrics from the outcome of knocking
+every candidate out:
+
+- In- and out-degree, with the sign of every interaction (activation or inhibition)
+- Number of downstream nodes frozen by the knockout (constant propagation)
+- Optionally, the stable states and cell cycle marker activity under the knockout
+
+Functions:
+    interaction_index: Signed regulator/target adjacency index of a model
+    identify_drug_targets: Rank the nodes of a model as drug target candidates
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+from src.analysis.knockout_analysis import screen_perturbations
+
+
+def _polarities(rule, positive, found):
+    """Collect the sign of every occurrence of a node in a rule"""
+    op, arg = rule
+    if op == 'var':
+        found.setdefault(arg, set()).add(1 if positive else -1)
+    elif op == 'not':
+        _polarities(arg, not positive, found)
+    elif op == 'xor':
+        # A regulator of a parity is neither activating nor inhibiting
+        for a in arg:
+            _polarities(a, True, found)
+            _polarities(a, False, found)
+    elif op != 'const':
+        for a in arg:
+            _polarities(a, positive, found)
+    return found
+
+
+def interaction_index(model):
+    """
+    Build the signed regulator/target adjacency index of a model
+
+    The sign of an interaction follows the polarity of the regulator in the
+    target's rule: +1 when it only appears un-negated (activation), -1 when it
+    only appears negated (inhibition), 0 when both or under a parity.
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+
+    Returns:
+    --------
+    pandas DataFrame : One row per interaction with columns source, target and sign
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    sources, targets, signs = [], [], []
+    for i, rule in enumerate(compiled.rules):
+        for regulator, polarity in sorted(_polarities(rule, True, {}).items()):
+            sources.append(regulator)
+            targets.append(i)
+            signs.append(polarity.pop() if len(polarity) == 1 else 0)
+    nodes = np.array(compiled.nodes, dtype=object)
+    return pd.DataFrame({
+        'source': nodes[np.array(sources, dtype=np.int64)],
+        'target': nodes[np.array(targets, dtype=np.int64)],
+        'sign': np.array(signs, dtype=np.int8)
+    })
+
+
+def identify_drug_targets(model, phenotype=False, cell_cycle_markers=None, processes=1):
     """
     Identify potential drug targets based on node influence in the network
-    
+
+    The degrees come from one pass over the interaction index; frozen_downstream
+    takes one constant propagation per candidate, which dominates the cost on
+    large networks (0.1 to 0.7 s for 1000 random nodes of in-degree 2 to 3,
+    depending on how far knockouts cascade).
+
     Parameters:
     -----------
-    model : BooN model
+    model : BooN model or CompiledModel
         The Boolean network model
-    
+    phenotype : bool
+        Whether to also solve the stable states of every knockout and score the
+        drop in cell cycle marker activity (requires solving one network per node)
+    cell_cycle_markers : list, optional
+        Markers used for the phenotype metrics (DEFAULT_CELL_CYCLE_MARKERS)
+    processes : int
+        Worker processes for the phenotype screen
+
     Returns:
     --------
-    list : List of potential drug targets with their scores
+    list : One dict per candidate node, best candidates first, with the degrees,
+        signed out-degrees, frozen_downstream, centrality and target_score, plus
+        ko_stable_states, cell_cycle_activity and activity_drop with ``phenotype``
     """
-    # Get all variables in the model
-    variables = model.variables
-    
-    # Calculate the effect of freezing each node
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    n = compiled.n
+    edges = interaction_index(compiled)
+    source = edges['source'].map(compiled.index).to_numpy(dtype=np.int64)
+    target = edges['target'].map(compiled.index).to_numpy(dtype=np.int64)
+    sign = edges['sign'].to_numpy()
+
+    # Self-regulation does not count towards the degree
+    other = source != target
+    out_degree = np.bincount(source[other], minlength=n)
+    in_degree = np.bincount(target[other], minlength=n)
+    activating = np.bincount(source[other & (sign > 0)], minlength=n)
+    inhibiting = np.bincount(source[other & (sign < 0)], minlength=n)
+
+    # Input nodes (rule x = x) are set by the environment, not by a drug
+    candidates = [i for i, rule in enumerate(compiled.rules) if rule != ('var', i)]
+
+    # Knockout effect: how many other nodes become constant
+    baseline = compiled.propagate({})
+    frozen_downstream = {
+        i: sum(1 for j in compiled.propagate({i: False}, known=baseline) if j != i and j not in baseline)
+        for i in candidates
+    }
+
     targets = []
-    
-    for var in variables:
-        # Create a perturbed model where the node is knocked out (set to False)
-        var_name = str(var)
-        
-        # Skip input nodes
-        if var_name == 'EGF':
-            continue
-            
-        # Calculate node out-degree (how many other nodes it affects)
-        out_degree = sum(1 for other_var in variables 
-                         if var_name in str(model.desc.get(other_var, '')))
-        
-        # Calculate node in-degree (how many nodes affect it)
-        in_degree = len(str(model.desc.get(var, '')).split('symbols(')) - 1
-        
-        # Calculate a simple centrality score
-        centrality_score = out_degree + in_degree
-        
+    for i in candidates:
         targets.append({
-            'node': var_name,
-            'out_degree': out_degree,
-            'in_degree': in_degree,
-            'centrality': centrality_score,
+            'node': compiled.nodes[i],
+            'out_degree': int(out_degree[i]),
+            'in_degree': int(in_degree[i]),
+            'activating_targets': int(activating[i]),
+            'inhibiting_targets': int(inhibiting[i]),
+            'frozen_downstream': frozen_downstream[i],
+            'centrality': int(out_degree[i] + in_degree[i]),
             # Higher scores indicate better drug target candidates
-            'target_score': out_degree * 2  # Weigh out-degree more
+            'target_score': int(out_degree[i]) * 2 + frozen_downstream[i]
         })
-    
-    # Sort targets by score, descending
-    targets.sort(key=lambda x: x['target_score'], reverse=True)
-    
-    return targets
\ No newline at end of file
+
+    if phenotype:
+        screen = screen_perturbations(compiled, [t['node'] for t in targets], cell_cycle_markers,
+                                      processes=processes)['results']
+        wild_type = screen[0]['cell_cycle_activity']
+        for entry, outcome in zip(targets, screen[1:]):
+            entry['ko_stable_states'] = outcome['stable_states_count']
+            entry['cell_cycle_activity'] = outcome['cell_cycle_activity']
+            entry['activity_drop'] = wild_type - outcome['cell_cycle_activity']
+        targets.sort(key=lambda x: (x['activity_drop'], x['target_score']), reverse=True)
+    else:
+        # Sort targets by score, descending
+        targets.sort(key=lambda x: x['target_score'], reverse=True)
+
+    return targets
@@ -0,0 +1,304 @@
+"""
+ERBB Signaling Network Fixed-Point Solver Module
+
+This module enumerates the stable states (fixed points) of a Boolean network
+without walking the state space. Every node contributes one constraint
+``x_i <=> f_i(x)``, and a backtracking search (DPLL) assigns nodes one at a
+time while propagating the constraints:
+
+- Each constraint is the cached truth table of the rule over its regulators
+  (see truth_tables), an integer bitmask, so the rows compatible with the current assignment are found with a
+  few bitwise operations
+- Propagation is arc consistent: a node is implied when all compatible rows agree
+  on its value, forward (rule output) and backward (regulators)
+- Stable states are yielded lazily as they are found; required node values
+  are assigned before the search starts, so asking for the stable states with
+  e.g. pRB off and p27 on prunes the search instead of filtering its output
+
+The cost depends on the structure of the network rather than on 2^n, so
+networks with hundreds of nodes and small in-degree are handled.
+
+Functions:
+    iter_fixed_points: Lazily yield the fixed points of a network as packed integers
+    fixed_points: Sorted list of all packed fixed points
+    stable_states: Drop-in replacement for ``model.stable_states`` with a choice of backend
+    stable_state_set: Stable states of a model as a StateSet
+"""
+
+from src.models.compiled import CompiledModel, compile_model
+from src.models.reduction import reduce_model
+from src.models.truth_tables import MAX_TABLE_INPUTS, row_masks
+from src.utils.instrumentation import count, span
+
+# Available stable state backends
+BACKENDS = ('boon', 'enumerate', 'sat')
+
+class _Constraint:
+    """x_node <=> table(regulators)"""
+
+    __slots__ = ('node', 'regs', 'table', 'full', 'ones', 'zeros', 'self_pos')
+
+    def __init__(self, node, regs, table, masks):
+        self.node = node
+        self.regs = regs
+        self.table = table
+        self.full, self.ones, self.zeros = masks
+        self.self_pos = regs.index(node) if node in regs else None
+
+
+def _build_constraints(compiled, overrides):
+    """One constraint per node; clamped nodes become constants"""
+    constraints = []
+    for i in range(compiled.n):
+        if i in overrides:
+            regs, table = (), 1 if overrides[i] else 0
+        else:
+            regs, table = compiled.regulators[i], compiled.tables[i].table
+            if table is None:
+                raise ValueError(
+                    f"Rule of {compiled.nodes[i]} has {len(regs)} regulators, more than {MAX_TABLE_INPUTS}"
+                )
+        constraints.append(_Constraint(i, list(regs), table, row_masks(len(regs))))
+    return constraints
+
+
+def _propagate(constraints, watchers, assign, trail, queue):
+    """
+    Apply arc-consistent propagation until a fixed point or a conflict
+
+    Returns:
+    --------
+    bool : False on conflict
+    """
+    while queue:
+        c = constraints[queue.pop()]
+        rows = c.full
+        for j, r in enumerate(c.regs):
+            value = assign[r]
+            if value is not None:
+                rows &= c.ones[j] if value else c.zeros[j]
+        if c.self_pos is not None:
+            # Self-regulation: the row's own bit must equal the output
+            rows &= ~(c.table ^ c.ones[c.self_pos])
+
+        implied = []
+        out = assign[c.node]
+        if out is None:
+            on, off = rows & c.table, rows & ~c.table
+            if not on and not off:
+                return False
+            if not on:
+                implied.append((c.node, False))
+            elif not off:
+                implied.append((c.node, True))
+        else:
+            rows &= c.table if out else ~c.table
+            if not rows:
+                return False
+            for j, r in enumerate(c.regs):
+                if assign[r] is None:
+                    if not rows & c.ones[j]:
+                        implied.append((r, False))
+                    elif not rows & c.zeros[j]:
+                        implied.append((r, True))
+
+        for node, value in implied:
+            if assign[node] is None:
+                assign[node] = value
+                trail.append(node)
+                queue.extend(watchers[node])
+            elif assign[node] != value:
+                return False
+    return True
+
+
+def iter_fixed_points(model, overrides=None, conditions=None, reduce=False):
+    """
+    Lazily yield the fixed points of a network
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    overrides : dict, optional
+        Clamped nodes {name: bool}, e.g. {'ERBB2': False}
+    conditions : dict, optional
+        Required node values {name: bool}, e.g. {'pRB': False, 'p27': True}.
+        Unlike overrides the rules of these nodes are kept: only the fixed
+        points of the unperturbed network that have these values are yielded
+    reduce : bool
+        Whether to solve the reduced network (see fixed_points) and lift every
+        fixed point as it is found
+
+    Yields:
+    -------
+    int : Packed fixed point (bit i is the value of node i), in search order
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    conditions = {compiled.index[str(k)]: bool(v) for k, v in (conditions or {}).items()}
+    if reduce:
+        yield from _iter_reduced_fixed_points(compiled, overrides, conditions)
+        return
+    overrides = {compiled.index[str(k)]: bool(v) for k, v in (overrides or {}).items()}
+    constraints = _build_constraints(compiled, overrides)
+
+    # A node's constraint and those of its targets must be rechecked when it changes
+    watchers = [[i] for i in range(compiled.n)]
+    for c in constraints:
+        for r in c.regs:
+            if r != c.node:
+                watchers[r].append(c.node)
+    order = sorted(range(compiled.n), key=lambda i: -len(watchers[i]))
+
+    # Required values are assigned below the first decision and never undone
+    assign = [conditions.get(i) for i in range(compiled.n)]
+    trail = []
+    if not _propagate(constraints, watchers, assign, trail, list(range(compiled.n))):
+        return
+
+    # Depth-first search; each frame is (trail length before decision, node, values left)
+    stack = []
+    while True:
+        node = next((i for i in order if assign[i] is None), None)
+        if node is None:
+            yield sum(1 << i for i, v in enumerate(assign) if v)
+        else:
+            count('solver.decisions')
+            stack.append((len(trail), node, [True]))
+            assign[node] = False
+            trail.append(node)
+            if _propagate(constraints, watchers, assign, trail, list(watchers[node])):
+                continue
+
+        # Backtrack to the most recent decision with an untried value
+        while stack:
+            size, node, left = stack[-1]
+            while len(trail) > size:
+                assign[trail.pop()] = None
+            if not left:
+                stack.pop()
+                continue
+            value = left.pop()
+            assign[node] = value
+            trail.append(node)
+            if _propagate(constraints, watchers, assign, trail, list(watchers[node])):
+                break
+        else:
+            return
+
+
+def _iter_reduced_fixed_points(compiled, overrides, conditions):
+    """Fixed points of the reduced network, lifted one at a time, with the conditions pushed down"""
+    with span('solver.reduce'):
+        reduced = reduce_model(compiled, overrides, eliminate=True)
+    if any(reduced.frozen.get(i, value) != value for i, value in conditions.items()):
+        return
+    position = {i: k for k, i in enumerate(reduced.kept)}
+    pushed = {reduced.compiled.nodes[position[i]]: value for i, value in conditions.items() if i in position}
+    # Eliminated nodes are only known once a fixed point is lifted
+    mask = sum(1 << i for i in conditions)
+    values = sum(1 << i for i, value in conditions.items() if value)
+    for code in iter_fixed_points(reduced.compiled, conditions=pushed):
+        full_code = reduced.lift([code])[0]
+        if full_code & mask == values:
+            yield full_code
+
+
+def fixed_points(model, overrides=None, backend='sat', reduce=None):
+    """
+    All fixed points of a network as a sorted list of packed integers
+
+    With ``reduce`` the perturbations are propagated, frozen and intermediate
+    nodes are removed (see reduce_model), the smaller network is solved and its
+    fixed points are lifted back to full states. This shrinks the space the
+    'enumerate' backend walks, but the 'sat' solver already propagates the
+    same constants and is several times faster without the reduction (see the
+    stable_states_sat_reduced benchmark), so by default only enumeration reduces.
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    overrides : dict, optional
+        Clamped nodes {name: bool}
+    backend : str
+        'sat' for the constraint solver, 'enumerate' for vectorized enumeration
+        of the unclamped nodes
+    reduce : bool, optional
+        Whether to solve the reduced network; None reduces for 'enumerate' only
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if reduce is None:
+        reduce = backend == 'enumerate'
+    if reduce:
+        with span('solver.reduce'):
+            reduced = reduce_model(compiled, overrides, eliminate=True)
+        return sorted(reduced.lift(fixed_points(reduced.compiled, backend=backend, reduce=False)))
+    if backend not in ('sat', 'enumerate'):
+        raise ValueError(f"Unknown fixed point backend '{backend}'")
+    count('solver.calls')
+    with span(f'solver.{backend}'):
+        if backend == 'enumerate':
+            clamp = compiled.clamp(overrides) if overrides else None
+            result = [int(s) for s in compiled.fixed_points(clamp)]
+        else:
+            result = sorted(iter_fixed_points(compiled, overrides))
+    count('solver.fixed_points', len(result))
+    return result
+
+
+def stable_state_set(model, backend='boon', reduce=None):
+    """
+    Stable states of a model as a bit-packed StateSet in compiled node order
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    backend : str
+        'boon', 'sat' or 'enumerate' (see stable_states)
+    reduce : bool, optional
+        Whether the 'sat' and 'enumerate' backends solve the reduced network
+        (None: 'enumerate' only, see fixed_points)
+
+    Returns:
+    --------
+    StateSet : The stable states, sorted
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown stable state backend '{backend}', expected one of {BACKENDS}")
+    # StateSet brings in NumPy, which solver workers do not need
+    from src.models.state_set import StateSet
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if backend == 'boon':
+        count('solver.calls')
+        with span('solver.boon'):
+            states = model.stable_states
+        return StateSet.from_dicts(compiled.nodes, states).unique()
+    return StateSet.from_codes(compiled.nodes, fixed_points(compiled, backend=backend, reduce=reduce))
+
+
+def stable_states(model, backend='boon', reduce=None):
+    """
+    Stable states of a model as a list of dictionaries, like ``model.stable_states``
+
+    Parameters:
+    -----------
+    model : BooN model
+        The Boolean network model
+    backend : str
+        'boon' to use BooN itself, 'sat' for the constraint solver of this module,
+        'enumerate' for vectorized enumeration of the state space
+    reduce : bool, optional
+        Whether the 'sat' and 'enumerate' backends solve the reduced network
+        (None: 'enumerate' only, see fixed_points)
+
+    Returns:
+    --------
+    list : One dict {symbol: bool} per stable state, keyed like ``model.desc``
+    """
+    if backend == 'boon':
+        return model.stable_states
+    states = stable_state_set(model, backend, reduce)
+    key_of = {str(v): v for v in model.desc}
+    return states.to_dicts([key_of.get(name, name) for name in states.nodes])
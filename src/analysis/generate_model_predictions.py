@@ -8,11 +8,16 @@ dictionaries showing expected vs. actual model behavior.
 """
 
 import os
+import sys
 import pandas as pd
 import json
 import argparse
 from typing import Dict, Any, List, Tuple
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.io_utils import load_results
+
 def get_model_predictions(model_phenotype_file: str, expectations_file: str) -> Tuple[Dict[str, Dict[str, bool]], List[str]]:
     """
     Generate a dictionary of model predictions from phenotype control files.
@@ -65,14 +70,15 @@ def get_node_status_from_model_file(model_file: str) -> Dict[str, Dict[str, bool
     Extract proliferation and apoptosis status directly from a model phenotype control file.
     
     Args:
-        model_file: Path to the model phenotype control CSV
+        model_file: Path to the model phenotype control CSV (states stored next to it
+            by the results store)
         
     Returns:
         Dictionary of perturbation states
     """
     try:
-        # Read the model file
-        model_df = pd.read_csv(model_file)
+        # Read the model file through the results store (no state string parsing)
+        model_df = load_results(model_file)
         
         # Create the results dictionary
         results = {}
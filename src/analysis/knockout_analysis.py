@@ -1,10 +1,22 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
 import copy
-import numpy as np
-from sympy import symbols
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def perform_knockout(model, gene_name):
+from src.models.compiled import CompiledModel, compile_model
+from src.models.reduction import reduce_model
+from src.analysis.fixed_points import fixed_points
+from src.utils.instrumentation import count, span
+
+DEFAULT_CELL_CYCLE_MARKERS = ['CDK2', 'CDK4', 'CDK6', 'pRB', 'Cyclin_D1', 'Cyclin_E1']
+
+# Chunks of perturbations in flight per worker process
+PENDING_CHUNKS_PER_WORKER = 4
+
+SCREEN_COLUMNS = ['knockout', 'stable_states_count', 'cell_cycle_activity']
+
+def perform_knockout(model, gene_name, reduce=False):
     """
     Performs a gene knockout by setting the specified gene to False
     
@@ -14,22 +26,32 @@ def perform_knockout(model, gene_name):
         The Boolean network model
     gene_name : str
         Name of the gene to knockout
+    reduce : bool
+        Return the reduced network instead of a model copy: the knockout is
+        propagated downstream and the frozen and intermediate nodes removed.
+        Its ``stable_states`` are the full stable states of the knockout.
         
     Returns:
     --------
-    knocked_model : BooN model
+    knocked_model : BooN model or ReducedModel
         Model with the gene knocked out
     """
-    # Create a deep copy of the model to avoid modifying the original
-    knocked_model = copy.deepcopy(model)
+    if reduce:
+        return reduce_model(model, {gene_name: False}, eliminate=True)
+    
+    # Shallow copy with its own rule dictionary: sympy expressions are immutable,
+    # so only the dictionary needs copying to leave the original untouched
+    knocked_model = copy.copy(model)
+    knocked_model.desc = dict(model.desc)
     
     # Set the gene to always be False (knockout)
+    from sympy import symbols
     gene_symbol = symbols(gene_name)
     knocked_model.desc[gene_symbol] = False
     
     return knocked_model
 
-def analyze_knockouts(model, genes_to_knockout, cell_cycle_markers=None):
+def analyze_knockouts(model, genes_to_knockout, cell_cycle_markers=None, processes=1, backend='sat'):
     """
     Analyze multiple gene knockouts and their effects on stable states
     
@@ -41,50 +63,227 @@ def analyze_knockouts(model, genes_to_knockout, cell_cycle_markers=None):
         List of gene names to knockout
     cell_cycle_markers : list, optional
         List of genes that indicate cell cycle progression
+    processes : int, optional
+        Number of worker processes (None uses all cores)
+    backend : str
+        Stable state solver: 'sat', 'enumerate' or 'boon' (see screen_perturbations)
         
     Returns:
     --------
     dict : Results of knockout analysis
     """
-    # Default cell cycle markers if not provided
-    if cell_cycle_markers is None:
-        cell_cycle_markers = ['CDK2', 'CDK4', 'CDK6', 'pRB', 'Cyclin_D1', 'Cyclin_E1']
+    return screen_perturbations(model, list(genes_to_knockout), cell_cycle_markers,
+                                processes=processes, backend=backend)
+
+def perturbation_label(perturbation):
+    """
+    Normalize a perturbation and give it a readable name
     
-    results = []
+    Parameters:
+    -----------
+    perturbation : str, tuple, list or dict
+        'ERBB2' (knockout), ('ERBB1', 'ERBB2') (double knockout), ('c_MYC', True),
+        [('ERBB1', False), ('ERBB2', False)] or {'ERBB1': False, 'ERBB2': False}
+        
+    Returns:
+    --------
+    tuple : (label, overrides) where overrides maps node names to fixed values
+    """
+    if isinstance(perturbation, str):
+        return perturbation, {perturbation: False}
+    # Python or NumPy boolean, without importing NumPy
+    if isinstance(perturbation, tuple) and len(perturbation) == 2 and type(perturbation[1]).__name__ in ('bool', 'bool_'):
+        perturbation = [perturbation]
+    # Gene names only, e.g. from itertools.combinations: knock them all out
+    elif isinstance(perturbation, (tuple, list)) and all(isinstance(node, str) for node in perturbation):
+        perturbation = [(node, False) for node in perturbation]
+    overrides = dict(perturbation.items() if isinstance(perturbation, dict) else perturbation)
+    overrides = {str(node): bool(value) for node, value in overrides.items()}
+    label = ' + '.join(f"{node}={'ON' if value else 'OFF'}" for node, value in overrides.items())
+    return label, overrides
+
+def screen_perturbations(model, perturbations, cell_cycle_markers=None, processes=None,
+                         include_wild_type=True, chunksize=1, backend='sat'):
+    """
+    Screen many knockouts and overexpressions on one shared compiled model
     
-    # First analyze the wild-type (no knockout)
-    wt_stable_states = model.stable_states
-    wt_result = {
-        'knockout': 'None (Wild-type)',
-        'stable_states_count': len(wt_stable_states),
-        'cell_cycle_activity': _calculate_marker_activity(wt_stable_states, cell_cycle_markers)
-    }
-    results.append(wt_result)
+    Each perturbation is applied as a clamp on the compiled rules instead of a
+    model copy, and the fixed points are found by the constraint solver or
+    enumerated over the unclamped nodes only. Perturbations are distributed
+    over a process pool.
     
-    # Analyze each knockout
-    for gene in genes_to_knockout:
-        # Perform knockout
-        ko_model = perform_knockout(model, gene)
-        
-        # Find stable states in knockout model
-        ko_stable_states = ko_model.stable_states
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    perturbations : list
+        Perturbations in any form accepted by perturbation_label
+    cell_cycle_markers : list, optional
+        List of genes that indicate cell cycle progression
+    processes : int, optional
+        Number of worker processes (None uses all cores, 1 runs in this process)
+    include_wild_type : bool
+        Whether to start with the unperturbed model
+    chunksize : int
+        Number of perturbations sent to a worker at a time
+    backend : str
+        'sat' (constraint solver), 'enumerate' (vectorized enumeration) or
+        'boon' (``stable_states`` of a perturbed copy of the BooN model, serial)
         
-        # Calculate cell cycle activity in knockout model
-        cell_cycle_activity = _calculate_marker_activity(ko_stable_states, cell_cycle_markers)
+    Returns:
+    --------
+    dict : Results in the same shape as analyze_knockouts
+    """
+    with span('knockout.screen'):
+        results = [row for row, _ in _iter_screen(model, perturbations, cell_cycle_markers, processes,
+                                                  include_wild_type, chunksize, backend)]
+    count('knockout.perturbations', len(results))
+    # pandas is only imported here, so screen workers start without it
+    import pandas as pd
+    with span('pandas'):
+        dataframe = pd.DataFrame(results)
+    return {
+        'results': results,
+        'dataframe': dataframe
+    }
+
+def iter_knockouts(model, perturbations, cell_cycle_markers=None, processes=1, until=None,
+                   include_wild_type=True, output=None, chunksize=1, backend='sat'):
+    """
+    Yield the result of every perturbation as soon as it and all earlier ones are done
+    
+    The perturbations are read lazily and only a few chunks per worker are in
+    flight, so generated screens (e.g. ``itertools.combinations(genes, 3)``)
+    run in bounded memory. Stopping the iteration, or the stop condition,
+    cancels the pending perturbations.
+    
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    perturbations : iterable
+        Perturbations in any form accepted by perturbation_label
+    cell_cycle_markers : list, optional
+        List of genes that indicate cell cycle progression
+    processes : int, optional
+        Number of worker processes (None uses all cores, 1 runs in this process)
+    until : callable, optional
+        Stop after the first yielded row for which until(row) is true, e.g.
+        ``lambda row: row['stable_states_count'] == 0``
+    include_wild_type : bool
+        Whether to start with the unperturbed model
+    output : str, optional
+        CSV path to append every row to as it is yielded, with the stable
+        states packed next to it (see results_store.ResultsWriter)
+    chunksize : int
+        Number of perturbations sent to a worker at a time
+    backend : str
+        'sat', 'enumerate' or 'boon' (see screen_perturbations)
         
-        # Store results
-        ko_result = {
-            'knockout': gene,
-            'stable_states_count': len(ko_stable_states),
-            'cell_cycle_activity': cell_cycle_activity
-        }
-        results.append(ko_result)
+    Yields:
+    -------
+    dict : One row of analyze_knockouts()['results'] plus the packed stable
+        states under 'states'
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if output is not None:
+        from src.utils.results_store import ResultsWriter
+    writer = ResultsWriter(output, compiled.nodes, SCREEN_COLUMNS) if output is not None else None
+    screen = _iter_screen(model, perturbations, cell_cycle_markers, processes, include_wild_type,
+                          chunksize, backend)
+    try:
+        for row, states in screen:
+            row = dict(row, states=states)
+            if writer is not None:
+                writer.write(row)
+            yield row
+            if until is not None and until(row):
+                return
+    finally:
+        screen.close()
+        if writer is not None:
+            writer.close()
+
+def _iter_screen(model, perturbations, cell_cycle_markers, processes, include_wild_type, chunksize,
+                 backend='sat'):
+    """Yield (result row, packed stable states) per perturbation, in order, as the workers finish them"""
+    if backend not in ('sat', 'enumerate', 'boon'):
+        raise ValueError(f"Unknown stable state backend '{backend}'")
+    if cell_cycle_markers is None:
+        cell_cycle_markers = DEFAULT_CELL_CYCLE_MARKERS
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    marker_mask, _ = compiled.clamp({m: True for m in cell_cycle_markers if m in compiled.index})
+    
+    # Perturbations are labelled as they are consumed, never collected
+    jobs = map(perturbation_label, perturbations)
+    if include_wild_type:
+        jobs = itertools.chain([('None (Wild-type)', {})], jobs)
+    
+    if backend == 'boon':
+        # BooN solves a perturbed copy of the original model, one at a time
+        from sympy import symbols
+        from src.models.state_set import StateSet
+        for label, overrides in jobs:
+            perturbed = copy.copy(model)
+            perturbed.desc = dict(model.desc)
+            perturbed.desc.update({symbols(node): value for node, value in overrides.items()})
+            states = StateSet.from_dicts(compiled.nodes, perturbed.stable_states).codes()
+            yield _result_row(label, states, marker_mask, len(cell_cycle_markers)), states
+        return
+    
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        for label, overrides in jobs:
+            yield _evaluate_perturbation(compiled, marker_mask, len(cell_cycle_markers), backend,
+                                         label, overrides)
+        return
     
+    # Workers receive the compiled rules once and rebuild the update function locally.
+    # A bounded window of chunks is kept in flight and drained in submission order
+    chunks = iter(lambda: list(itertools.islice(jobs, max(1, chunksize))), [])
+    window = deque()
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(compiled, marker_mask, len(cell_cycle_markers), backend)) as pool:
+        try:
+            for chunk in chunks:
+                window.append(pool.submit(_worker_chunk, chunk))
+                if len(window) >= processes * PENDING_CHUNKS_PER_WORKER:
+                    yield from window.popleft().result()
+            while window:
+                yield from window.popleft().result()
+        finally:
+            for future in window:
+                future.cancel()
+
+def _evaluate_perturbation(compiled, marker_mask, marker_count, backend, label, overrides):
+    """Fixed points and marker activity of one clamped model"""
+    states = fixed_points(compiled, overrides, backend=backend)
+    return _result_row(label, states, marker_mask, marker_count), states
+
+def _result_row(label, states, marker_mask, marker_count):
     return {
-        'results': results,
-        'dataframe': pd.DataFrame(results)
+        'knockout': label,
+        'stable_states_count': len(states),
+        'cell_cycle_activity': _packed_marker_activity(states, marker_mask, marker_count)
     }
 
+_worker_state = {}
+
+def _init_worker(compiled, marker_mask, marker_count, backend):
+    """Keep the shared compiled model in the worker process"""
+    _worker_state['args'] = (compiled, marker_mask, marker_count, backend)
+
+def _worker_chunk(jobs):
+    return [_evaluate_perturbation(*_worker_state['args'], *job) for job in jobs]
+
+def _packed_marker_activity(states, marker_mask, marker_count):
+    """Average percentage of active markers over packed states"""
+    if len(states) == 0 or marker_count == 0:
+        return 0.0
+    active = sum(bin(int(s) & marker_mask).count('1') for s in states)
+    return active / len(states) / marker_count * 100
+
 def _calculate_marker_activity(stable_states, markers):
     """
     Calculate the activity of cell cycle markers across stable states
@@ -104,6 +303,7 @@ def _calculate_marker_activity(stable_states, markers):
         return 0.0
         
     # Convert markers to symbols
+    from sympy import symbols
     marker_symbols = [symbols(m) for m in markers]
     
     # Calculate activity across all stable states
@@ -133,6 +333,9 @@ def visualize_knockout_effects(knockout_results, cell_cycle_threshold=50):
     --------
     matplotlib figure
     """
+    # Plotting is only imported here, so screen workers start without it
+    import matplotlib.pyplot as plt
+
     df = knockout_results['dataframe']
     
     # Create figure for visualization
@@ -0,0 +1,207 @@
+"""
+ERBB Signaling Network Phenotype Control Module
+
+This module runs the phenotype control screen (every node fixed OFF and ON)
+on several model variants at once, replacing the serial notebook loop:
+
+- The compiled models are sent once to every worker process, which keeps
+  them for all its jobs (as in knockout_analysis)
+- The N models x M perturbations jobs are submitted one by one to a process
+  pool; idle workers pick up the next pending job, so models with expensive
+  perturbations do not hold up the others
+- Results are written incrementally, in job order, to one table per model
+  with the columns of the existing ``*_phenotype_control.csv`` files and the
+  stable states bit-packed next to it (see results_store). Unlike the
+  notebook tables, the Unperturbed row stores its stable states too
+
+Functions:
+    phenotype_control_jobs: The perturbations of a phenotype control screen
+    run_phenotype_control: Screen several models and write one table per model
+"""
+
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+from src.models.model_file import MODEL_FILE_SUFFIX, load_model_file
+from src.models.state_set import StateSet
+from src.analysis.fixed_points import fixed_points
+from src.utils.results_store import ResultsWriter
+from src.utils.instrumentation import count, span
+
+# Nodes perturbed in the phenotype control analysis of the notebook
+PHENOTYPE_CONTROL_NODES = [
+    'EGF',
+    'ERBB1', 'ERBB2', 'ERBB3',
+    'ER_alpha', 'IGF1R',
+    'AKT1', 'MEK1', 'c_MYC',
+    'Cyclin_D1', 'Cyclin_E1',
+    'p21', 'p27'
+]
+
+# A stable state with any of these on allows cell cycle progression
+CELL_CYCLE_MARKERS = ['CDK2', 'CDK4', 'CDK6', 'pRB']
+
+PHENOTYPE_CONTROL_COLUMNS = ['node', 'fixed_value', 'stable_state_count', 'allows_cell_cycle', 'causes_arrest']
+
+
+def phenotype_control_jobs(nodes=None):
+    """
+    The perturbations of a phenotype control screen
+
+    Returns:
+    --------
+    list : (node, fixed value) pairs, starting with ('Unperturbed', None)
+    """
+    if nodes is None:
+        nodes = PHENOTYPE_CONTROL_NODES
+    jobs = [('Unperturbed', None)]
+    for node in nodes:
+        jobs.append((node, False))
+        jobs.append((node, True))
+    return jobs
+
+
+def _evaluate(compiled, marker_mask, backend, node, value):
+    """One row of the phenotype control table and its packed stable states"""
+    overrides = {} if value is None else {node: value}
+    states = fixed_points(compiled, overrides, backend=backend)
+    allows_cell_cycle = any(s & marker_mask for s in states)
+    return {
+        'node': node,
+        'fixed_value': value,
+        'stable_state_count': len(states),
+        'allows_cell_cycle': allows_cell_cycle,
+        'causes_arrest': not allows_cell_cycle
+    }, states
+
+
+_worker_state = {}
+
+
+def _init_worker(models, marker_masks, backend):
+    """Keep the compiled models in the worker process"""
+    _worker_state['models'] = models
+    _worker_state['marker_masks'] = marker_masks
+    _worker_state['backend'] = backend
+
+
+def _worker_job(model_index, node, value):
+    compiled = _worker_state['models'][model_index]
+    return _evaluate(compiled, _worker_state['marker_masks'][model_index], _worker_state['backend'], node, value)
+
+
+def run_phenotype_control(models, nodes=None, output_dir=None, markers=None, processes=None, backend='sat'):
+    """
+    Run the phenotype control screen on several models
+
+    Parameters:
+    -----------
+    models : dict
+        {name: BooN model, CompiledModel or path of a .cbn file}; with an
+        output directory the table of every model is ``<name>_phenotype_control.csv``
+    nodes : list, optional
+        Nodes to fix OFF and ON (PHENOTYPE_CONTROL_NODES by default); nodes
+        missing from a model are skipped for that model
+    output_dir : str, optional
+        Directory to write the tables to, row by row as results arrive
+    markers : list, optional
+        Cell cycle markers (CELL_CYCLE_MARKERS by default)
+    processes : int, optional
+        Worker processes (None uses all cores, 1 runs in this process)
+    backend : str
+        Fixed point backend, 'sat' or 'enumerate'
+
+    Returns:
+    --------
+    dict : {name: DataFrame in the phenotype control layout with a StateSet
+        of the stable states in the 'states' column}
+    """
+    if backend not in ('sat', 'enumerate'):
+        raise ValueError(f"Unknown stable state backend '{backend}', expected 'sat' or 'enumerate'")
+    if markers is None:
+        markers = CELL_CYCLE_MARKERS
+    names = list(models)
+    compiled = []
+    for name in names:
+        model = models[name]
+        if isinstance(model, str):
+            model = load_model_file(model)
+        compiled.append(model if isinstance(model, CompiledModel) else compile_model(model))
+    marker_masks = [c.clamp({m: True for m in markers if m in c.index})[0] for c in compiled]
+
+    # Interleave the models so that all tables fill up at the same pace
+    per_model = [[(node, value) for node, value in phenotype_control_jobs(nodes)
+                  if value is None or node in c.index] for c in compiled]
+    jobs = [(m, k) for k in range(max(len(j) for j in per_model)) for m in range(len(names))
+            if k < len(per_model[m])]
+
+    writers = {}
+    if output_dir is not None:
+        writers = {m: ResultsWriter(os.path.join(output_dir, f"{name}_phenotype_control.csv"),
+                                    compiled[m].nodes, PHENOTYPE_CONTROL_COLUMNS)
+                   for m, name in enumerate(names)}
+    rows = [[None] * len(j) for j in per_model]
+    written = [0] * len(names)
+
+    def collect(m, k, result):
+        rows[m][k] = result
+        # Rows are written in job order as soon as all earlier rows are done
+        while written[m] < len(rows[m]) and rows[m][written[m]] is not None:
+            if m in writers:
+                row, states = rows[m][written[m]]
+                writers[m].write(dict(row, states=states))
+            written[m] += 1
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    try:
+        with span('phenotype_control'):
+            if processes <= 1:
+                for m, k in jobs:
+                    collect(m, k, _evaluate(compiled[m], marker_masks[m], backend, *per_model[m][k]))
+            else:
+                with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                         initargs=(compiled, marker_masks, backend)) as pool:
+                    pending = {pool.submit(_worker_job, m, *per_model[m][k]): (m, k) for m, k in jobs}
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(*pending.pop(future), future.result())
+    finally:
+        for writer in writers.values():
+            writer.close()
+    count('phenotype_control.jobs', len(jobs))
+
+    results = {}
+    for m, name in enumerate(names):
+        table = pd.DataFrame([row for row, _ in rows[m]], columns=PHENOTYPE_CONTROL_COLUMNS)
+        table['states'] = [StateSet.from_codes(compiled[m].nodes, states) for _, states in rows[m]]
+        results[name] = table
+        if m in writers:
+            print(f"Results saved to {writers[m].filepath}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    parser = argparse.ArgumentParser(description='Run the phenotype control screen on several models')
+    parser.add_argument('models', nargs='*', help='Binary model files (.cbn); the two ERBB models by default')
+    parser.add_argument('--output-dir', default=os.path.join(project_dir, 'results'))
+    parser.add_argument('--processes', type=int, help='Worker processes (all cores by default)')
+    args = parser.parse_args()
+
+    paths = args.models or [os.path.join(project_dir, 'data', 'models', f'ERBB_{name}_model.cbn')
+                            for name in ('original', 'refined')]
+    # ERBB_original_model.cbn -> original_model, as in the existing result tables
+    named = {os.path.basename(path)[:-len(MODEL_FILE_SUFFIX)].replace('ERBB_', '', 1): path for path in paths}
+    for name, table in run_phenotype_control(named, output_dir=args.output_dir, processes=args.processes).items():
+        print(f"\n{name}:")
+        print(table.drop(columns=['states']).to_string(index=False))
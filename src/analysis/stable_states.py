@@ -48,10 +48,10 @@ def analyze_controllability(model):
 
 # Contents for src/analysis/stable_states.py
 
-import pandas as pd
-from sympy import symbols
+from src.analysis.fixed_points import iter_fixed_points, stable_state_set
+from src.models.compiled import compile_model
 
-def analyze_stable_states(model):
+def analyze_stable_states(model, backend='boon'):
     """
     Analyze stable states of the Boolean network model
     
@@ -59,47 +59,106 @@ def analyze_stable_states(model):
     -----------
     model : BooN model
         The Boolean network model
+    backend : str
+        Stable state solver: 'boon', 'sat' or 'enumerate' (see fixed_points.stable_states)
     
     Returns:
     --------
-    dict : Analysis results of stable states
+    dict : Analysis results of stable states, including the bit-packed 'state_set'
     """
-    # Get stable states from the model
-    stable_states = model.stable_states
+    # Get stable states from the model, packed once
+    states = stable_state_set(model, backend)
+    matrix = states.to_matrix()
+    key_of = {str(k): k for k in model.desc}
     
     # Prepare output in a structured format
     results = []
     
-    for i, state in enumerate(stable_states):
+    for i, (row, state) in enumerate(zip(matrix, states.to_dicts([key_of.get(n, n) for n in states.nodes]))):
         # Extract key information from each stable state
+        active_count = int(row.sum())
         state_info = {
             'id': i,
             'name': f"State {i+1}",
-            'value': sum(1 for v in state.values() if v),  # Count active nodes as value
-            'active_nodes': [str(node) for node, value in state.items() if value],
-            'inactive_nodes': [str(node) for node, value in state.items() if not value],
-            'state': state
+            'value': active_count,  # Count active nodes as value
+            'active_nodes': [node for node, value in zip(states.nodes, row) if value],
+            'inactive_nodes': [node for node, value in zip(states.nodes, row) if not value],
+            'state': state,
+            # Calculate percentage of active nodes
+            'active_percentage': (active_count / states.n) * 100
         }
-        
-        # Calculate percentage of active nodes
-        total_nodes = len(state)
-        active_count = sum(1 for v in state.values() if v)
-        state_info['active_percentage'] = (active_count / total_nodes) * 100
-        
         results.append(state_info)
     
-    # Create a summary DataFrame as well
-    df = pd.DataFrame({str(k): [v for v in state.values()] 
-                      for k, state in zip(range(len(stable_states)), stable_states)})
+    # Create a summary DataFrame as well: one column per state, one row per node
+    df = states.to_dataframe().T
+    df.columns = [str(i) for i in range(len(states))]
     
     # Store both the structured results and the DataFrame
     return {
         'states': results,
         'dataframe': df,
-        'count': len(stable_states)
+        'count': len(states),
+        'state_set': states
     }
 
-def get_node_stability(model, node_name):
+def iter_stable_states(model, where=None, until=None, overrides=None, limit=None):
+    """
+    Yield the stable states of the model one by one, as the solver finds them
+    
+    Nothing is collected, so the first states of a network with more stable
+    states than fit in memory are available at once, and the search stops as
+    soon as the caller stops iterating.
+    
+    Parameters:
+    -----------
+    model : BooN model
+        The Boolean network model
+    where : dict, optional
+        Required node values, e.g. {'pRB': False, 'p27': True}; pushed into the
+        constraint solver so only matching stable states are searched
+    until : callable or dict, optional
+        Stop after the first yielded state for which until(state_info) is true;
+        a dict of node values stops at the first state with these values
+    overrides : dict, optional
+        Perturbed nodes {name: bool}
+    limit : int, optional
+        Yield at most this many states
+    
+    Yields:
+    -------
+    dict : Stable state in the format of analyze_stable_states()['states'],
+        with the packed state as 'code'; states come in search order, not sorted
+    """
+    compiled = compile_model(model)
+    key_of = {str(k): k for k in model.desc}
+    keys = [key_of.get(n, n) for n in compiled.nodes]
+    stop_mask = stop_values = None
+    if isinstance(until, dict):
+        stop_mask, stop_values = compiled.clamp(until)
+    
+    codes = iter_fixed_points(compiled, overrides, conditions=where)
+    for i, code in enumerate(codes):
+        if limit is not None and i >= limit:
+            return
+        values = [bool((code >> j) & 1) for j in range(compiled.n)]
+        active_count = sum(values)
+        state_info = {
+            'id': i,
+            'name': f"State {i+1}",
+            'value': active_count,
+            'active_nodes': [node for node, value in zip(compiled.nodes, values) if value],
+            'inactive_nodes': [node for node, value in zip(compiled.nodes, values) if not value],
+            'state': dict(zip(keys, values)),
+            'active_percentage': (active_count / compiled.n) * 100,
+            'code': code
+        }
+        yield state_info
+        if stop_mask is not None and code & stop_mask == stop_values:
+            return
+        if callable(until) and until(state_info):
+            return
+
+def get_node_stability(model, node_name, backend='boon'):
     """
     Analyze how stable a specific node is across all stable states
     
@@ -109,22 +168,23 @@ def get_node_stability(model, node_name):
         The Boolean network model
     node_name : str
         Name of the node to analyze
+    backend : str
+        Stable state solver: 'boon', 'sat' or 'enumerate'
     
     Returns:
     --------
     dict : Stability information for the node
     """
-    stable_states = model.stable_states
-    node_symbol = symbols(node_name)
+    states = stable_state_set(model, backend)
     
     # Count in how many states the node is active
-    active_count = sum(1 for state in stable_states if state.get(node_symbol, False))
+    active_count = int(states.column(node_name).sum())
     
     return {
         'node': node_name,
         'active_count': active_count,
-        'total_states': len(stable_states),
-        'active_percentage': (active_count / len(stable_states)) * 100 if stable_states else 0
+        'total_states': len(states),
+        'active_percentage': (active_count / len(states)) * 100 if len(states) else 0
     }
 
 # Note: Each of these files is designed to encapsulate specific functionalities related to the ERBB signaling network analysis.
\ No newline at end of file
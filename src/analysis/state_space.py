@@ -0,0 +1,201 @@
+"""
+ERBB Signaling Network State Space Module
+
+This module works on the complete synchronous state-transition graph of a
+Boolean network. Every state is a packed integer, so the whole successor map
+of a 20-node model is a single uint32 array of 2^20 entries (4 MB). It includes
+functions to:
+
+- Build the successor map in one vectorized pass
+- Label every state with the attractor it ends up in (pointer doubling)
+- Extract limit cycles with their full state sequence and period
+- Compute exact basin sizes and transient length distributions
+
+Functions:
+    successor_table: Build the synchronous successor of every state
+    label_attractors: Find the recurrent states and the attractor reached by every state
+    transient_lengths: Number of steps every state needs to reach its attractor
+    find_cycles: Extract every attractor as the ordered list of its states
+    compute_basins: Exact basin size and transient statistics of every attractor
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+
+
+def successor_table(model, max_nodes=26, chunk_size=1 << 20):
+    """
+    Build the synchronous successor map of the complete state space
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    max_nodes : int
+        Refuse larger networks, since the table has 2^n entries
+    chunk_size : int
+        Number of states updated per vectorized call
+
+    Returns:
+    --------
+    numpy array : uint32 array where entry s is the successor of state s
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if compiled.n > min(max_nodes, 32):
+        raise ValueError(
+            f"The state space of {compiled.n} nodes is too large for an exhaustive table "
+            f"(max_nodes={max_nodes})"
+        )
+
+    size = 1 << compiled.n
+    succ = np.empty(size, dtype=np.uint32)
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        succ[start:stop] = compiled.step(np.arange(start, stop, dtype=np.uint32))
+    return succ
+
+
+def label_attractors(succ):
+    """
+    Find the attractor reached by every state of a functional graph
+
+    Uses pointer doubling: after k rounds ``jump`` holds succ^(2^k) and
+    ``low`` the smallest state among the next 2^k states of the trajectory.
+    Once 2^k exceeds the number of states, every jump lands on a cycle and the
+    smallest state of that cycle identifies the attractor.
+
+    Parameters:
+    -----------
+    succ : numpy array
+        Successor map from successor_table
+
+    Returns:
+    --------
+    tuple : (labels, recurrent) where labels[s] is the smallest state of the
+        attractor reached from s and recurrent[s] is True for attractor states
+    """
+    size = len(succ)
+    rounds = max(1, int(size - 1).bit_length())
+    jump = succ.copy()
+    low = np.minimum(np.arange(size, dtype=succ.dtype), succ)
+    for _ in range(rounds):
+        low = np.minimum(low, low[jump])
+        jump = jump[jump]
+
+    recurrent = np.zeros(size, dtype=bool)
+    recurrent[jump] = True
+    labels = low[jump]
+    return labels, recurrent
+
+
+def transient_lengths(succ, recurrent):
+    """
+    Compute how many synchronous steps every state needs to reach an attractor
+
+    Only the states still in transit are advanced at each step, so the cost is
+    proportional to the total transient length, not to 2^n times the longest one.
+
+    Returns:
+    --------
+    numpy array : uint32 array of transient lengths (0 for attractor states)
+    """
+    lengths = np.zeros(len(succ), dtype=np.uint32)
+    active = np.flatnonzero(~recurrent).astype(succ.dtype)
+    current = succ[active]
+    step = 1
+    while active.size:
+        arrived = recurrent[current]
+        lengths[active[arrived]] = step
+        active = active[~arrived]
+        current = succ[current[~arrived]]
+        step += 1
+    return lengths
+
+
+def find_cycles(succ, labels=None, recurrent=None):
+    """
+    Extract every attractor of a functional graph as the ordered list of its states
+
+    All cycles are walked in parallel from their smallest state, so the number of
+    Python-level iterations equals the longest period, not the number of states.
+
+    Parameters:
+    -----------
+    succ : numpy array
+        Successor map from successor_table
+    labels, recurrent : numpy arrays, optional
+        Output of label_attractors, computed if not given
+
+    Returns:
+    --------
+    list : One uint32 array per attractor (fixed points have a single state),
+        ordered by smallest state and starting from it
+    """
+    if labels is None or recurrent is None:
+        labels, recurrent = label_attractors(succ)
+
+    representatives, periods = np.unique(labels[recurrent], return_counts=True)
+    offsets = np.concatenate(([0], np.cumsum(periods)))
+    ordered = np.empty(offsets[-1], dtype=succ.dtype)
+
+    current = representatives.copy()
+    for k in range(int(periods.max()) if len(periods) else 0):
+        active = periods > k
+        ordered[offsets[:-1][active] + k] = current[active]
+        current = succ[current]
+    return np.split(ordered, offsets[1:-1])
+
+
+def compute_basins(model, succ=None):
+    """
+    Compute the exact basin size and transient length distribution of every attractor
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    succ : numpy array, optional
+        Precomputed successor map
+
+    Returns:
+    --------
+    pandas DataFrame : One row per attractor, ordered by representative state, with columns
+        representative, type, period, basin_size, basin_fraction, mean_transient,
+        max_transient and transient_counts (number of states per transient length)
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if succ is None:
+        succ = successor_table(compiled)
+
+    labels, recurrent = label_attractors(succ)
+    lengths = transient_lengths(succ, recurrent)
+
+    representatives, attractor_index, basin_sizes = np.unique(
+        labels, return_inverse=True, return_counts=True
+    )
+    periods = np.bincount(attractor_index[recurrent], minlength=len(representatives))
+
+    # One histogram of transient lengths per attractor in a single bincount
+    width = int(lengths.max()) + 1
+    histogram = np.bincount(
+        attractor_index.astype(np.int64) * width + lengths, minlength=len(representatives) * width
+    ).reshape(len(representatives), width)
+    steps = np.arange(width)
+    mean_transient = (histogram * steps).sum(axis=1) / basin_sizes
+
+    rows = []
+    for i, rep in enumerate(representatives):
+        longest = int(np.flatnonzero(histogram[i]).max())
+        rows.append({
+            'representative': int(rep),
+            'type': 'Stable State' if periods[i] == 1 else 'Cycle',
+            'period': int(periods[i]),
+            'basin_size': int(basin_sizes[i]),
+            'basin_fraction': basin_sizes[i] / len(succ),
+            'mean_transient': float(mean_transient[i]),
+            'max_transient': longest,
+            'transient_counts': histogram[i, :longest + 1].tolist()
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,268 @@
+"""
+ERBB Signaling Network Stochastic Simulation Module
+
+This module runs continuous-time asynchronous simulations in the style of
+MaBoSS: every node whose rule disagrees with its value flips after an
+exponentially distributed delay set by its up or down rate, so trajectories
+follow a Markov process on the Boolean states. It includes functions to:
+
+- Simulate many trajectories at once as bit-packed NumPy batches (Gillespie
+  steps over all unstable nodes of every trajectory in one vectorized update)
+- Record the probability of every node over a regular time grid, and the
+  distribution of the states reached at the end of the simulation
+- Report time-resolved probabilities of phenotype markers for a model or a
+  perturbed model
+
+Randomness comes from a numpy SeedSequence spawned once per batch, so results
+depend only on the seed and the batch size, not on the number of processes.
+
+Functions:
+    simulate_stochastic: Monte Carlo estimate of node probabilities over time
+    marker_probabilities: Time-resolved probabilities of phenotype markers
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import CompiledModel, compile_model
+from src.models.state_set import StateSet
+from src.utils.instrumentation import count, span
+
+PHENOTYPE_MARKERS = ['CDK2', 'CDK4', 'pRB', 'p21', 'p27']
+
+# Trajectories simulated together; bounds the memory of a batch to ~100 MB
+DEFAULT_BATCH_SIZE = 100_000
+
+
+def _node_values(spec, compiled, default):
+    """Per-node array from a scalar or a {node: value} dictionary"""
+    values = np.full(compiled.n, default, dtype=float)
+    if spec is None:
+        return values
+    if np.isscalar(spec):
+        values[:] = spec
+        return values
+    for node, value in spec.items():
+        if str(node) not in compiled.index:
+            raise KeyError(f"Unknown node '{node}'")
+        values[compiled.index[str(node)]] = value
+    return values
+
+
+def _rates(rates, compiled):
+    """Up and down rate arrays; ``rates`` maps nodes to a rate or an (up, down) pair"""
+    up = np.ones(compiled.n)
+    down = np.ones(compiled.n)
+    if rates is None:
+        return up, down
+    if np.isscalar(rates):
+        up *= rates
+        down *= rates
+    else:
+        for node, rate in rates.items():
+            if str(node) not in compiled.index:
+                raise KeyError(f"Unknown node '{node}'")
+            i = compiled.index[str(node)]
+            up[i], down[i] = rate if isinstance(rate, (tuple, list)) else (rate, rate)
+    if (up < 0).any() or (down < 0).any():
+        raise ValueError("Rates must be non-negative")
+    return up, down
+
+
+def _random_states(size, on_probability, clamp, rng):
+    """Packed initial states, node i on with on_probability[i], clamped nodes forced"""
+    states = np.zeros(size, dtype=np.uint64)
+    for i, p in enumerate(on_probability):
+        if p >= 1:
+            states |= np.uint64(1 << i)
+        elif p > 0:
+            states |= (rng.random(size) < p).astype(np.uint64) << np.uint64(i)
+    if clamp is not None:
+        mask, values = np.uint64(clamp[0]), np.uint64(clamp[1])
+        states = (states & ~mask) | values
+    return states
+
+
+def _simulate_batch(compiled, size, seed, on_probability, up, down, clamp, ticks):
+    """
+    Simulate one batch of trajectories
+
+    Returns:
+    --------
+    tuple : (per-tick count of trajectories with every node on, array of
+        shape (len(ticks), n); final packed states)
+    """
+    rng = np.random.default_rng(seed)
+    n, n_ticks = compiled.n, len(ticks)
+    shifts = np.arange(n, dtype=np.uint64)
+    max_time = ticks[-1]
+
+    states = _random_states(size, on_probability, clamp, rng)
+    time = np.zeros(size)
+    first_tick = np.zeros(size, dtype=np.intp)
+    # Difference array over ticks: a state held from tick a up to tick b adds its bits to [a, b)
+    delta = np.zeros((n_ticks + 1) * n, dtype=np.int64)
+    node_offsets = np.arange(n)
+
+    active = np.arange(size)
+    while active.size:
+        s = states[active]
+        targets = compiled.step(s, clamp)
+        unstable = (((targets ^ s)[:, None] >> shifts) & np.uint64(1)).astype(bool)
+        rising = ((targets[:, None] >> shifts) & np.uint64(1)).astype(bool)
+        rate = np.where(rising, up, down) * unstable
+        total = rate.sum(axis=1)
+
+        # Stable trajectories (total rate 0) keep their state forever
+        with np.errstate(divide='ignore'):
+            next_time = time[active] + rng.standard_exponential(active.size) / total
+
+        # The current state holds from its first unrecorded tick to the next event
+        last_tick = np.searchsorted(ticks, next_time, side='left')
+        held = last_tick > first_tick[active]
+        if held.any():
+            bits = ((s[held, None] >> shifts) & np.uint64(1)).astype(bool)
+            rows, cols = np.nonzero(bits)
+            starts = first_tick[active[held]][rows] * n + node_offsets[cols]
+            stops = last_tick[held][rows] * n + node_offsets[cols]
+            delta += np.bincount(starts, minlength=delta.size)
+            delta -= np.bincount(stops, minlength=delta.size)
+            first_tick[active[held]] = last_tick[held]
+
+        # Flip one unstable node per moving trajectory, chosen in proportion to its rate
+        moving = next_time <= max_time
+        if moving.any():
+            cumulative = np.cumsum(rate[moving], axis=1)
+            draw = rng.random(int(moving.sum())) * total[moving]
+            node = np.minimum((cumulative <= draw[:, None]).sum(axis=1), n - 1)
+            states[active[moving]] = s[moving] ^ (np.uint64(1) << node.astype(np.uint64))
+            time[active[moving]] = next_time[moving]
+        count('stochastic.events', int(moving.sum()))
+        active = active[moving]
+
+    return np.cumsum(delta.reshape(n_ticks + 1, n), axis=0)[:n_ticks], states
+
+
+_worker_state = {}
+
+
+def _init_worker(*args):
+    """Keep the compiled model and simulation settings in the worker process"""
+    _worker_state['args'] = args
+
+
+def _worker_batch(job):
+    compiled, on_probability, up, down, clamp, ticks = _worker_state['args']
+    size, seed = job
+    return _simulate_batch(compiled, size, seed, on_probability, up, down, clamp, ticks)
+
+
+def simulate_stochastic(model, n_trajectories=100_000, max_time=20.0, time_tick=0.2, rates=None,
+                        initial=None, perturbation=None, seed=None, batch_size=DEFAULT_BATCH_SIZE,
+                        processes=1):
+    """
+    Monte Carlo estimate of node probabilities under asynchronous stochastic dynamics
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model (at most 64 nodes)
+    n_trajectories : int
+        Number of random trajectories
+    max_time : float
+        Simulated time of every trajectory
+    time_tick : float
+        Spacing of the time grid probabilities are recorded on
+    rates : float or dict, optional
+        Transition rate of every node, or {node: rate} / {node: (up rate,
+        down rate)}; unlisted nodes have rate 1
+    initial : dict, optional
+        {node: probability of being on at time 0}; unlisted nodes start on
+        with probability 0.5, as in MaBoSS
+    perturbation : str, tuple, list or dict, optional
+        Knockouts or overexpressions in any form accepted by
+        knockout_analysis.perturbation_label, applied as a clamp
+    seed : int, optional
+        Seed of the SeedSequence that every batch draws its generator from
+    batch_size : int
+        Trajectories simulated together
+    processes : int, optional
+        Worker processes (None uses all cores, 1 runs in this process)
+
+    Returns:
+    --------
+    dict : 'times' (tick times), 'node_probabilities' (DataFrame of the
+        probability of every node being on, indexed by time), 'final_states'
+        (StateSet of the distinct states at max_time), 'final_probabilities'
+        (their frequencies) and 'trajectories'
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    if compiled.n > 64:
+        raise ValueError(f"Stochastic simulation supports at most 64 nodes, the model has {compiled.n}")
+    if n_trajectories < 1 or max_time <= 0 or time_tick <= 0:
+        raise ValueError("n_trajectories, max_time and time_tick must be positive")
+
+    clamp = None
+    if perturbation:
+        from src.analysis.knockout_analysis import perturbation_label
+        clamp = compiled.clamp(perturbation_label(perturbation)[1])
+    up, down = _rates(rates, compiled)
+    on_probability = _node_values(initial, compiled, 0.5)
+    ticks = np.arange(0.0, max_time + time_tick / 2, time_tick)
+
+    sizes = [min(batch_size, n_trajectories - start) for start in range(0, n_trajectories, batch_size)]
+    jobs = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    settings = (compiled, on_probability, up, down, clamp, ticks)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    with span('stochastic.simulate'):
+        if processes <= 1 or len(jobs) <= 1:
+            batches = [_simulate_batch(compiled, size, batch_seed, *settings[1:]) for size, batch_seed in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=settings) as pool:
+                batches = list(pool.map(_worker_batch, jobs))
+    count('stochastic.trajectories', n_trajectories)
+
+    on_counts = sum(b[0] for b in batches)
+    codes, frequencies = np.unique(np.concatenate([b[1] for b in batches]), return_counts=True)
+    return {
+        'times': ticks,
+        'node_probabilities': pd.DataFrame(on_counts / n_trajectories, index=pd.Index(ticks, name='time'),
+                                           columns=list(compiled.nodes)),
+        'final_states': StateSet.from_codes(compiled.nodes, codes),
+        'final_probabilities': frequencies / n_trajectories,
+        'trajectories': n_trajectories
+    }
+
+
+def marker_probabilities(model, markers=None, **kwargs):
+    """
+    Time-resolved probabilities of phenotype markers
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model, e.g. ERBB_Boolean.get_model('refined')
+    markers : list, optional
+        Marker nodes; PHENOTYPE_MARKERS by default
+    **kwargs :
+        Passed to simulate_stochastic (n_trajectories, max_time, rates,
+        initial, perturbation, seed, ...)
+
+    Returns:
+    --------
+    pandas DataFrame : Probability of every marker being on, indexed by time
+    """
+    if markers is None:
+        markers = PHENOTYPE_MARKERS
+    result = simulate_stochastic(model, **kwargs)
+    probabilities = result['node_probabilities']
+    missing = [m for m in markers if m not in probabilities.columns]
+    if missing:
+        print(f"Warning: markers not in the model: {', '.join(missing)}")
+    return probabilities[[m for m in markers if m in probabilities.columns]]
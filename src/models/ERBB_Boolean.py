@@ -4,115 +4,179 @@ import os
 # Add the parent directory of this project to the path to find BooN properly
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
 
-try:
-    from boon import BooN
-except ImportError:
-    print("BooN module not found in default path, trying alternative paths...")
-    # Try different paths to locate BooN
-    possible_paths = [
-        os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../BooN-1.60')),
-        os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')),
-        '/Users/raulduran/Documents/M1_GENIOMHE/Term_3/ModelingSystems/Project/BooN-1.60'
-    ]
-    
-    for path in possible_paths:
-        if path not in sys.path:
-            print(f"Adding path: {path}")
-            sys.path.append(path)
-    
-    try:
-        from boon import BooN
-        print(f"BooN module found and imported successfully!")
-    except ImportError as e:
-        print(f"Failed to import BooN: {str(e)}")
-        # Create a minimal BooN class as fallback
-        class BooN:
-            def __init__(self):
-                self.desc = {}
-                self.variables = []
-                print("Warning: Using placeholder BooN class!")
-            
-            def copy(self):
-                return BooN()
-            
-            @property
-            def interaction_graph(self):
-                import networkx as nx
-                return nx.DiGraph()
-                
-            def save(self, path):
-                print(f"Placeholder save to {path}")
-
-from sympy import symbols, And, Or, Not
-import matplotlib.pyplot as plt
-import networkx as nx
+from src.utils.instrumentation import span
+
+# Search paths for BooN when it is not installed; tried in order on first use
+BOON_SEARCH_PATHS = [
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../BooN-1.60')),
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')),
+    '/Users/raulduran/Documents/M1_GENIOMHE/Term_3/ModelingSystems/Project/BooN-1.60'
+]
+
+_boon_class = None
+
+
+class _PlaceholderBooN:
+    """Minimal BooN stand-in used when the BooN module cannot be imported"""
+
+    def __init__(self):
+        self.desc = {}
+        self.variables = []
+        print("Warning: Using placeholder BooN class!")
+
+    def copy(self):
+        return _PlaceholderBooN()
+
+    @property
+    def interaction_graph(self):
+        import networkx as nx
+        return nx.DiGraph()
+
+    def save(self, path):
+        print(f"Placeholder save to {path}")
+
+
+def _load_boon():
+    """Import the BooN class on first use, searching BOON_SEARCH_PATHS if needed"""
+    global _boon_class
+    if _boon_class is None:
+        try:
+            from boon import BooN
+        except ImportError:
+            for path in BOON_SEARCH_PATHS:
+                if path not in sys.path:
+                    sys.path.append(path)
+            try:
+                from boon import BooN
+            except ImportError as e:
+                print(f"Failed to import BooN: {str(e)}")
+                BooN = _PlaceholderBooN
+        _boon_class = BooN
+    return _boon_class
+
+
+def _erbb_rules(cyclin_d1):
+    """
+    Rules of the ERBB signaling network, in node order
+
+    Parameters:
+    -----------
+    cyclin_d1 : callable
+        Builds the Cyclin_D1 rule from the symbol table
+
+    Returns:
+    --------
+    dict : {symbol: sympy expression}
+    """
+    from sympy import symbols, And, Or, Not
+
+    names = ['EGF', 'ERBB1', 'ERBB2', 'ERBB3', 'ERBB1_2', 'ERBB1_3', 'ERBB2_3', 'ER_alpha', 'IGF1R',
+             'c_MYC', 'AKT1', 'MEK1', 'CDK2', 'CDK4', 'CDK6', 'Cyclin_D1', 'Cyclin_E1', 'p21', 'p27', 'pRB']
+    s = dict(zip(names, symbols(names)))
+    receptors = (s['ERBB1'], s['ERBB1_2'], s['ERBB1_3'], s['ERBB2_3'], s['IGF1R'])
+
+    return {
+        s['EGF']: s['EGF'],  # Input node stays the same
+        s['ERBB1']: s['EGF'],
+        s['ERBB2']: s['EGF'],
+        s['ERBB3']: s['EGF'],
+        s['ERBB1_2']: And(s['ERBB1'], s['ERBB2']),
+        s['ERBB1_3']: And(s['ERBB1'], s['ERBB3']),
+        s['ERBB2_3']: And(s['ERBB2'], s['ERBB3']),
+        s['ER_alpha']: Or(s['AKT1'], s['MEK1']),
+        s['IGF1R']: And(Or(s['ER_alpha'], s['AKT1']), Not(s['ERBB2_3'])),
+        s['c_MYC']: Or(s['AKT1'], s['MEK1'], s['ER_alpha']),
+        s['AKT1']: Or(*receptors),
+        s['MEK1']: Or(*receptors),
+        s['CDK2']: And(s['Cyclin_E1'], Not(s['p21']), Not(s['p27'])),
+        s['CDK4']: And(s['Cyclin_D1'], Not(s['p21']), Not(s['p27'])),
+        s['CDK6']: s['Cyclin_D1'],
+        s['Cyclin_D1']: cyclin_d1(s),
+        s['Cyclin_E1']: s['c_MYC'],
+        s['p21']: And(s['ER_alpha'], Not(s['AKT1']), Not(s['c_MYC']), Not(s['CDK4'])),
+        s['p27']: And(s['ER_alpha'], Not(s['CDK4']), Not(s['CDK2']), Not(s['AKT1']), Not(s['c_MYC'])),
+        s['pRB']: Or(And(s['CDK4'], s['CDK6']), And(s['CDK4'], s['CDK6'], s['CDK2'])),
+    }
+
 
 def create_erbb_original_model():
     """Creates and returns the ERBB signaling network with original Cyclin_D1 rule as a Boolean model"""
-    model = BooN()
-
-    # Define the rules for each node in the network
-    # The BooN library uses sympy for boolean logic expressions
-    model.desc[symbols('EGF')] = symbols('EGF')  # Input node stays the same
-    model.desc[symbols('ERBB1')] = symbols('EGF')
-    model.desc[symbols('ERBB2')] = symbols('EGF')
-    model.desc[symbols('ERBB3')] = symbols('EGF')
-    model.desc[symbols('ERBB1_2')] = And(symbols('ERBB1'), symbols('ERBB2'))
-    model.desc[symbols('ERBB1_3')] = And(symbols('ERBB1'), symbols('ERBB3'))
-    model.desc[symbols('ERBB2_3')] = And(symbols('ERBB2'), symbols('ERBB3'))
-    model.desc[symbols('ER_alpha')] = Or(symbols('AKT1'), symbols('MEK1'))
-    model.desc[symbols('IGF1R')] = And(Or(symbols('ER_alpha'), symbols('AKT1')), Not(symbols('ERBB2_3')))
-    model.desc[symbols('c_MYC')] = Or(symbols('AKT1'), symbols('MEK1'), symbols('ER_alpha'))
-    model.desc[symbols('AKT1')] = Or(symbols('ERBB1'), symbols('ERBB1_2'), symbols('ERBB1_3'), symbols('ERBB2_3'), symbols('IGF1R'))
-    model.desc[symbols('MEK1')] = Or(symbols('ERBB1'), symbols('ERBB1_2'), symbols('ERBB1_3'), symbols('ERBB2_3'), symbols('IGF1R'))
-    model.desc[symbols('CDK2')] = And(symbols('Cyclin_E1'), Not(symbols('p21')), Not(symbols('p27')))
-    model.desc[symbols('CDK4')] = And(symbols('Cyclin_D1'), Not(symbols('p21')), Not(symbols('p27')))
-    model.desc[symbols('CDK6')] = symbols('Cyclin_D1')
-    
+    from sympy import Or
+
+    model = _load_boon()()
     # Original loose rule for Cyclin_D1
-    model.desc[symbols('Cyclin_D1')] = Or(symbols('AKT1'), symbols('MEK1'), symbols('ER_alpha'), symbols('c_MYC'))
-    
-    model.desc[symbols('Cyclin_E1')] = symbols('c_MYC')
-    model.desc[symbols('p21')] = And(symbols('ER_alpha'), Not(symbols('AKT1')), Not(symbols('c_MYC')), Not(symbols('CDK4')))
-    model.desc[symbols('p27')] = And(symbols('ER_alpha'), Not(symbols('CDK4')), Not(symbols('CDK2')), Not(symbols('AKT1')), Not(symbols('c_MYC')))
-    model.desc[symbols('pRB')] = Or(And(symbols('CDK4'), symbols('CDK6')), And(symbols('CDK4'), symbols('CDK6'), symbols('CDK2')))
-    
+    model.desc.update(_erbb_rules(lambda s: Or(s['AKT1'], s['MEK1'], s['ER_alpha'], s['c_MYC'])))
     return model
 
 def create_erbb_refined_model():
     """Creates and returns the ERBB signaling network with refined Cyclin_D1 rule as a Boolean model"""
-    model = BooN()
-
-    # Define the rules for each node in the network
-    # The BooN library uses sympy for boolean logic expressions
-    model.desc[symbols('EGF')] = symbols('EGF')  # Input node stays the same
-    model.desc[symbols('ERBB1')] = symbols('EGF')
-    model.desc[symbols('ERBB2')] = symbols('EGF')
-    model.desc[symbols('ERBB3')] = symbols('EGF')
-    model.desc[symbols('ERBB1_2')] = And(symbols('ERBB1'), symbols('ERBB2'))
-    model.desc[symbols('ERBB1_3')] = And(symbols('ERBB1'), symbols('ERBB3'))
-    model.desc[symbols('ERBB2_3')] = And(symbols('ERBB2'), symbols('ERBB3'))
-    model.desc[symbols('ER_alpha')] = Or(symbols('AKT1'), symbols('MEK1'))
-    model.desc[symbols('IGF1R')] = And(Or(symbols('ER_alpha'), symbols('AKT1')), Not(symbols('ERBB2_3')))
-    model.desc[symbols('c_MYC')] = Or(symbols('AKT1'), symbols('MEK1'), symbols('ER_alpha'))
-    model.desc[symbols('AKT1')] = Or(symbols('ERBB1'), symbols('ERBB1_2'), symbols('ERBB1_3'), symbols('ERBB2_3'), symbols('IGF1R'))
-    model.desc[symbols('MEK1')] = Or(symbols('ERBB1'), symbols('ERBB1_2'), symbols('ERBB1_3'), symbols('ERBB2_3'), symbols('IGF1R'))
-    model.desc[symbols('CDK2')] = And(symbols('Cyclin_E1'), Not(symbols('p21')), Not(symbols('p27')))
-    model.desc[symbols('CDK4')] = And(symbols('Cyclin_D1'), Not(symbols('p21')), Not(symbols('p27')))
-    model.desc[symbols('CDK6')] = symbols('Cyclin_D1')
-    
+    from sympy import And, Or
+
+    model = _load_boon()()
     # Refined stricter rule for Cyclin_D1
-    model.desc[symbols('Cyclin_D1')] = And(symbols('ER_alpha'), symbols('c_MYC'), Or(symbols('AKT1'), symbols('MEK1')))
-    
-    model.desc[symbols('Cyclin_E1')] = symbols('c_MYC')
-    model.desc[symbols('p21')] = And(symbols('ER_alpha'), Not(symbols('AKT1')), Not(symbols('c_MYC')), Not(symbols('CDK4')))
-    model.desc[symbols('p27')] = And(symbols('ER_alpha'), Not(symbols('CDK4')), Not(symbols('CDK2')), Not(symbols('AKT1')), Not(symbols('c_MYC')))
-    model.desc[symbols('pRB')] = Or(And(symbols('CDK4'), symbols('CDK6')), And(symbols('CDK4'), symbols('CDK6'), symbols('CDK2')))
-    
+    model.desc.update(_erbb_rules(lambda s: And(s['ER_alpha'], s['c_MYC'], Or(s['AKT1'], s['MEK1']))))
     return model
 
+# Registry of the named models; each is built on first access and then shared
+MODEL_BUILDERS = {
+    'original': create_erbb_original_model,
+    'refined': create_erbb_refined_model,
+}
+
+# Module attributes resolved through the registry ('model' is the default, refined version)
+_MODEL_ATTRIBUTES = {'original_model': 'original', 'refined_model': 'refined', 'model': 'refined'}
+
+_models = {}
+
+
+def get_model(name='refined'):
+    """
+    Return a named model, building it on first access
+
+    Parameters:
+    -----------
+    name : str
+        Key of MODEL_BUILDERS ('original' or 'refined')
+
+    Returns:
+    --------
+    BooN model : The shared instance of the model
+    """
+    if name not in _models:
+        if name not in MODEL_BUILDERS:
+            raise KeyError(f"Unknown model '{name}', expected one of {sorted(MODEL_BUILDERS)}")
+        try:
+            with span('models.build'):
+                _models[name] = MODEL_BUILDERS[name]()
+        except Exception as e:
+            print(f"Error initializing model '{name}': {str(e)}")
+            # Provide a default empty model as fallback
+            _models[name] = _load_boon()()
+    return _models[name]
+
+
+def register_model(name, builder):
+    """Add a named model to the registry; it is built on first access"""
+    MODEL_BUILDERS[name] = builder
+    _models.pop(name, None)
+
+
+def clear_models():
+    """Drop the built models; they are rebuilt on next access"""
+    _models.clear()
+
+
+def __getattr__(name):
+    # original_model, refined_model and model are built lazily on first access
+    if name in _MODEL_ATTRIBUTES:
+        return get_model(_MODEL_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def visualize_network(model, save_path=None, title="ERBB Signaling Network"):
     """Visualize the network model"""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     # First, get the interaction graph
     ig = model.interaction_graph
     
@@ -156,8 +220,10 @@ def visualize_network(model, save_path=None, title="ERBB Signaling Network"):
 
 def compare_models():
     """Compare the original and refined models side by side"""
-    original = create_erbb_original_model()
-    refined = create_erbb_refined_model()
+    from sympy import symbols
+
+    original = get_model('original')
+    refined = get_model('refined')
     
     print("Original Model - Cyclin D1 Rule:")
     print(f"Cyclin_D1 = {original.desc[symbols('Cyclin_D1')]}")
@@ -165,40 +231,31 @@ def compare_models():
     print("\nRefined Model - Cyclin D1 Rule:")
     print(f"Cyclin_D1 = {refined.desc[symbols('Cyclin_D1')]}")
     
-    # Compare stable states
+    # Compare stable states; the refined model only re-solves what is downstream of the edit
     try:
-        original_states = original.stable_states
-        refined_states = refined.stable_states
+        from src.analysis.incremental import IncrementalAnalyzer
+        analyzer = IncrementalAnalyzer(original)
+        original_states = analyzer.stable_states()
+        changes = analyzer.update(refined)
+        refined_states = analyzer.stable_states()
         
-        print(f"\nOriginal Model has {len(original_states)} stable states")
+        print(f"\nChanged rules: {', '.join(changes['changed'])} "
+              f"({len(changes['affected'])} nodes affected downstream)")
+        print(f"Original Model has {len(original_states)} stable states")
         print(f"Refined Model has {len(refined_states)} stable states")
     except Exception as e:
         print(f"Error calculating stable states: {str(e)}")
     
     return original, refined
 
-# Explicitly export these names
-__all__ = ['original_model', 'refined_model', 'model', 'visualize_network', 'compare_models']
-
-# Initialize the models - wrap in try/except to ensure they're always created
-try:
-    # Create both model instances to be imported by other modules
-    print("Initializing ERBB signaling models...")
-    original_model = create_erbb_original_model()
-    refined_model = create_erbb_refined_model()
-
-    # Default model to use (refined version)
-    model = refined_model
-    print("Models initialized successfully!")
-except Exception as e:
-    print(f"Error initializing models: {str(e)}")
-    # Provide default empty models as fallback
-    original_model = BooN()
-    refined_model = BooN()
-    model = refined_model
+# Explicitly export these names (the models are resolved lazily by __getattr__)
+__all__ = ['original_model', 'refined_model', 'model', 'get_model', 'register_model', 'clear_models',
+           'visualize_network', 'compare_models']
 
 # If run as main script
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     try:
         # Compare the models
         original_model, refined_model = compare_models()
@@ -0,0 +1,546 @@
+"""
+Compiled Boolean Network Engine
+
+This module lowers the sympy update rules of a BooN model to bitwise integer
+operations so that many states can be advanced in a single call. It includes:
+
+- A small rule representation independent of sympy
+- Lowering of sympy boolean expressions (And, Or, Not, Xor, Implies, ...)
+- Synchronous update of packed integer states, NumPy arrays of packed states
+  and boolean state matrices
+- Conversion helpers between packed states and state dictionaries
+
+A state is packed into an integer word where bit ``i`` holds the value of
+``nodes[i]``. The node order follows the insertion order of ``model.desc``.
+
+Functions:
+    compile_model: Compile a BooN model into a CompiledModel
+    lower_sympy_rule: Lower a sympy boolean expression to the rule representation
+"""
+
+from functools import lru_cache
+
+from src.utils.instrumentation import count
+
+# NumPy is imported by the array paths only: screen workers that solve with
+# the constraint solver never step arrays, and start without it
+
+# Rule representation: nested tuples
+#   ('const', bool) | ('var', index) | ('not', rule)
+#   ('and', (rule, ...)) | ('or', (rule, ...)) | ('xor', (rule, ...))
+TRUE_RULE = ('const', True)
+FALSE_RULE = ('const', False)
+
+
+def lower_sympy_rule(expr, index):
+    """
+    Lower a sympy boolean expression to the compiled rule representation
+
+    Parameters:
+    -----------
+    expr : sympy expression or bool
+        Update rule taken from ``model.desc``
+    index : dict
+        Mapping from node name to bit position
+
+    Returns:
+    --------
+    tuple : Rule in the nested tuple representation
+    """
+    # Python and NumPy booleans and integers
+    if isinstance(expr, (bool, int)) or type(expr).__module__ == 'numpy':
+        return TRUE_RULE if expr else FALSE_RULE
+
+    # Dispatch on class names so that sympy is not needed to evaluate rules
+    kind = type(expr).__name__
+    if getattr(expr, 'is_Symbol', False):
+        return ('var', index[str(expr)])
+    if kind in ('BooleanTrue', 'true'):
+        return TRUE_RULE
+    if kind in ('BooleanFalse', 'false'):
+        return FALSE_RULE
+
+    args = [lower_sympy_rule(a, index) for a in getattr(expr, 'args', ())]
+    if kind == 'Not':
+        return ('not', args[0])
+    if kind == 'And':
+        return ('and', tuple(args))
+    if kind == 'Or':
+        return ('or', tuple(args))
+    if kind == 'Xor':
+        return ('xor', tuple(args))
+    if kind == 'Nand':
+        return ('not', ('and', tuple(args)))
+    if kind == 'Nor':
+        return ('not', ('or', tuple(args)))
+    if kind == 'Xnor':
+        return ('not', ('xor', tuple(args)))
+    if kind == 'Implies':
+        return ('or', (('not', args[0]), args[1]))
+    if kind == 'Equivalent':
+        return ('or', (('and', tuple(args)), ('and', tuple(('not', a) for a in args))))
+    if kind == 'ITE':
+        cond, then, other = args
+        return ('or', (('and', (cond, then)), ('and', (('not', cond), other))))
+    raise ValueError(f"Unsupported expression in update rule: {expr!r} ({kind})")
+
+
+@lru_cache(maxsize=4096)
+def _lower_cached(expr, names):
+    """lower_sympy_rule memoized on the expression and the node order"""
+    return lower_sympy_rule(expr, {name: i for i, name in enumerate(names)})
+
+
+def popcount(values):
+    """Number of set bits of every element of an unsigned integer array"""
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    values = np.asarray(values).astype(np.uint64)
+    counts = np.zeros(values.shape, dtype=np.int64)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+    for shift in range(0, 64, 8):
+        counts += table[(values >> np.uint64(shift)) & np.uint64(0xFF)]
+    return counts
+
+
+def rule_variables(rule):
+    """Return the sorted tuple of node indices a rule depends on"""
+    found = set()
+    stack = [rule]
+    while stack:
+        op, arg = stack.pop()
+        if op == 'var':
+            found.add(arg)
+        elif op == 'not':
+            stack.append(arg)
+        elif op != 'const':
+            stack.extend(arg)
+    return tuple(sorted(found))
+
+
+def evaluate_partial(rule, values):
+    """
+    Evaluate a rule under a partial assignment with three-valued (Kleene) logic
+
+    Parameters:
+    -----------
+    rule : tuple
+        Rule in the nested tuple representation
+    values : dict
+        Known node values {index: bool}
+
+    Returns:
+    --------
+    bool or None : The value of the rule, or None if it depends on unknown nodes
+    """
+    op, arg = rule
+    if op == 'const':
+        return arg
+    if op == 'var':
+        return values.get(arg)
+    if op == 'not':
+        value = evaluate_partial(arg, values)
+        return None if value is None else not value
+    if op == 'xor':
+        parity = False
+        for a in arg:
+            value = evaluate_partial(a, values)
+            if value is None:
+                return None
+            parity ^= value
+        return parity
+    # and/or: a controlling operand decides the result even if others are unknown
+    controlling = op == 'or'
+    unknown = False
+    for a in arg:
+        value = evaluate_partial(a, values)
+        if value is None:
+            unknown = True
+        elif value == controlling:
+            return controlling
+    return None if unknown else not controlling
+
+
+def render_rule(rule, nodes):
+    """Render a rule as a canonical string using node names (commutative operands sorted)"""
+    op, arg = rule
+    if op == 'const':
+        return '1' if arg else '0'
+    if op == 'var':
+        return nodes[arg]
+    if op == 'not':
+        return f"!{render_rule(arg, nodes)}"
+    return f"{op}(" + ','.join(sorted(render_rule(a, nodes) for a in arg)) + ')'
+
+
+def _emit(rule):
+    """Render a rule as a Python expression over the locals x0..xn, ONE and ZERO"""
+    op, arg = rule
+    if op == 'const':
+        return 'ONE' if arg else 'ZERO'
+    if op == 'var':
+        return f'x{arg}'
+    if op == 'not':
+        return f'(ONE ^ {_emit(arg)})'
+    if not arg:
+        # Empty conjunction is true, empty disjunction/parity is false
+        return 'ONE' if op == 'and' else 'ZERO'
+    symbol = {'and': ' & ', 'or': ' | ', 'xor': ' ^ '}[op]
+    return '(' + symbol.join(_emit(a) for a in arg) + ')'
+
+
+class CompiledModel:
+    """
+    Boolean network whose rules are lowered to bitwise operations
+
+    Attributes:
+    -----------
+    nodes : tuple of str
+        Node names; bit ``i`` of a packed state is the value of ``nodes[i]``
+    index : dict
+        Mapping from node name to bit position
+    rules : tuple
+        Rule of every node in the nested tuple representation
+    regulators : tuple of tuple
+        Sorted node indices each rule depends on
+    tables : tuple of RuleTable
+        Truth table of every rule (see truth_tables), built on first use
+    """
+
+    def __init__(self, nodes, rules):
+        if len(nodes) != len(rules):
+            raise ValueError("Every node needs exactly one rule")
+        self.nodes = tuple(str(n) for n in nodes)
+        self.index = {name: i for i, name in enumerate(self.nodes)}
+        self.rules = tuple(rules)
+        self.regulators = tuple(rule_variables(r) for r in self.rules)
+        self._targets = None
+        self._tables = None
+
+    def __getattr__(self, name):
+        # The update functions are generated on first use, so analyses that never
+        # step the network (the constraint solver, reductions) skip the compilation
+        if name in ('_step_packed', '_step_matrix', '_int_consts', '_array_consts'):
+            self._build()
+            return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    # Generated functions are not picklable; rebuild them in worker processes
+    def __getstate__(self):
+        return {'nodes': self.nodes, 'rules': self.rules}
+
+    def __setstate__(self, state):
+        self.__init__(state['nodes'], state['rules'])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"CompiledModel({len(self.nodes)} nodes)"
+
+    @property
+    def n(self):
+        """Number of nodes in the network"""
+        return len(self.nodes)
+
+    def _build(self):
+        """Generate the update functions for packed words and state matrices"""
+        used = sorted(set(i for regs in self.regulators for i in regs))
+        exprs = [_emit(r) for r in self.rules]
+
+        packed = ['def _step_packed(s, ONE, ZERO, S):']
+        packed += [f'    x{i} = (s >> S[{i}]) & ONE' for i in used]
+        # One statement per node keeps the generated code flat for large networks
+        packed.append('    r = ZERO')
+        packed += [f'    r = r | ({e} << S[{i}])' for i, e in enumerate(exprs)]
+        packed.append('    return r')
+
+        matrix = ['def _step_matrix(X, out, ONE, ZERO):']
+        matrix += [f'    x{i} = X[:, {i}]' for i in used]
+        matrix += [f'    out[:, {i}] = {e}' for i, e in enumerate(exprs)]
+        matrix.append('    return out')
+
+        namespace = {}
+        exec(compile('\n'.join(packed) + '\n\n' + '\n'.join(matrix), '<compiled-boolean-model>', 'exec'),
+             namespace)
+        self._step_packed = namespace['_step_packed']
+        self._step_matrix = namespace['_step_matrix']
+        self._int_consts = (1, 0, tuple(range(self.n)))
+        self._array_consts = {}
+
+    def _consts_for(self, dtype):
+        """Typed constants so NumPy never promotes the packed words"""
+        consts = self._array_consts.get(dtype)
+        if consts is None:
+            import numpy as np
+            if self.n > np.iinfo(dtype).bits:
+                raise ValueError(f"{self.n} nodes do not fit into {dtype} words")
+            t = dtype.type
+            consts = (t(1), t(0), tuple(t(i) for i in range(self.n)))
+            self._array_consts[dtype] = consts
+        return consts
+
+    def step(self, states, clamp=None):
+        """
+        Apply one synchronous update to packed states
+
+        Parameters:
+        -----------
+        states : int or numpy array of unsigned integers
+            A single packed state or an array of packed states
+        clamp : tuple, optional
+            (mask, values) from clamp(); masked nodes are forced to their values
+
+        Returns:
+        --------
+        int or numpy array : Successor state(s), same type and dtype as the input
+        """
+        if not isinstance(states, int):
+            import numpy as np
+            if isinstance(states, np.integer):
+                states = int(states)
+        if isinstance(states, int):
+            result = int(self._step_packed(states, *self._int_consts))
+            if clamp is not None:
+                result = (result & ~clamp[0]) | clamp[1]
+            return result
+        states = np.asarray(states)
+        if states.dtype.kind != 'u':
+            states = states.astype(np.uint64)
+        count('states.evaluated', states.size)
+        result = self._step_packed(states, *self._consts_for(states.dtype))
+        if np.ndim(result) == 0:
+            result = np.full(states.shape, result, dtype=states.dtype)
+        if clamp is not None:
+            mask, values = (states.dtype.type(c) for c in clamp)
+            result = (result & ~mask) | values
+        return result
+
+    def clamp(self, overrides):
+        """
+        Build a clamp for perturbations without touching the rules
+
+        Parameters:
+        -----------
+        overrides : dict
+            {node name or symbol: bool}, e.g. {'ERBB2': False} for a knockout
+
+        Returns:
+        --------
+        tuple : (mask, values) packed integers to pass as ``clamp``
+        """
+        mask = values = 0
+        for node, value in overrides.items():
+            if str(node) not in self.index:
+                raise KeyError(f"Unknown node '{node}'")
+            bit = 1 << self.index[str(node)]
+            mask |= bit
+            if value:
+                values |= bit
+        return mask, values
+
+    @property
+    def tables(self):
+        """Truth table of every rule, shared with other models through the rule table cache"""
+        if self._tables is None:
+            from src.models.truth_tables import rule_table
+            self._tables = tuple(rule_table(r, regs) for r, regs in zip(self.rules, self.regulators))
+        return self._tables
+
+    @property
+    def targets(self):
+        """Tuple of the node indices whose rule reads each node"""
+        if self._targets is None:
+            targets = [[] for _ in self.nodes]
+            for i, regs in enumerate(self.regulators):
+                for r in regs:
+                    targets[r].append(i)
+            self._targets = tuple(tuple(t) for t in targets)
+        return self._targets
+
+    def propagate(self, overrides, known=None):
+        """
+        Propagate perturbations and constant rules through the network
+
+        A node is frozen when its rule evaluates to a constant given the frozen
+        nodes. Frozen nodes take their value in every attractor, so clamping all of
+        them leaves the fixed points unchanged while removing them from the search.
+
+        Parameters:
+        -----------
+        overrides : dict
+            Clamped nodes {index: bool}
+        known : dict, optional
+            Result of a previous propagation whose overrides are a subset of these,
+            used as a starting point unless a new override contradicts it. Only
+            the targets of the new overrides are then revisited.
+
+        Returns:
+        --------
+        dict : Frozen nodes {index: bool}, including the overrides
+        """
+        # A clamp that contradicts a derived value invalidates the previous result
+        if known and any(known.get(i, v) != v for i, v in overrides.items()):
+            known = None
+        if known is None:
+            frozen = dict(overrides)
+            queue = [i for i in range(self.n) if i not in frozen]
+        else:
+            # Everything else is already propagated; start from the targets of the new overrides
+            frozen = dict(known)
+            frozen.update(overrides)
+            queue = list({t for i in overrides if i not in known for t in self.targets[i] if t not in frozen})
+        queued = set(queue)
+        tables = self.tables
+        while queue:
+            i = queue.pop()
+            queued.discard(i)
+            if i in frozen:
+                continue
+            value = tables[i].partial(frozen)
+            if value is None:
+                continue
+            frozen[i] = value
+            for t in self.targets[i]:
+                if t not in frozen and t not in queued:
+                    queue.append(t)
+                    queued.add(t)
+        return frozen
+
+    def fixed_points(self, clamp=None, max_free=30, chunk_size=1 << 20):
+        """
+        Enumerate the fixed points of the network, optionally under a clamp
+
+        Only the unclamped nodes are enumerated, so every perturbed node halves
+        the work. States are checked in vectorized chunks.
+
+        Returns:
+        --------
+        numpy array : Sorted uint64 array of packed fixed points
+        """
+        import numpy as np
+        mask, values = clamp if clamp is not None else (0, 0)
+        free_bits = [i for i in range(self.n) if not (mask >> i) & 1]
+        if len(free_bits) > max_free:
+            raise ValueError(
+                f"{len(free_bits)} free nodes are too many to enumerate (max_free={max_free})"
+            )
+
+        # Narrow words are markedly faster to update
+        dtype = np.dtype(np.uint32) if self.n <= 32 else np.dtype(np.uint64)
+        t = dtype.type
+        found = []
+        total = 1 << len(free_bits)
+        for start in range(0, total, chunk_size):
+            counter = np.arange(start, min(start + chunk_size, total), dtype=dtype)
+            if not mask:
+                states = counter
+            else:
+                states = np.full(len(counter), values, dtype=dtype)
+                for k, bit in enumerate(free_bits):
+                    states |= ((counter >> t(k)) & t(1)) << t(bit)
+            found.append(states[self.step(states, clamp) == states])
+        return np.sort(np.concatenate(found)).astype(np.uint64)
+
+    def step_matrix(self, matrix):
+        """
+        Apply one synchronous update to a boolean matrix of states x nodes
+
+        This form has no limit on the number of nodes.
+        """
+        import numpy as np
+        matrix = np.asarray(matrix, dtype=bool)
+        out = np.empty_like(matrix)
+        return self._step_matrix(matrix, out, True, False)
+
+    def simulate(self, states, steps):
+        """
+        Run synchronous trajectories from many initial states at once
+
+        Returns:
+        --------
+        numpy array : Array of shape (steps + 1, len(states)) with the visited states
+        """
+        import numpy as np
+        states = np.asarray(states)
+        if states.dtype.kind != 'u':
+            states = states.astype(np.uint64)
+        history = np.empty((steps + 1,) + states.shape, dtype=states.dtype)
+        history[0] = states
+        for t in range(steps):
+            history[t + 1] = self.step(history[t])
+        return history
+
+    def encode(self, state):
+        """Pack a state dictionary (keys may be names or sympy symbols) into an integer"""
+        code = 0
+        for key, value in state.items():
+            i = self.index.get(str(key))
+            if i is not None and bool(value):
+                code |= 1 << i
+        return code
+
+    def decode(self, code):
+        """Unpack an integer state into a dictionary {node name: bool}"""
+        code = int(code)
+        return {name: bool((code >> i) & 1) for i, name in enumerate(self.nodes)}
+
+    def to_matrix(self, codes):
+        """Unpack an array of packed states into a boolean matrix of states x nodes"""
+        import numpy as np
+        if self.n > 64:
+            # Wider states only exist as Python integers; unpack their bytes
+            width = (self.n + 7) // 8
+            raw = np.frombuffer(b''.join(int(c).to_bytes(width, 'little') for c in codes), dtype=np.uint8)
+            return np.unpackbits(raw.reshape(-1, width), axis=1, count=self.n, bitorder='little').astype(bool)
+        codes = np.asarray(codes, dtype=np.uint64)
+        shifts = np.arange(self.n, dtype=np.uint64)
+        return ((codes[:, None] >> shifts) & np.uint64(1)).astype(bool)
+
+    def from_matrix(self, matrix):
+        """Pack a boolean matrix of states x nodes into an array of uint64 states"""
+        import numpy as np
+        matrix = np.asarray(matrix, dtype=bool)
+        weights = np.uint64(1) << np.arange(self.n, dtype=np.uint64)
+        return (matrix.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+def compile_model(model):
+    """
+    Compile a BooN model into a CompiledModel
+
+    Nodes are ordered as in ``model.desc``. Symbols used in a rule but without
+    a rule of their own are appended and keep their value (identity rule).
+
+    Parameters:
+    -----------
+    model : BooN model
+        The Boolean network model
+
+    Returns:
+    --------
+    CompiledModel : The compiled network
+    """
+    names = [str(v) for v in model.desc]
+    for expr in model.desc.values():
+        for sym in sorted(getattr(expr, 'free_symbols', ()), key=str):
+            if str(sym) not in names:
+                names.append(str(sym))
+    index = {name: i for i, name in enumerate(names)}
+    desc = {str(k): v for k, v in model.desc.items()}
+
+    # Perturbed copies of a model share most expressions, so lowering is memoized
+    key = tuple(names)
+    rules = []
+    for name in names:
+        expr = desc.get(name)
+        if expr is None:
+            rules.append(('var', index[name]))
+            continue
+        try:
+            rules.append(_lower_cached(expr, key))
+        except TypeError:
+            # Unhashable expression
+            rules.append(lower_sympy_rule(expr, index))
+    return CompiledModel(names, rules)
@@ -0,0 +1,426 @@
+"""
+Binary Model Format
+
+This module defines a versioned binary file format for compiled Boolean
+networks (suffix ``.cbn``) and converters from the pickled ``.boon`` files:
+
+- The file holds the node order, the regulators of every node, the rule of
+  every node as compact bytecode and, for rules with up to MAX_TABLE_INPUTS
+  regulators, its truth table as packed 64-bit words
+- All sections are little-endian and 8-byte aligned behind a fixed header,
+  so the file can be memory-mapped and read without copying; loading only
+  decodes the bytecode, without sympy
+- ``.boon`` files are converted with a restricted unpickler that only accepts
+  the BooN class and the sympy symbol and logic classes, replaced by inert
+  stand-ins, so untrusted files cannot run code and sympy is never imported
+- read_boon rebuilds the real BooN model from those stand-ins when BooN and
+  sympy are available, so safely loaded files work with the BooN-based API
+
+File layout:
+    header: magic (8 bytes), format version (uint32), flags (uint32),
+        node count (uint64), then (offset, byte length) of every section
+    sections: names (utf-8), name offsets, regulator offsets, regulators
+        (uint32), code offsets, code (uint32 tokens), table offsets (in
+        words), tables (uint64 words)
+
+Functions:
+    save_model_file: Write a model in the binary format
+    ModelFile: Memory-mapped view of a binary model file
+    load_model_file: Read a binary model file into a CompiledModel
+    read_boon: Read a pickled .boon file safely into a BooN model
+    load_boon: Read a pickled .boon file safely into a CompiledModel
+    convert_boon: Convert a .boon file to the binary format
+"""
+
+import mmap
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from src.models.compiled import CompiledModel, compile_model
+from src.models.truth_tables import MAX_TABLE_INPUTS
+
+MODEL_FILE_SUFFIX = '.cbn'
+MODEL_FILE_MAGIC = b'ERBBCBN\x00'
+
+# Bump when the layout changes; readers reject other versions
+MODEL_FILE_VERSION = 1
+
+_SECTIONS = ('names', 'name_offsets', 'regulator_offsets', 'regulators',
+             'code_offsets', 'code', 'table_offsets', 'tables')
+_HEADER = struct.Struct('<8sIIQ' + 'QQ' * len(_SECTIONS))
+
+# Bytecode tokens: (argument << 3) | opcode, rules in prefix order
+_OP_CONST, _OP_VAR, _OP_NOT, _OP_AND, _OP_OR, _OP_XOR = range(6)
+_OPCODES = {'and': _OP_AND, 'or': _OP_OR, 'xor': _OP_XOR}
+_OPNAMES = {code: name for name, code in _OPCODES.items()}
+
+
+def _emit_code(rule, out):
+    """Append the bytecode of a rule to a list of tokens"""
+    op, arg = rule
+    if op == 'const':
+        out.append((int(bool(arg)) << 3) | _OP_CONST)
+    elif op == 'var':
+        out.append((arg << 3) | _OP_VAR)
+    elif op == 'not':
+        out.append(_OP_NOT)
+        _emit_code(arg, out)
+    else:
+        out.append((len(arg) << 3) | _OPCODES[op])
+        for a in arg:
+            _emit_code(a, out)
+    return out
+
+
+def _read_code(tokens, pos=0):
+    """Decode the rule starting at a token position; returns (rule, next position)"""
+    token = int(tokens[pos])
+    op, arg = token & 7, token >> 3
+    if op == _OP_CONST:
+        return ('const', bool(arg)), pos + 1
+    if op == _OP_VAR:
+        return ('var', arg), pos + 1
+    if op == _OP_NOT:
+        inner, pos = _read_code(tokens, pos + 1)
+        return ('not', inner), pos
+    pos += 1
+    args = []
+    for _ in range(arg):
+        a, pos = _read_code(tokens, pos)
+        args.append(a)
+    return (_OPNAMES[op], tuple(args)), pos
+
+
+def _aligned(data):
+    """Pad a byte string to a multiple of 8 bytes"""
+    return data + b'\x00' * (-len(data) % 8)
+
+
+def save_model_file(model, filepath):
+    """
+    Write a model in the binary format
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    filepath : str
+        Destination path (``.cbn`` by convention)
+
+    Returns:
+    --------
+    CompiledModel : The compiled model that was written
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    names = [name.encode('utf-8') for name in compiled.nodes]
+
+    code, code_offsets = [], [0]
+    words, table_offsets = [], [0]
+    for i, rule in enumerate(compiled.rules):
+        _emit_code(rule, code)
+        code_offsets.append(len(code))
+        k = len(compiled.regulators[i])
+        if k <= MAX_TABLE_INPUTS:
+            table = compiled.tables[i].table
+            count = max(1, (1 << k) // 64)
+            words.extend((table >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(count))
+        table_offsets.append(len(words))
+
+    sections = {
+        'names': b''.join(names),
+        'name_offsets': np.cumsum([0] + [len(b) for b in names], dtype='<u8').tobytes(),
+        'regulator_offsets': np.cumsum([0] + [len(r) for r in compiled.regulators], dtype='<u8').tobytes(),
+        'regulators': np.array([r for regs in compiled.regulators for r in regs], dtype='<u4').tobytes(),
+        'code_offsets': np.array(code_offsets, dtype='<u8').tobytes(),
+        'code': np.array(code, dtype='<u4').tobytes(),
+        'table_offsets': np.array(table_offsets, dtype='<u8').tobytes(),
+        'tables': np.array(words, dtype='<u8').tobytes(),
+    }
+
+    layout, offset = [], _HEADER.size
+    for name in _SECTIONS:
+        layout.extend([offset, len(sections[name])])
+        offset += len(_aligned(sections[name]))
+    header = _HEADER.pack(MODEL_FILE_MAGIC, MODEL_FILE_VERSION, 0, compiled.n, *layout)
+
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(header)
+        for name in _SECTIONS:
+            f.write(_aligned(sections[name]))
+    return compiled
+
+
+class ModelFile:
+    """
+    Memory-mapped view of a binary model file
+
+    Sections are numpy views on the mapping; nothing is decoded until a rule
+    or a truth table is requested.
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the ``.cbn`` file
+
+    Attributes:
+    -----------
+    nodes : tuple of str
+        Node names in bit order
+    """
+
+    def __init__(self, filepath):
+        with open(filepath, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = _HEADER.unpack_from(self._buffer, 0)
+        magic, version, _, n = fields[:4]
+        if magic != MODEL_FILE_MAGIC:
+            raise ValueError(f"{filepath} is not a binary model file")
+        if version != MODEL_FILE_VERSION:
+            raise ValueError(f"{filepath} has model format version {version}, expected {MODEL_FILE_VERSION}")
+        self.n = n
+        spans = dict(zip(_SECTIONS, zip(fields[4::2], fields[5::2])))
+        dtypes = {'names': 'u1', 'regulators': '<u4', 'code': '<u4'}
+        self._sections = {
+            name: np.frombuffer(self._buffer, dtype=dtypes.get(name, '<u8'),
+                                count=length // np.dtype(dtypes.get(name, '<u8')).itemsize, offset=offset)
+            for name, (offset, length) in spans.items()
+        }
+        raw = self._sections['names'].tobytes()
+        offsets = self._sections['name_offsets'].tolist()
+        self.nodes = tuple(raw[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:]))
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"ModelFile({self.n} nodes)"
+
+    def regulators(self, i):
+        """Sorted regulator indices of node i"""
+        offsets = self._sections['regulator_offsets']
+        return tuple(self._sections['regulators'][offsets[i]:offsets[i + 1]].tolist())
+
+    def rule(self, i):
+        """Rule of node i in the nested tuple representation"""
+        offsets = self._sections['code_offsets']
+        return _read_code(self._sections['code'][offsets[i]:offsets[i + 1]])[0]
+
+    def truth_table(self, i):
+        """
+        Truth table of node i as an int bitmask over the rows of its regulators
+        (bit j of a row is the value of the j-th regulator), or None if the rule
+        has more than MAX_TABLE_INPUTS regulators
+        """
+        offsets = self._sections['table_offsets']
+        words = self._sections['tables'][offsets[i]:offsets[i + 1]]
+        if not len(words):
+            return None
+        return int.from_bytes(words.tobytes(), 'little') & ((1 << (1 << len(self.regulators(i)))) - 1)
+
+    def to_compiled(self):
+        """Decode every rule into a CompiledModel"""
+        code = self._sections['code'].tolist()
+        rules, pos = [], 0
+        for _ in range(self.n):
+            rule, pos = _read_code(code, pos)
+            rules.append(rule)
+        return CompiledModel(self.nodes, rules)
+
+    def close(self):
+        self._sections = {}
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_model_file(filepath):
+    """
+    Read a binary model file into a CompiledModel
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the ``.cbn`` file
+
+    Returns:
+    --------
+    CompiledModel : The compiled network
+    """
+    with ModelFile(filepath) as model_file:
+        return model_file.to_compiled()
+
+
+class _Expression:
+    """Inert stand-in for a sympy expression; lower_sympy_rule reads its class name and args"""
+
+    def __new__(cls, *args, **kwargs):
+        expr = object.__new__(cls)
+        expr.args = args
+        return expr
+
+    @property
+    def free_symbols(self):
+        found = set()
+        for a in self.args:
+            found |= getattr(a, 'free_symbols', set())
+        return found
+
+
+class _Symbol(_Expression):
+    is_Symbol = True
+
+    def __new__(cls, name, **kwargs):
+        expr = object.__new__(cls)
+        expr.name = name
+        expr.args = ()
+        return expr
+
+    def __setstate__(self, state):
+        # Assumptions of the symbol are irrelevant for Boolean rules
+        pass
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, _Symbol) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    @property
+    def free_symbols(self):
+        return {self}
+
+
+class _BoonRecord:
+    """Stand-in for a BooN object: keeps its attributes (``desc``) as plain data"""
+
+
+_SAFE_CLASSES = {('boon', 'BooN'): _BoonRecord, ('sympy.core.symbol', 'Symbol'): _Symbol}
+for _name in ('And', 'Or', 'Not', 'Xor', 'Nand', 'Nor', 'Xnor', 'Implies', 'Equivalent', 'ITE',
+              'BooleanTrue', 'BooleanFalse'):
+    _SAFE_CLASSES[('sympy.logic.boolalg', _name)] = type(_name, (_Expression,), {})
+
+
+class _RestrictedUnpickler(pickle.Unpickler):
+    """Unpickler that only resolves BooN and sympy logic classes, to inert stand-ins"""
+
+    def find_class(self, module, name):
+        try:
+            return _SAFE_CLASSES[(module, name)]
+        except KeyError:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a model file")
+
+
+def _unpickle_boon(filepath):
+    """Unpickle a .boon file with the restricted unpickler and check that it holds a model"""
+    with open(filepath, 'rb') as f:
+        record = _RestrictedUnpickler(f).load()
+    if not isinstance(getattr(record, 'desc', None), dict):
+        raise ValueError(f"{filepath} does not contain a BooN model")
+    return record
+
+
+def _to_sympy(value):
+    """Rebuild the sympy expressions and classes inert stand-ins were unpickled from"""
+    import sympy
+    if isinstance(value, dict):
+        return {_to_sympy(k): _to_sympy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(_to_sympy(v) for v in value)
+    # Rule classes are stored too, e.g. as the keys of BooN.style
+    if isinstance(value, type) and issubclass(value, _Expression):
+        return sympy.Symbol if value is _Symbol else getattr(sympy.logic.boolalg, value.__name__)
+    if isinstance(value, _Symbol):
+        return sympy.Symbol(value.name)
+    if not isinstance(value, _Expression):
+        return value
+    name = type(value).__name__
+    if name == 'BooleanTrue':
+        return sympy.true
+    if name == 'BooleanFalse':
+        return sympy.false
+    return getattr(sympy.logic.boolalg, name)(*(_to_sympy(a) for a in value.args))
+
+
+def read_boon(filepath):
+    """
+    Read a pickled ``.boon`` file safely into a BooN model
+
+    The file is unpickled with the restricted unpickler, then the BooN object
+    and its sympy rules are rebuilt from the inert stand-ins. Without BooN or
+    sympy the stand-in record is returned: it has the same ``desc`` (symbols
+    print as their names) and compiles like the model, but has no BooN methods.
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the ``.boon`` file
+
+    Returns:
+    --------
+    BooN model : The model that was saved, or its stand-in record
+    """
+    record = _unpickle_boon(filepath)
+    # BooN and sympy are only needed to rebuild the model, not to compile it
+    from src.models.ERBB_Boolean import _PlaceholderBooN, _load_boon
+    BooN = _load_boon()
+    if BooN is _PlaceholderBooN:
+        return record
+    try:
+        state = _to_sympy(vars(record))
+    except ImportError as e:
+        print(f"Failed to import sympy: {str(e)}")
+        return record
+    model = BooN.__new__(BooN)
+    model.__dict__.update(state)
+    return model
+
+
+def load_boon(filepath):
+    """
+    Read a pickled ``.boon`` file safely into a CompiledModel
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the ``.boon`` file
+
+    Returns:
+    --------
+    CompiledModel : The compiled network, nodes in the order of ``model.desc``
+    """
+    return compile_model(_unpickle_boon(filepath))
+
+
+def convert_boon(filepath, output=None):
+    """
+    Convert a ``.boon`` file to the binary format
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the ``.boon`` file
+    output : str, optional
+        Destination; the same path with the ``.cbn`` suffix by default
+
+    Returns:
+    --------
+    str : Path of the written file
+    """
+    if output is None:
+        output = os.path.splitext(filepath)[0] + MODEL_FILE_SUFFIX
+    save_model_file(load_boon(filepath), output)
+    print(f"Converted {filepath} to {output}")
+    return output
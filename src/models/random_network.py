@@ -0,0 +1,82 @@
+"""
+Synthetic Random Networks
+
+This module generates random Boolean networks with the structure of signaling
+models, for benchmarks and for testing the analyses at scale:
+
+- Every node draws its regulators at random, with a fixed or Poisson
+  distributed in-degree
+- Rules are nested canalizing functions (l1 op (l2 op (...))) over the
+  regulators with random signs, the class of functions most curated
+  biological rules belong to
+- A few nodes are inputs (identity rule), like the growth factor of the
+  ERBB models
+
+Functions:
+    random_network: Generate a random Boolean network as a CompiledModel
+"""
+
+import numpy as np
+
+from src.models.compiled import CompiledModel
+
+
+def _canalizing_rule(regulators, rng, p_negative):
+    """Nested canalizing rule over the given regulators"""
+    literals = [('not', ('var', int(r))) if rng.random() < p_negative else ('var', int(r))
+                for r in regulators]
+    rule = literals[-1]
+    for literal in reversed(literals[:-1]):
+        op = 'and' if rng.random() < 0.5 else 'or'
+        # Merge with an inner operation of the same kind to keep rules flat
+        if rule[0] == op:
+            rule = (op, (literal,) + rule[1])
+        else:
+            rule = (op, (literal, rule))
+    return rule
+
+
+def random_network(n, in_degree=2, seed=None, degree_distribution='fixed', p_negative=0.3, n_inputs=2):
+    """
+    Generate a random Boolean network
+
+    Parameters:
+    -----------
+    n : int
+        Number of nodes
+    in_degree : float
+        Number of regulators per node (the mean with a Poisson distribution)
+    seed : int or numpy SeedSequence, optional
+        Seed of the generator, for reproducible networks
+    degree_distribution : str
+        'fixed' for exactly ``in_degree`` regulators per node, 'poisson' for a
+        Poisson distributed in-degree (at least one regulator)
+    p_negative : float
+        Probability that a regulator acts as an inhibitor
+    n_inputs : int
+        Number of input nodes with an identity rule; every input can double
+        the number of attractors, so keep it small for large networks
+
+    Returns:
+    --------
+    CompiledModel : Nodes named n0, n1, ...
+    """
+    if degree_distribution not in ('fixed', 'poisson'):
+        raise ValueError(f"Unknown degree distribution '{degree_distribution}', expected 'fixed' or 'poisson'")
+    rng = np.random.default_rng(seed)
+    n_inputs = min(n_inputs, n)
+    inputs = set(rng.choice(n, size=n_inputs, replace=False).tolist()) if n_inputs else set()
+
+    rules = []
+    for i in range(n):
+        if i in inputs:
+            rules.append(('var', i))
+            continue
+        if degree_distribution == 'fixed':
+            k = int(in_degree)
+        else:
+            k = max(1, int(rng.poisson(in_degree)))
+        k = min(k, n)
+        regulators = rng.choice(n, size=k, replace=False)
+        rules.append(_canalizing_rule(regulators, rng, p_negative))
+    return CompiledModel([f"n{i}" for i in range(n)], rules)
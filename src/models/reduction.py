@@ -0,0 +1,265 @@
+"""
+Boolean Network Reduction
+
+This module shrinks a compiled network before its attractors are searched,
+and lifts the results back to full states afterwards:
+
+- Constant propagation: fixed inputs, knockouts and overexpressions are
+  propagated through the rules; every node that becomes constant is removed and
+  its value substituted into the remaining rules. Frozen nodes take their value
+  in every attractor, so both fixed points and cyclic attractors are preserved.
+- Elimination of intermediate nodes: a node that does not regulate itself is
+  removed by substituting its rule into the rules of its targets. This preserves
+  the fixed points (not the cyclic attractors), so it is only used for stable
+  state searches.
+
+Functions:
+    simplify_rule: Substitute known node values into a rule and fold constants
+    substitute_rule: Replace a node of a rule by another rule
+    relabel_rule: Renumber the node indices of a rule
+    reduce_model: Reduce a network under optional perturbations
+"""
+
+from src.models.compiled import (CompiledModel, FALSE_RULE, TRUE_RULE, compile_model,
+                                 rule_variables)
+from src.models.truth_tables import rule_table
+
+# Largest number of regulators a rule may have after an elimination
+DEFAULT_MAX_REGULATORS = 8
+
+# Largest number of terms a rule may have after an elimination; repeated
+# substitution can otherwise grow rules exponentially
+DEFAULT_MAX_RULE_SIZE = 64
+
+
+def simplify_rule(rule, values):
+    """
+    Substitute known node values into a rule and fold the constants
+
+    Parameters:
+    -----------
+    rule : tuple
+        Rule in the nested tuple representation
+    values : dict
+        Known node values {index: bool}
+
+    Returns:
+    --------
+    tuple : Equivalent rule without the known nodes
+    """
+    op, arg = rule
+    if op == 'const':
+        return rule
+    if op == 'var':
+        if arg in values:
+            return TRUE_RULE if values[arg] else FALSE_RULE
+        return rule
+    if op == 'not':
+        inner = simplify_rule(arg, values)
+        if inner[0] == 'const':
+            return FALSE_RULE if inner[1] else TRUE_RULE
+        if inner[0] == 'not':
+            return inner[1]
+        return ('not', inner)
+
+    operands = []
+    parity = False
+    for a in arg:
+        a = simplify_rule(a, values)
+        if a[0] != 'const':
+            operands.append(a)
+        elif op == 'xor':
+            parity ^= a[1]
+        elif a[1] == (op == 'or'):
+            # Controlling operand: True for or, False for and
+            return a
+    if not operands:
+        if op == 'xor':
+            return TRUE_RULE if parity else FALSE_RULE
+        return TRUE_RULE if op == 'and' else FALSE_RULE
+    if len(operands) == 1:
+        single = operands[0]
+        if op == 'xor' and parity:
+            return simplify_rule(('not', single), {})
+        return single
+    result = (op, tuple(operands))
+    if op == 'xor' and parity:
+        result = ('not', result)
+    return result
+
+
+def substitute_rule(rule, node, replacement):
+    """Replace every occurrence of a node in a rule by another rule"""
+    op, arg = rule
+    if op == 'var':
+        return replacement if arg == node else rule
+    if op == 'const':
+        return rule
+    if op == 'not':
+        return ('not', substitute_rule(arg, node, replacement))
+    return (op, tuple(substitute_rule(a, node, replacement) for a in arg))
+
+
+def _rule_size(rule, node):
+    """Number of terms of a rule and number of occurrences of a node in it"""
+    size, occurrences = 0, 0
+    stack = [rule]
+    while stack:
+        op, arg = stack.pop()
+        size += 1
+        if op == 'var':
+            occurrences += arg == node
+        elif op == 'not':
+            stack.append(arg)
+        elif op != 'const':
+            stack.extend(arg)
+    return size, occurrences
+
+
+def relabel_rule(rule, mapping):
+    """Renumber the node indices of a rule with a {old: new} mapping"""
+    op, arg = rule
+    if op == 'var':
+        return ('var', mapping[arg])
+    if op == 'const':
+        return rule
+    if op == 'not':
+        return ('not', relabel_rule(arg, mapping))
+    return (op, tuple(relabel_rule(a, mapping) for a in arg))
+
+
+class ReducedModel:
+    """
+    A reduced network together with what is needed to rebuild full states
+
+    Attributes:
+    -----------
+    full : CompiledModel
+        The original network
+    compiled : CompiledModel
+        The reduced network over the kept nodes
+    kept : list
+        Index in the full network of every node of the reduced network
+    frozen : dict
+        Constant nodes {full index: bool}, including the perturbed ones
+    eliminated : list
+        (full index, rule over full indices) of the eliminated nodes, in
+        elimination order
+    """
+
+    def __init__(self, full, compiled, kept, frozen, eliminated, keys=None):
+        self.full = full
+        self.compiled = compiled
+        self.kept = kept
+        self.frozen = frozen
+        self.eliminated = eliminated
+        self._keys = keys if keys is not None else list(full.nodes)
+        self._eliminated_tables = None
+
+    def __repr__(self):
+        return (f"ReducedModel({self.full.n} -> {self.compiled.n} nodes, "
+                f"{len(self.frozen)} frozen, {len(self.eliminated)} eliminated)")
+
+    def lift(self, codes):
+        """
+        Rebuild full packed states from packed states of the reduced network
+
+        Eliminated nodes are evaluated from their rule in reverse elimination
+        order, since each rule only refers to nodes still present when it was
+        eliminated.
+
+        Returns:
+        --------
+        list : Packed states of the full network (Python integers)
+        """
+        if self._eliminated_tables is None:
+            self._eliminated_tables = [(i, rule_table(rule)) for i, rule in reversed(self.eliminated)]
+        base = sum(1 << i for i, value in self.frozen.items() if value)
+        lifted = []
+        for code in codes:
+            code = int(code)
+            full_code = base
+            for k, i in enumerate(self.kept):
+                full_code |= ((code >> k) & 1) << i
+            for i, table in self._eliminated_tables:
+                if table.evaluate(full_code):
+                    full_code |= 1 << i
+            lifted.append(full_code)
+        return lifted
+
+    @property
+    def stable_states(self):
+        """Stable states of the full network, like ``model.stable_states``"""
+        from src.analysis.fixed_points import iter_fixed_points
+        return [
+            {key: bool((code >> i) & 1) for i, key in enumerate(self._keys)}
+            for code in sorted(self.lift(iter_fixed_points(self.compiled)))
+        ]
+
+
+def reduce_model(model, overrides=None, eliminate=False, max_regulators=DEFAULT_MAX_REGULATORS):
+    """
+    Reduce a network by constant propagation and optional node elimination
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    overrides : dict, optional
+        Perturbed nodes {name: bool}, e.g. {'ERBB2': False}
+    eliminate : bool
+        Whether to also eliminate non-autoregulated nodes. Only valid when the
+        reduced network is used for fixed points, not for cyclic attractors.
+    max_regulators : int
+        Skip eliminations that would give a rule more regulators than this
+
+    Returns:
+    --------
+    ReducedModel : The reduced network and the mapping back to full states
+    """
+    if isinstance(model, CompiledModel):
+        full, keys = model, None
+    else:
+        full = compile_model(model)
+        keys = {str(k): k for k in model.desc}
+        keys = [keys.get(name, name) for name in full.nodes]
+
+    overrides = {full.index[str(k)]: bool(v) for k, v in (overrides or {}).items()}
+    frozen = full.propagate(overrides)
+    rules = {i: simplify_rule(full.rules[i], frozen) for i in range(full.n) if i not in frozen}
+
+    eliminated = []
+    if eliminate:
+        targets = {i: set() for i in rules}
+        for i, rule in rules.items():
+            for r in rule_variables(rule):
+                targets[r].add(i)
+        # Nodes with few targets first keeps the substituted rules small
+        for node in sorted(rules, key=lambda i: len(targets[i])):
+            rule = rules[node]
+            regulators = set(rule_variables(rule))
+            if node in regulators:
+                continue
+            size = _rule_size(rule, node)[0]
+            if any(s + k * (size - 1) > DEFAULT_MAX_RULE_SIZE
+                   for s, k in (_rule_size(rules[t], node) for t in targets[node])):
+                continue
+            updated = {t: simplify_rule(substitute_rule(rules[t], node, rule), {})
+                       for t in targets[node]}
+            if any(len(rule_variables(r)) > max_regulators for r in updated.values()):
+                continue
+            eliminated.append((node, rule))
+            del rules[node]
+            for r in regulators:
+                targets[r].discard(node)
+            for t, new_rule in updated.items():
+                rules[t] = new_rule
+                for r in rule_variables(new_rule):
+                    targets[r].add(t)
+            del targets[node]
+
+    kept = sorted(rules)
+    mapping = {i: k for k, i in enumerate(kept)}
+    compiled = CompiledModel([full.nodes[i] for i in kept],
+                             [relabel_rule(rules[i], mapping) for i in kept])
+    return ReducedModel(full, compiled, kept, frozen, eliminated, keys)
@@ -0,0 +1,295 @@
+"""
+SBML-qual Importer
+
+This module loads Boolean models written in SBML-qual (e.g. exported from
+GINsim or CellCollective) straight into a CompiledModel, without building
+sympy expressions:
+
+- The file is read with incremental ``iterparse``; every species and every
+  transition is converted as soon as its element is complete and then
+  released, so memory stays flat for models with thousands of species
+- MathML function terms (and, or, xor, not, implies, comparisons of a
+  species level with a constant or with another species) are lowered to the
+  rule representation of the compiled engine
+- Species without a transition, and constant species, keep their value
+  (identity rule), like the input nodes of the hand-written models
+- The compiled model is cached under the hash of the file contents, so a
+  model is only parsed again when the file changes
+
+Functions:
+    read_sbml_qual: Parse an SBML-qual file into a CompiledModel
+    load_sbml: Parse an SBML-qual file, using the cache when possible
+    write_sbml_qual: Write a model as an SBML-qual file
+"""
+
+import itertools
+import operator
+import os
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+from src.models.compiled import CompiledModel, FALSE_RULE, TRUE_RULE, compile_model
+from src.models.reduction import relabel_rule, simplify_rule
+from src.utils.cache import get_cache
+
+QUAL_NS = 'http://www.sbml.org/sbml/level3/version1/qual/version1'
+MATHML_NS = 'http://www.w3.org/1998/Math/MathML'
+
+_COMPARISONS = {
+    'eq': operator.eq, 'neq': operator.ne, 'lt': operator.lt,
+    'gt': operator.gt, 'leq': operator.le, 'geq': operator.ge,
+}
+
+
+def _qual(name):
+    return f'{{{QUAL_NS}}}{name}'
+
+
+def _math(name):
+    return f'{{{MATHML_NS}}}{name}'
+
+
+def _attr(elem, name, default=None):
+    """Attribute of the qual namespace (also accepted without prefix)"""
+    return elem.get(_qual(name), elem.get(name, default))
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _rule_from_table(variables, truth):
+    """Rule over at most a few variables from its truth table {assignment: bool}"""
+    terms = []
+    for assignment, value in truth.items():
+        if value:
+            terms.append(('and', tuple(('var', v) if bit else ('not', ('var', v))
+                                       for v, bit in zip(variables, assignment))))
+    if not terms:
+        return FALSE_RULE
+    return simplify_rule(('or', tuple(terms)), {}) if len(terms) > 1 else simplify_rule(terms[0], {})
+
+
+def _comparison(op, operands, register):
+    """Lower a comparison of Boolean levels and constants to a rule"""
+    compare = _COMPARISONS[op]
+    values = []
+    for child in operands:
+        tag = _local(child.tag)
+        if tag == 'ci':
+            values.append(register(child.text.strip()))
+        elif tag == 'cn':
+            values.append(float(child.text.strip()))
+        else:
+            raise ValueError(f"Unsupported operand <{tag}> in a comparison")
+    if len(values) != 2:
+        raise ValueError(f"Comparison <{op}> needs two operands")
+
+    variables = sorted({v for v in values if isinstance(v, str)})
+    truth = {}
+    for assignment in itertools.product((0, 1), repeat=len(variables)):
+        level = dict(zip(variables, assignment))
+        a, b = (level.get(v, v) if isinstance(v, str) else v for v in values)
+        truth[assignment] = compare(a, b)
+    return _rule_from_table(variables, truth)
+
+
+def _math_rule(elem, register):
+    """Lower a MathML element to a rule whose variables are species ids"""
+    tag = _local(elem.tag)
+    if tag == 'math':
+        children = list(elem)
+        if len(children) != 1:
+            raise ValueError("A function term needs exactly one MathML expression")
+        return _math_rule(children[0], register)
+    if tag == 'ci':
+        return ('var', register(elem.text.strip()))
+    if tag == 'cn':
+        return TRUE_RULE if float(elem.text.strip()) else FALSE_RULE
+    if tag in ('true', 'false'):
+        return TRUE_RULE if tag == 'true' else FALSE_RULE
+    if tag != 'apply':
+        raise ValueError(f"Unsupported MathML element <{tag}>")
+
+    children = list(elem)
+    op, operands = _local(children[0].tag), children[1:]
+    if op in _COMPARISONS:
+        return _comparison(op, operands, register)
+    args = tuple(_math_rule(child, register) for child in operands)
+    if op in ('and', 'or', 'xor'):
+        return simplify_rule((op, args), {})
+    if op == 'not' and len(args) == 1:
+        return simplify_rule(('not', args[0]), {})
+    if op == 'implies' and len(args) == 2:
+        return simplify_rule(('or', (('not', args[0]), args[1])), {})
+    raise ValueError(f"Unsupported MathML operator <{op}>")
+
+
+def _transition_rule(transition, register):
+    """
+    Rule of a transition from its function terms and default term
+
+    Terms are tried in document order and the first satisfied one sets the
+    level, otherwise the default term applies.
+    """
+    terms, default = [], False
+    for elem in transition.iter():
+        tag = _local(elem.tag)
+        if tag == 'functionTerm':
+            level = int(_attr(elem, 'resultLevel', 1))
+            math = elem.find(_math('math'))
+            if math is None:
+                raise ValueError("Function term without MathML")
+            terms.append((_math_rule(math, register), level > 0))
+        elif tag == 'defaultTerm':
+            default = int(_attr(elem, 'resultLevel', 0)) > 0
+
+    rule = TRUE_RULE if default else FALSE_RULE
+    for condition, level in reversed(terms):
+        # if condition then level else rule
+        if level:
+            rule = ('or', (condition, rule))
+        else:
+            rule = ('and', (('not', condition), rule))
+        rule = simplify_rule(rule, {})
+    return rule
+
+
+def read_sbml_qual(path):
+    """
+    Parse an SBML-qual file into a CompiledModel
+
+    Parameters:
+    -----------
+    path : str
+        Path of the SBML-qual file
+
+    Returns:
+    --------
+    CompiledModel : Nodes in species order, named by species id
+    """
+    index = {}
+    constant = set()
+    rules = {}
+
+    def register(name):
+        index.setdefault(name, len(index))
+        return name
+
+    for event, elem in ET.iterparse(path, events=('end',)):
+        tag = elem.tag
+        if tag == _qual('qualitativeSpecies'):
+            species = _attr(elem, 'id')
+            if int(_attr(elem, 'maxLevel', 1)) > 1:
+                raise ValueError(f"Species '{species}' is multi-valued; only Boolean models are supported")
+            register(species)
+            if _attr(elem, 'constant', 'false') == 'true':
+                constant.add(species)
+            elem.clear()
+        elif tag == _qual('transition'):
+            outputs = [_attr(o, 'qualitativeSpecies') for o in elem.iter(_qual('output'))]
+            rule = _transition_rule(elem, register)
+            for species in outputs:
+                register(species)
+                if species in rules:
+                    raise ValueError(f"Species '{species}' is the output of several transitions")
+                rules[species] = rule
+            elem.clear()
+        elif tag in (_qual('listOfQualitativeSpecies'), _qual('listOfTransitions')):
+            elem.clear()
+
+    nodes = sorted(index, key=index.get)
+    compiled_rules = []
+    for i, name in enumerate(nodes):
+        rule = rules.get(name) if name not in constant else None
+        compiled_rules.append(('var', i) if rule is None else relabel_rule(rule, index))
+    return CompiledModel(nodes, compiled_rules)
+
+
+def load_sbml(path, use_cache=True, cache_dir='../cache'):
+    """
+    Load an SBML-qual model as a CompiledModel, cached by the file contents
+
+    Parameters:
+    -----------
+    path : str
+        Path of the SBML-qual file
+    use_cache : bool
+        Whether to reuse (and store) the compiled model in the result cache
+    cache_dir : str
+        Directory of the result cache
+
+    Returns:
+    --------
+    CompiledModel : The compiled network, usable by the fixed point solver,
+        the perturbation screens and the other analyses
+    """
+    if not use_cache:
+        return read_sbml_qual(path)
+
+    cache = get_cache(cache_dir)
+    key = cache.file_key(path, 'sbml')
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = read_sbml_qual(path)
+        try:
+            cache.put(key, compiled)
+        except (IOError, OSError) as e:
+            print(f"Could not cache compiled model: {str(e)}")
+    return compiled
+
+
+def _mathml(rule, nodes):
+    """MathML of a rule, Boolean levels written as comparisons with 1"""
+    op, arg = rule
+    if op == 'const':
+        return '<true/>' if arg else '<false/>'
+    if op == 'var':
+        return f'<apply><eq/><ci>{nodes[arg]}</ci><cn type="integer">1</cn></apply>'
+    if op == 'not':
+        return f'<apply><not/>{_mathml(arg, nodes)}</apply>'
+    return f'<apply><{op}/>{"".join(_mathml(a, nodes) for a in arg)}</apply>'
+
+
+def write_sbml_qual(model, path, model_id='model'):
+    """
+    Write a model as an SBML-qual file, one transition per non-input node
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+    path : str
+        Destination path
+    model_id : str
+        Id of the SBML model element
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1" '
+                f'xmlns:qual="{QUAL_NS}" qual:required="true">\n')
+        f.write(f'<model id={quoteattr(model_id)}>\n')
+        f.write('<listOfCompartments><compartment id="default" constant="true"/></listOfCompartments>\n')
+        f.write('<qual:listOfQualitativeSpecies>\n')
+        for name in compiled.nodes:
+            f.write(f'<qual:qualitativeSpecies qual:compartment="default" qual:constant="false" '
+                    f'qual:id={quoteattr(name)} qual:maxLevel="1"/>\n')
+        f.write('</qual:listOfQualitativeSpecies>\n<qual:listOfTransitions>\n')
+        for i, (name, rule) in enumerate(zip(compiled.nodes, compiled.rules)):
+            if rule == ('var', i):
+                continue  # Inputs keep their value
+            inputs = ''.join(f'<qual:input qual:qualitativeSpecies={quoteattr(compiled.nodes[r])} '
+                             'qual:transitionEffect="none"/>' for r in compiled.regulators[i])
+            f.write(f'<qual:transition qual:id={quoteattr("tr_" + name)}>'
+                    f'<qual:listOfInputs>{inputs}</qual:listOfInputs>'
+                    f'<qual:listOfOutputs><qual:output qual:qualitativeSpecies={quoteattr(name)} '
+                    'qual:transitionEffect="assignmentLevel"/></qual:listOfOutputs>'
+                    '<qual:listOfFunctionTerms><qual:defaultTerm qual:resultLevel="0"/>'
+                    '<qual:functionTerm qual:resultLevel="1">'
+                    f'<math xmlns="{MATHML_NS}">{_mathml(rule, compiled.nodes)}</math>'
+                    '</qual:functionTerm></qual:listOfFunctionTerms></qual:transition>\n')
+        f.write('</qual:listOfTransitions>\n</model>\n</sbml>\n')
@@ -0,0 +1,229 @@
+"""
+Bit-Packed State Sets
+
+This module provides StateSet, the common container for sets of network
+states passed between the analysis modules. States are stored as rows of
+uint64 words (bit ``i`` of a row is the value of ``nodes[i]``), so a state of
+the ERBB model takes 8 bytes instead of a dictionary of sympy symbols, and
+conversion to dictionaries or DataFrames only happens at the edges.
+
+Functions:
+    StateSet: Immutable, ordered collection of bit-packed states with a fixed node order
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _word_count(n):
+    return max(1, (n + 63) // 64)
+
+
+class StateSet:
+    """
+    Ordered collection of bit-packed states over a fixed node order
+
+    Rows keep their order (a cycle stays in update order); ``unique`` gives the
+    sorted set. Indexing with an integer returns the packed state as a Python
+    integer, slicing or a mask/index array returns a new StateSet.
+
+    Parameters:
+    -----------
+    nodes : sequence of str
+        Node names; bit ``i`` of a state is the value of ``nodes[i]``
+    words : numpy array, optional
+        uint64 array of shape (states, ceil(n / 64))
+    """
+
+    def __init__(self, nodes, words=None):
+        self.nodes = tuple(str(n) for n in nodes)
+        width = _word_count(len(self.nodes))
+        if words is None:
+            words = np.zeros((0, width), dtype=np.uint64)
+        words = np.ascontiguousarray(words, dtype=np.uint64).reshape(-1, width)
+        words.setflags(write=False)
+        self.words = words
+        self._hash = None
+
+    # Construction
+
+    @classmethod
+    def from_codes(cls, nodes, codes):
+        """Build a set from packed states (Python integers or an unsigned array)"""
+        width = _word_count(len(nodes))
+        if width == 1:
+            return cls(nodes, np.asarray(list(codes) if not isinstance(codes, np.ndarray) else codes,
+                                         dtype=np.uint64).reshape(-1, 1))
+        mask = (1 << 64) - 1
+        words = np.array([[(int(c) >> (64 * w)) & mask for w in range(width)] for c in codes],
+                         dtype=np.uint64)
+        return cls(nodes, words)
+
+    @classmethod
+    def from_matrix(cls, nodes, matrix):
+        """Build a set from a boolean matrix of states x nodes"""
+        matrix = np.asarray(matrix, dtype=bool).reshape(-1, len(nodes))
+        width = _word_count(len(nodes))
+        padded = np.zeros((len(matrix), width * 64), dtype=bool)
+        padded[:, :len(nodes)] = matrix
+        packed = np.packbits(padded, axis=1, bitorder='little')
+        return cls(nodes, packed.view('<u8').astype(np.uint64))
+
+    @classmethod
+    def from_dicts(cls, nodes, states):
+        """Build a set from state dictionaries (keys may be names or sympy symbols)"""
+        nodes = tuple(str(n) for n in nodes)
+        index = {name: i for i, name in enumerate(nodes)}
+        matrix = np.zeros((len(states), len(nodes)), dtype=bool)
+        for row, state in enumerate(states):
+            for key, value in state.items():
+                i = index.get(str(key))
+                if i is not None:
+                    matrix[row, i] = bool(value)
+        return cls.from_matrix(nodes, matrix)
+
+    @classmethod
+    def concat(cls, sets):
+        """Stack several sets over the same nodes, keeping every row"""
+        sets = list(sets)
+        if not sets:
+            raise ValueError("Cannot concatenate an empty list of state sets")
+        nodes = sets[0].nodes
+        for s in sets[1:]:
+            if s.nodes != nodes:
+                raise ValueError("State sets have different node orders")
+        return cls(nodes, np.concatenate([s.words for s in sets]))
+
+    # Sequence protocol
+
+    @property
+    def n(self):
+        """Number of nodes of every state"""
+        return len(self.nodes)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __repr__(self):
+        return f"StateSet({len(self)} states x {self.n} nodes, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+
+    def _code(self, row):
+        code = 0
+        for w, word in enumerate(row):
+            code |= int(word) << (64 * w)
+        return code
+
+    def _subset(self, words):
+        """New set over the same nodes, without re-validating the node names"""
+        subset = StateSet.__new__(StateSet)
+        subset.nodes = self.nodes
+        subset.words = np.ascontiguousarray(words)
+        subset.words.setflags(write=False)
+        subset._hash = None
+        return subset
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self._code(self.words[item])
+        return self._subset(self.words[item])
+
+    def __iter__(self):
+        for row in self.words:
+            yield self._code(row)
+
+    def codes(self):
+        """Packed states as a list of Python integers"""
+        return list(self)
+
+    # Set operations
+
+    def _keys(self):
+        """One comparable scalar per row"""
+        if self.words.shape[1] == 1:
+            return self.words[:, 0]
+        return self.words.view(np.dtype((np.void, self.words.shape[1] * 8))).ravel()
+
+    def _check(self, other):
+        if not isinstance(other, StateSet) or other.nodes != self.nodes:
+            raise ValueError("State sets have different node orders")
+
+    def unique(self):
+        """Distinct states sorted by their packed value"""
+        if not len(self):
+            return self
+        order = np.lexsort(self.words.T)
+        rows = self.words[order]
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]).any(axis=1)
+        return self._subset(rows[keep])
+
+    def isin(self, other):
+        """Boolean mask of the rows that are also in another set"""
+        self._check(other)
+        return np.isin(self._keys(), other._keys())
+
+    def union(self, other):
+        self._check(other)
+        return StateSet.concat([self, other]).unique()
+
+    def intersection(self, other):
+        return self[self.isin(other)].unique()
+
+    def difference(self, other):
+        return self[~self.isin(other)].unique()
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __contains__(self, state):
+        code = state if isinstance(state, (int, np.integer)) else StateSet.from_dicts(self.nodes, [state])[0]
+        return StateSet.from_codes(self.nodes, [int(code)]).isin(self)[0]
+
+    def __eq__(self, other):
+        """Two sets are equal when they hold the same distinct states over the same nodes"""
+        if not isinstance(other, StateSet):
+            return NotImplemented
+        if other.nodes != self.nodes:
+            return False
+        a, b = self.unique(), other.unique()
+        return len(a) == len(b) and bool((a.words == b.words).all())
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self.nodes, self.unique().words.tobytes()))
+        return self._hash
+
+    # Conversion at the edges
+
+    def column(self, node):
+        """Values of one node in every state"""
+        i = self.nodes.index(str(node))
+        return ((self.words[:, i // 64] >> np.uint64(i % 64)) & np.uint64(1)).astype(bool)
+
+    def to_matrix(self):
+        """Boolean matrix of states x nodes"""
+        raw = np.ascontiguousarray(self.words.astype('<u8')).view(np.uint8)
+        return np.unpackbits(raw.reshape(len(self), self.words.shape[1] * 8), axis=1, count=self.n,
+                             bitorder='little').astype(bool)
+
+    def to_dicts(self, keys=None):
+        """
+        States as dictionaries, like ``model.stable_states``
+
+        Parameters:
+        -----------
+        keys : list, optional
+            Dictionary key of every node (e.g. the sympy symbols of ``model.desc``);
+            node names by default
+        """
+        keys = list(keys) if keys is not None else list(self.nodes)
+        return [dict(zip(keys, row)) for row in self.to_matrix().tolist()]
+
+    def to_dataframe(self, dtype=bool):
+        """DataFrame with one row per state and one column per node"""
+        return pd.DataFrame(self.to_matrix().astype(dtype), columns=list(self.nodes))
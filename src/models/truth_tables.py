@@ -0,0 +1,257 @@
+"""
+Rule Truth Tables
+
+This module compiles every rule once into a truth table over its regulators,
+shared by evaluation, the fixed-point solver, constant propagation and the
+reductions:
+
+- A rule is rewritten over the positions of its sorted regulators, with the
+  operands of commutative operations sorted; this local form is the canonical
+  key of the rule, so equal rules of different nodes, of knockouts and of
+  reduced networks are compiled once per process
+- The truth table is an int bitmask: bit ``row`` is the output for the row
+  whose bit j is the value of the j-th regulator. Looking up a value, or the
+  value implied by a partial assignment, takes a few bitwise operations
+- Prime implicants of the rule and of its negation (Quine-McCluskey) are
+  computed on first request and cached under the same key
+
+Functions:
+    row_masks: Row masks of every regulator position for k inputs
+    rule_table: Compiled truth table of a rule
+    prime_implicants: Prime implicants of a rule or of its negation
+    cache_info: Statistics of the table and prime implicant caches
+"""
+
+from functools import lru_cache
+
+from src.models.compiled import evaluate_partial, rule_variables
+
+# Regulator count up to which a rule is tabulated (2^16 rows)
+MAX_TABLE_INPUTS = 16
+
+_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=None)
+def row_masks(k):
+    """
+    For every regulator position, the rows where it is 1 and where it is 0
+
+    Returns:
+    --------
+    tuple : (mask of all rows, tuple of one-masks, tuple of zero-masks)
+    """
+    full = (1 << (1 << k)) - 1
+    ones = []
+    for j in range(k):
+        # Rows with bit j set form runs of 2^j ones every 2^(j+1) rows
+        block = ((1 << (1 << j)) - 1) << (1 << j)
+        mask, width = block, 1 << (j + 1)
+        while width < (1 << k):
+            mask |= mask << width
+            width *= 2
+        ones.append(mask & full)
+    return full, tuple(ones), tuple(full & ~m for m in ones)
+
+
+def _canonical(rule, position):
+    """Local form of a rule: variables renumbered by position, commutative operands sorted"""
+    op, arg = rule
+    if op == 'const':
+        return ('const', bool(arg))
+    if op == 'var':
+        return ('var', position[arg])
+    if op == 'not':
+        return ('not', _canonical(arg, position))
+    return (op, tuple(sorted((_canonical(a, position) for a in arg), key=repr)))
+
+
+def _tabulate(rule, columns, full):
+    """Evaluate a local rule over int bitmasks of the rows, one column per position"""
+    op, arg = rule
+    if op == 'const':
+        return full if arg else 0
+    if op == 'var':
+        return columns[arg]
+    if op == 'not':
+        return full ^ _tabulate(arg, columns, full)
+    values = [_tabulate(a, columns, full) for a in arg]
+    if op == 'and':
+        result = full
+        for value in values:
+            result &= value
+    elif op == 'or':
+        result = 0
+        for value in values:
+            result |= value
+    else:
+        result = 0
+        for value in values:
+            result ^= value
+    return result
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _local_table(key, k):
+    full, ones, _ = row_masks(k)
+    return _tabulate(key, ones, full)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _local_primes(key, k, value):
+    table = _local_table(key, k)
+    if not value:
+        table ^= row_masks(k)[0]
+    return _quine_mccluskey(table, k)
+
+
+def _quine_mccluskey(table, k):
+    """
+    Prime implicants of a truth table
+
+    Returns:
+    --------
+    tuple : Sorted (care mask, values) pairs over the regulator positions
+    """
+    full_care = (1 << k) - 1
+    current = {(full_care, row) for row in range(1 << k) if (table >> row) & 1}
+    primes = set()
+    while current:
+        merged = set()
+        used = set()
+        # Implicants can only merge with another of the same care mask
+        by_care = {}
+        for care, values in current:
+            by_care.setdefault(care, set()).add(values)
+        for care, group in by_care.items():
+            for values in group:
+                for j in range(k):
+                    bit = 1 << j
+                    if care & bit and not values & bit and values | bit in group:
+                        merged.add((care & ~bit, values))
+                        used.add((care, values))
+                        used.add((care, values | bit))
+        primes |= current - used
+        current = merged
+    return tuple(sorted(primes))
+
+
+class RuleTable:
+    """
+    Truth table of one rule over its sorted regulators
+
+    Attributes:
+    -----------
+    regs : tuple of int
+        Sorted node indices the rule depends on
+    key : tuple
+        Canonical local form of the rule, shared by equal rules
+    table : int
+        Output bitmask over the 2^k rows of the regulators
+    """
+
+    __slots__ = ('regs', 'key', 'table', 'k')
+
+    def __init__(self, regs, key, table):
+        self.regs = regs
+        self.key = key
+        self.table = table
+        self.k = len(regs)
+
+    def __repr__(self):
+        return f"RuleTable({self.k} regulators, table={self.table:#x})"
+
+    def row(self, state):
+        """Row of a packed state"""
+        row = 0
+        for j, r in enumerate(self.regs):
+            row |= ((state >> r) & 1) << j
+        return row
+
+    def evaluate(self, state):
+        """Value of the rule in a packed state"""
+        return bool((self.table >> self.row(state)) & 1)
+
+    def partial(self, values):
+        """
+        Value of the rule under a partial assignment {index: bool}, or None if
+        the known regulators do not determine it
+        """
+        full, ones, zeros = row_masks(self.k)
+        compatible = full
+        for j, r in enumerate(self.regs):
+            value = values.get(r)
+            if value is not None:
+                compatible &= ones[j] if value else zeros[j]
+        on = self.table & compatible
+        if on == compatible:
+            return True
+        if not on:
+            return False
+        return None
+
+    def primes(self, value=True):
+        """
+        Prime implicants of the rule (value True) or of its negation (False)
+
+        Returns:
+        --------
+        list : One {node index: bool} dictionary per prime implicant
+        """
+        return [{r: bool((values >> j) & 1) for j, r in enumerate(self.regs) if (care >> j) & 1}
+                for care, values in _local_primes(self.key, self.k, bool(value))]
+
+
+class _UntabulatedRule:
+    """Fallback for rules with more than MAX_TABLE_INPUTS regulators"""
+
+    __slots__ = ('rule', 'regs', 'key', 'table', 'k')
+
+    def __init__(self, rule, regs):
+        self.rule = rule
+        self.regs = regs
+        self.key = None
+        self.table = None
+        self.k = len(regs)
+
+    def evaluate(self, state):
+        return bool(evaluate_partial(self.rule, {r: bool((state >> r) & 1) for r in self.regs}))
+
+    def partial(self, values):
+        return evaluate_partial(self.rule, values)
+
+    def primes(self, value=True):
+        raise ValueError(f"Rule has {self.k} regulators, more than {MAX_TABLE_INPUTS}; no prime implicants")
+
+
+def rule_table(rule, regulators=None):
+    """
+    Compiled truth table of a rule, cached by its canonical local form
+
+    Parameters:
+    -----------
+    rule : tuple
+        Rule in the nested tuple representation
+    regulators : tuple, optional
+        Sorted node indices of the rule (rule_variables(rule) if omitted)
+
+    Returns:
+    --------
+    RuleTable : The table; rules with more than MAX_TABLE_INPUTS regulators
+        get an untabulated stand-in with the same evaluate/partial interface
+    """
+    regs = tuple(regulators) if regulators is not None else rule_variables(rule)
+    if len(regs) > MAX_TABLE_INPUTS:
+        return _UntabulatedRule(rule, regs)
+    key = _canonical(rule, {r: j for j, r in enumerate(regs)})
+    return RuleTable(regs, key, _local_table(key, len(regs)))
+
+
+def prime_implicants(rule, value=True):
+    """Prime implicants of a rule (or of its negation) as {node index: bool} dictionaries"""
+    return rule_table(rule).primes(value)
+
+
+def cache_info():
+    """Hit and miss statistics of the table and prime implicant caches"""
+    return {'tables': _local_table.cache_info(), 'primes': _local_primes.cache_info()}
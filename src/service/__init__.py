@@ -0,0 +1 @@
+# This file can be empty
\ No newline at end of file
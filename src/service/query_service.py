@@ -0,0 +1,415 @@
+"""
+Perturbation Query Service
+
+This module answers ad-hoc perturbation and attractor questions about the
+ERBB models ("what does AKT1=OFF + MEK1=OFF do in the refined model?")
+without re-running a notebook:
+
+- The models of ERBB_Boolean are compiled once at start-up and kept warm
+- Answers are served from an in-memory LRU of encoded responses, backed by the
+  on-disk result cache, so repeated questions cost a dictionary lookup
+- Concurrent identical requests are coalesced into a single computation
+- A small asyncio HTTP/1.1 server (keep-alive, JSON) exposes the queries;
+  the ``query`` command answers one question on the command line with the
+  same code path, for scripts and tests
+
+Endpoints:
+    GET /health, GET /models, GET /stats
+    GET /perturbation?model=refined&perturbation=AKT1=OFF,MEK1=OFF
+    GET /attractors?model=refined&perturbation=ERBB2=OFF
+    (POST with a JSON body of the same parameters works too)
+
+Usage:
+    python -m src.service.query_service serve [--port 8765]
+    python -m src.service.query_service query perturbation --model refined --perturbation "AKT1=OFF+MEK1=OFF"
+
+Functions:
+    parse_perturbation: Parse a perturbation such as "AKT1=OFF+MEK1=OFF"
+    load_models: Compile the ERBB models (or .cbn files) for the service
+    QueryService: Warm models, response LRU, request coalescing
+    serve: Run the HTTP server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.models.model_file import load_model_file
+from src.models.reduction import reduce_model
+from src.analysis.fixed_points import fixed_points
+from src.analysis.state_space import successor_table, find_cycles
+from src.utils.cache import get_cache, model_fingerprint
+from src.utils.instrumentation import count, span
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_DIR, 'cache')
+
+# Encoded responses kept in memory
+DEFAULT_LRU_SIZE = 4096
+
+# Markers whose activity decides whether a perturbation allows the cell cycle
+CELL_CYCLE_MARKERS = ['CDK2', 'CDK4', 'CDK6', 'pRB']
+
+# Largest reduced network whose synchronous state space is searched for cycles
+MAX_CYCLE_NODES = 22
+
+_VALUES = {'off': False, '0': False, 'false': False, 'ko': False,
+           'on': True, '1': True, 'true': True, 'oe': True}
+
+
+class QueryError(ValueError):
+    """A query that cannot be answered (unknown model, node or value); reported as HTTP 400"""
+
+
+def parse_perturbation(text):
+    """
+    Parse a perturbation written as text or JSON
+
+    Parameters:
+    -----------
+    text : str, dict or None
+        "AKT1=OFF+MEK1=OFF", "AKT1=0, MEK1=0", "ERBB2" (a knockout) or
+        {"AKT1": false}; empty for the unperturbed model
+
+    Returns:
+    --------
+    dict : {node name: bool}
+    """
+    if not text:
+        return {}
+    if isinstance(text, dict):
+        items = text.items()
+    else:
+        # '+' arrives as a space once a query string is decoded
+        items = [part.split('=', 1) if '=' in part else (part, 'off')
+                 for part in re.split(r'[+,;\s]+', str(text).strip()) if part]
+    overrides = {}
+    for node, value in items:
+        if isinstance(value, bool):
+            overrides[str(node)] = value
+            continue
+        key = str(value).strip().lower()
+        if key not in _VALUES:
+            raise QueryError(f"Unknown value '{value}' for {node}, expected ON or OFF")
+        overrides[str(node).strip()] = _VALUES[key]
+    return overrides
+
+
+def load_models(paths=None):
+    """
+    Compile the models served by the query service
+
+    Parameters:
+    -----------
+    paths : dict, optional
+        {name: path of a .cbn file}; the models of ERBB_Boolean (falling back
+        to data/models/ERBB_<name>_model.cbn) by default
+
+    Returns:
+    --------
+    dict : {name: CompiledModel}
+    """
+    if paths:
+        return {name: load_model_file(path) for name, path in paths.items()}
+    from src.models.ERBB_Boolean import MODEL_BUILDERS, get_model
+    from src.models.compiled import compile_model
+    models = {}
+    for name in MODEL_BUILDERS:
+        try:
+            compiled = compile_model(get_model(name))
+        except Exception as e:
+            print(f"Could not build model '{name}': {str(e)}")
+            compiled = None
+        if compiled is None or not compiled.n:
+            compiled = load_model_file(os.path.join(PROJECT_DIR, 'data', 'models', f'ERBB_{name}_model.cbn'))
+        models[name] = compiled
+    return models
+
+
+def _state_dicts(compiled, codes):
+    return [{node: (code >> i) & 1 for i, node in enumerate(compiled.nodes)} for code in codes]
+
+
+def perturbation_answer(compiled, overrides, markers=CELL_CYCLE_MARKERS):
+    """Stable states of a perturbed model and whether they allow cell cycle progression"""
+    states = fixed_points(compiled, overrides)
+    present = [m for m in markers if m in compiled.index]
+    mask = compiled.clamp({m: True for m in present})[0]
+    active = sum(bin(s & mask).count('1') for s in states)
+    return {
+        'stable_state_count': len(states),
+        'stable_states': _state_dicts(compiled, states),
+        'allows_cell_cycle': any(s & mask for s in states),
+        'cell_cycle_activity': active / len(states) / len(present) * 100 if states and present else 0.0
+    }
+
+
+def attractor_answer(compiled, overrides):
+    """Stable states and synchronous cycles of a perturbed model"""
+    states = fixed_points(compiled, overrides)
+    reduced = reduce_model(compiled, overrides)
+    if reduced.compiled.n > MAX_CYCLE_NODES:
+        cycles = None
+    else:
+        cycles = [_state_dicts(compiled, reduced.lift(c))
+                  for c in find_cycles(successor_table(reduced.compiled)) if len(c) > 1]
+    return {
+        'stable_state_count': len(states),
+        'stable_states': _state_dicts(compiled, states),
+        'cycle_count': None if cycles is None else len(cycles),
+        'cycles': cycles
+    }
+
+
+QUERIES = {'perturbation': perturbation_answer, 'attractors': attractor_answer}
+
+
+class QueryService:
+    """
+    Answers queries on warm models with an LRU, the disk cache and request coalescing
+
+    Parameters:
+    -----------
+    models : dict
+        {name: CompiledModel}
+    cache_dir : str, optional
+        Directory of the on-disk result cache; None keeps answers in memory only
+    lru_size : int
+        Number of encoded responses kept in memory
+    """
+
+    def __init__(self, models, cache_dir=DEFAULT_CACHE_DIR, lru_size=DEFAULT_LRU_SIZE):
+        self.models = dict(models)
+        self.fingerprints = {name: model_fingerprint(m) for name, m in self.models.items()}
+        self.cache = get_cache(cache_dir) if cache_dir else None
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._pending = {}
+        self.stats = {'requests': 0, 'lru_hits': 0, 'disk_hits': 0, 'computed': 0, 'coalesced': 0}
+
+    def _normalize(self, kind, params):
+        """Validate a query; returns (model name, overrides, memory key)"""
+        if kind not in QUERIES:
+            raise QueryError(f"Unknown query '{kind}', expected one of {sorted(QUERIES)}")
+        name = params.get('model', 'refined')
+        if name not in self.models:
+            raise QueryError(f"Unknown model '{name}', expected one of {sorted(self.models)}")
+        overrides = parse_perturbation(params.get('perturbation'))
+        unknown = [node for node in overrides if node not in self.models[name].index]
+        if unknown:
+            raise QueryError(f"Unknown nodes in model '{name}': {', '.join(unknown)}")
+        return name, overrides, (kind, self.fingerprints[name], tuple(sorted(overrides.items())))
+
+    def _compute(self, kind, name, overrides):
+        """Answer from the disk cache or by running the analysis; returns the encoded response"""
+        compiled = self.models[name]
+        disk_key = None
+        answer = None
+        if self.cache is not None:
+            disk_key = self.cache.key(compiled, f'service_{kind}', perturbation=sorted(overrides.items()))
+            answer = self.cache.get(disk_key)
+        if answer is not None:
+            self.stats['disk_hits'] += 1
+        else:
+            with span(f'service.{kind}'):
+                answer = QUERIES[kind](compiled, overrides)
+            self.stats['computed'] += 1
+            if disk_key is not None:
+                try:
+                    self.cache.put(disk_key, answer)
+                except OSError as e:
+                    print(f"Could not cache answer: {str(e)}")
+        label = ' + '.join(f"{node}={'ON' if value else 'OFF'}" for node, value in overrides.items())
+        response = dict(model=name, perturbation=overrides, label=label or 'None (Wild-type)', **answer)
+        return json.dumps(response).encode()
+
+    def _remember(self, key, body):
+        self._lru[key] = body
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def query(self, kind, params):
+        """
+        Answer a query, coalescing it with an identical one in flight
+
+        Returns:
+        --------
+        bytes : The JSON response
+        """
+        self.stats['requests'] += 1
+        count('service.requests')
+        name, overrides, key = self._normalize(kind, params)
+        body = self._lru.get(key)
+        if body is not None:
+            self._lru.move_to_end(key)
+            self.stats['lru_hits'] += 1
+            return body
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self._compute, kind, name, overrides)
+        self._pending[key] = future
+        try:
+            body = await future
+        finally:
+            del self._pending[key]
+        self._remember(key, body)
+        return body
+
+    def query_sync(self, kind, params):
+        """Answer one query outside of an event loop"""
+        return asyncio.run(self.query(kind, params))
+
+    def describe(self):
+        """Served models with their nodes"""
+        return {name: list(m.nodes) for name, m in self.models.items()}
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+def _response(status, body, keep_alive):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _dispatch(service, method, target, body):
+    """Route one request; returns (status, body)"""
+    url = urlsplit(target)
+    path = url.path.rstrip('/') or '/'
+    if method not in ('GET', 'POST'):
+        return 405, {'error': f"Method {method} not allowed"}
+    if path == '/health':
+        return 200, {'status': 'ok'}
+    if path == '/models':
+        return 200, service.describe()
+    if path == '/stats':
+        return 200, dict(service.stats, lru_entries=len(service._lru))
+    kind = path.lstrip('/')
+    if kind not in QUERIES:
+        return 404, {'error': f"Unknown path {path}"}
+    params = dict(parse_qsl(url.query))
+    if method == 'POST' and body:
+        try:
+            params.update(json.loads(body))
+        except json.JSONDecodeError as e:
+            return 400, {'error': f"Invalid JSON body: {str(e)}"}
+    try:
+        return 200, await service.query(kind, params)
+    except QueryError as e:
+        return 400, {'error': str(e)}
+
+
+async def _handle_connection(service, reader, writer):
+    """Serve the requests of one keep-alive connection"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                writer.write(_response(400, {'error': 'Malformed request line'}, False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    field, value = line.split(':', 1)
+                    headers[field.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+            keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+            try:
+                status, payload = await _dispatch(service, method, target, body)
+            except Exception as e:
+                print(f"Error answering {method} {target}: {str(e)}")
+                status, payload = 500, {'error': str(e)}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+    """
+    Run the HTTP server until cancelled
+
+    Parameters:
+    -----------
+    service : QueryService
+        The service answering the queries
+    host, port : str, int
+        Address to listen on (port 0 picks a free port)
+    ready : asyncio.Event, optional
+        Set once the server is listening; the bound port is in ``service.port``
+    """
+    server = await asyncio.start_server(lambda r, w: _handle_connection(service, r, w), host, port)
+    service.port = server.sockets[0].getsockname()[1]
+    print(f"Serving {', '.join(service.models)} on http://{host}:{service.port}")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Answer perturbation and attractor queries on the ERBB models')
+    parser.add_argument('--model-file', action='append', default=[], metavar='NAME=PATH',
+                        help='Serve a .cbn model under a name (the ERBB models by default)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='On-disk result cache ("" to disable)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    server = commands.add_parser('serve', help='Run the HTTP server')
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=DEFAULT_PORT)
+    query = commands.add_parser('query', help='Answer one query and print the JSON response')
+    query.add_argument('kind', choices=sorted(QUERIES))
+    query.add_argument('--model', default='refined')
+    query.add_argument('--perturbation', default='', help='e.g. "AKT1=OFF+MEK1=OFF"')
+    args = parser.parse_args(argv)
+
+    paths = dict(item.split('=', 1) for item in args.model_file)
+    service = QueryService(load_models(paths), cache_dir=args.cache_dir or None)
+    if args.command == 'query':
+        start = time.perf_counter()
+        try:
+            body = service.query_sync(args.kind, {'model': args.model, 'perturbation': args.perturbation})
+        except QueryError as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 1
+        print(json.dumps(json.loads(body), indent=2))
+        print(f"Answered in {(time.perf_counter() - start) * 1e3:.1f} ms", file=sys.stderr)
+        return 0
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
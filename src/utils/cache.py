@@ -0,0 +1,207 @@
+"""
+Content-addressed result cache
+
+Results are stored under a key derived from a canonical serialization of the
+model rules (``model.desc``), the kind of analysis and its parameters, so two
+models that differ in a single rule, or a model and its knockouts, never share
+an entry. Writes are atomic (temporary file + rename), every entry carries a
+format version, and the directory is kept under a byte budget by evicting the
+least recently used entries.
+
+Functions:
+    model_fingerprint: Canonical hash of the rules of a model
+    file_fingerprint: Hash of the contents of a file
+    get_cache: Shared ResultCache instance for a directory
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from src.models.compiled import CompiledModel, compile_model, render_rule
+from src.utils.instrumentation import count, span
+
+# Bump when the layout of cached results changes; older entries are ignored
+CACHE_FORMAT_VERSION = 3
+
+# Default byte budget of a cache directory, overridable with ERBB_CACHE_MAX_BYTES
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def model_fingerprint(model):
+    """
+    Canonical SHA-256 of the rules of a model
+
+    Nodes are sorted by name and rules are rendered from the compiled form, so
+    the fingerprint does not depend on insertion order or on whether a knockout
+    was written as ``False`` or ``sympy.false``.
+
+    Parameters:
+    -----------
+    model : BooN model or CompiledModel
+        The Boolean network model
+
+    Returns:
+    --------
+    str : Hexadecimal digest
+    """
+    compiled = model if isinstance(model, CompiledModel) else compile_model(model)
+    lines = sorted(f"{name}={render_rule(rule, compiled.nodes)}"
+                   for name, rule in zip(compiled.nodes, compiled.rules))
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """SHA-256 of the contents of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Directory of pickled analysis results with LRU eviction
+
+    Parameters:
+    -----------
+    cache_dir : str
+        Directory holding the cache files
+    max_bytes : int, optional
+        Byte budget of the directory; least recently used entries are removed
+        when a write exceeds it
+    """
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('ERBB_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, model, kind, **params):
+        """Cache key of an analysis of a model with the given parameters"""
+        payload = '|'.join([
+            str(CACHE_FORMAT_VERSION),
+            model_fingerprint(model),
+            kind,
+            repr(sorted(params.items()))
+        ])
+        return f"{kind}_{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def file_key(self, path, kind, **params):
+        """Cache key of an artefact derived from the contents of a file (e.g. an imported model)"""
+        payload = '|'.join([
+            str(CACHE_FORMAT_VERSION),
+            file_fingerprint(path),
+            kind,
+            repr(sorted(params.items()))
+        ])
+        return f"{kind}_{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def path(self, key):
+        """File holding a cache entry"""
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        """
+        Load a cached value, or return ``default`` on a miss
+
+        Unreadable entries and entries of another format version count as misses.
+        A hit refreshes the entry's modification time for LRU eviction.
+        """
+        path = self.path(key)
+        with span('cache.get'):
+            try:
+                with open(path, 'rb') as f:
+                    entry = pickle.load(f)
+            except FileNotFoundError:
+                return self._miss(default)
+            except (IOError, EOFError, pickle.PickleError, AttributeError, ImportError) as e:
+                print(f"Could not load cache entry {path}: {str(e)}")
+                return self._miss(default)
+
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_FORMAT_VERSION \
+                or entry.get('key') != key:
+            return self._miss(default)
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        count('cache.hits')
+        return entry['value']
+
+    def _miss(self, default):
+        self.misses += 1
+        count('cache.misses')
+        return default
+
+    def put(self, key, value):
+        """Atomically store a value, then evict old entries if over budget"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'version': CACHE_FORMAT_VERSION, 'key': key, 'value': value}
+        with span('cache.put'):
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp_', suffix='.pkl')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path(key))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.evict(keep=key)
+        count('cache.writes')
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the directory fits the budget"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pkl') or name.startswith('.tmp_'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every entry of the cache directory"""
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+
+_caches = {}
+
+
+def get_cache(cache_dir, max_bytes=None):
+    """Shared ResultCache for a directory, so hit/miss counters add up across calls"""
+    path = os.path.abspath(cache_dir)
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = ResultCache(cache_dir, max_bytes)
+    elif max_bytes is not None:
+        cache.max_bytes = max_bytes
+    return cache
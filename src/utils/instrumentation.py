@@ -0,0 +1,228 @@
+"""
+Instrumentation
+
+This module provides lightweight timing and counting across the analysis
+pipeline, so a slow run can be broken down into rule evaluation, solver,
+cache I/O and pandas conversion:
+
+- Named spans (span() around a block, timed() on a function); nested spans are recorded
+  under their path, e.g. ``attractors/stable_states/solver.fixed_points``
+- Counters such as cache hits and misses, solver calls and states evaluated
+- An optional cProfile hook that profiles everything between enable() and
+  disable()
+- Export of a run to JSON or CSV
+- When disabled (the default), span() returns a shared no-op context manager
+  and count() returns immediately; set ERBB_INSTRUMENT=1 to enable at import
+
+Spans and counters are per process: work done in screen worker processes is
+not recorded.
+
+Functions:
+    enable: Start recording (optionally with cProfile)
+    disable: Stop recording
+    reset: Drop everything recorded so far
+    span: Time a block under a name
+    timed: Decorator timing every call of a function under a name
+    count: Add to a named counter
+    report: Recorded spans and counters as a dictionary
+    export: Write the recorded spans and counters to a JSON or CSV file
+    profile_stats: cProfile statistics of the run as text
+"""
+
+import csv
+import functools
+import io
+import json
+import os
+import time
+
+
+class _Recorder:
+    """Process-wide store of spans and counters"""
+
+    def __init__(self):
+        self.enabled = False
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.spans = {}
+        self.counters = {}
+        self.stack = []
+        self.started = time.time()
+
+
+_recorder = _Recorder()
+
+
+class _NullSpan:
+    """Shared no-op span used while recording is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Context manager that adds its duration to the statistics of its path"""
+
+    __slots__ = ('name', 'path', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _recorder.stack.append(self.name)
+        self.path = '/'.join(_recorder.stack)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if _recorder.stack and _recorder.stack[-1] == self.name:
+            _recorder.stack.pop()
+        stats = _recorder.spans.get(self.path)
+        if stats is None:
+            _recorder.spans[self.path] = [1, elapsed, elapsed, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = min(stats[2], elapsed)
+            stats[3] = max(stats[3], elapsed)
+        return False
+
+
+def enabled():
+    """Whether spans and counters are being recorded"""
+    return _recorder.enabled
+
+
+def enable(profile=False):
+    """
+    Start recording spans and counters
+
+    Parameters:
+    -----------
+    profile : bool
+        Also run cProfile until disable() is called
+    """
+    _recorder.enabled = True
+    if profile and _recorder.profiler is None:
+        import cProfile
+        _recorder.profiler = cProfile.Profile()
+        _recorder.profiler.enable()
+
+
+def disable():
+    """Stop recording; what was recorded is kept until reset()"""
+    _recorder.enabled = False
+    if _recorder.profiler is not None:
+        _recorder.profiler.disable()
+
+
+def reset():
+    """Drop the recorded spans and counters, and restart the profile if one is running"""
+    _recorder.reset()
+    if _recorder.profiler is not None:
+        import cProfile
+        running = _recorder.enabled
+        _recorder.profiler.disable()
+        _recorder.profiler = cProfile.Profile()
+        if running:
+            _recorder.profiler.enable()
+
+
+def span(name):
+    """
+    Time a block: ``with span('solver.fixed_points'): ...``
+
+    Returns the shared no-op context manager while recording is disabled.
+    """
+    if not _recorder.enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function under a name; checks on every call whether recording is enabled"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Add a value to a named counter (no-op while disabled)"""
+    if _recorder.enabled:
+        _recorder.counters[name] = _recorder.counters.get(name, 0) + value
+
+
+def report():
+    """
+    Recorded spans and counters
+
+    Returns:
+    --------
+    dict : 'spans' (one dict per span path with calls, total_s, mean_s, min_s
+        and max_s, slowest first), 'counters' and 'wall_s' since the last reset
+    """
+    spans = [
+        {'name': path, 'calls': calls, 'total_s': total, 'mean_s': total / calls,
+         'min_s': low, 'max_s': high}
+        for path, (calls, total, low, high) in _recorder.spans.items()
+    ]
+    spans.sort(key=lambda s: s['total_s'], reverse=True)
+    return {
+        'spans': spans,
+        'counters': dict(sorted(_recorder.counters.items())),
+        'wall_s': time.time() - _recorder.started
+    }
+
+
+def export(filepath):
+    """
+    Write the recorded spans and counters of this run to a .json or .csv file
+
+    The CSV has one row per span (kind 'span') and per counter (kind 'counter').
+    """
+    data = report()
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if filepath.endswith('.json'):
+        with open(filepath, 'w') as f:
+            json.dump(data, f, indent=2)
+    else:
+        fields = ['kind', 'name', 'calls', 'total_s', 'mean_s', 'min_s', 'max_s', 'value']
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for s in data['spans']:
+                writer.writerow({'kind': 'span', **s})
+            for name, value in data['counters'].items():
+                writer.writerow({'kind': 'counter', 'name': name, 'value': value})
+    print(f"Instrumentation saved to {filepath}")
+
+
+def profile_stats(sort='cumulative', limit=30):
+    """cProfile statistics of the run as text, or None if profiling was not enabled"""
+    if _recorder.profiler is None:
+        return None
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(_recorder.profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+if os.environ.get('ERBB_INSTRUMENT', '').lower() in ('1', 'true', 'yes'):
+    enable(profile=os.environ.get('ERBB_INSTRUMENT_PROFILE', '').lower() in ('1', 'true', 'yes'))
@@ -4,20 +4,33 @@ import matplotlib.pyplot as plt
 import sys
 import pickle
 
+from src.models.model_file import MODEL_FILE_SUFFIX, load_model_file, read_boon, save_model_file
+from src.utils.results_store import read_results, write_results
+from src.utils.instrumentation import span
+
 sys.path.append(os.path.abspath('..'))
 
 # Define missing IO utility functions
 def save_model(model, filepath):
-    """Save a model to a file."""
+    """Save a model to a file; .cbn paths use the binary model format, other paths pickle the model."""
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'wb') as f:
-        pickle.dump(model, f)
+    with span('io.save_model'):
+        if filepath.endswith(MODEL_FILE_SUFFIX):
+            save_model_file(model, filepath)
+        else:
+            with open(filepath, 'wb') as f:
+                pickle.dump(model, f)
     print(f"Model saved to {filepath}")
     
 def load_model(filepath):
-    """Load a model from a file."""
-    with open(filepath, 'rb') as f:
-        return pickle.load(f)
+    """Load a model; .cbn files give a CompiledModel, .boon files the BooN model (unpickled safely), other pickles must be trusted."""
+    with span('io.load_model'):
+        if filepath.endswith(MODEL_FILE_SUFFIX):
+            return load_model_file(filepath)
+        if filepath.endswith('.boon'):
+            return read_boon(filepath)
+        with open(filepath, 'rb') as f:
+            return pickle.load(f)
     
 def save_visualization(figure, filepath):
     """Save a matplotlib figure to a file."""
@@ -26,7 +39,12 @@ def save_visualization(figure, filepath):
     print(f"Figure saved to {filepath}")
     
 def save_results(data, filepath):
-    """Save results to a CSV file."""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    data.to_csv(filepath, index=False)
-    print(f"Results saved to {filepath}")
\ No newline at end of file
+    """Save results to a CSV file; a 'states' column is stored bit-packed next to it."""
+    with span('io.save_results'):
+        write_results(data, filepath)
+    print(f"Results saved to {filepath}")
+
+def load_results(filepath):
+    """Load results saved with save_results, with the states of every row as a StateSet."""
+    with span('io.load_results'):
+        return read_results(filepath)
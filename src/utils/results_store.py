@@ -0,0 +1,260 @@
+"""
+Results Store
+
+This module stores tables of perturbation results whose rows carry sets of
+states (e.g. the stable states of every phenotype control perturbation)
+without writing the states as text:
+
+- The states of all rows are stacked into one bit-packed StateSet and saved
+  as ``<name>.states.npz`` next to the table
+- The table itself is saved as a small CSV index in which the states column
+  is replaced by the ``state_start`` and ``state_stop`` row range of every
+  row in the packed matrix
+- Reading loads the packed matrix once and hands every row a StateSet slice,
+  so large screens load without parsing any strings
+- Tables written before the store existed (states as dictionary reprs) are
+  still readable and can be rewritten in the new layout
+
+Functions:
+    states_path: Path of the packed states file of a results table
+    parse_legacy_states: Parse a states string of an old results table
+    write_results: Write a results table and its packed states
+    ResultsWriter: Write a results table row by row as results arrive
+    read_results: Read a results table with one StateSet per row
+    read_state_set: Read all packed states of a results table at once
+"""
+
+import csv
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.models.state_set import StateSet
+
+# Suffix of the packed states file, appended to the table name without .csv
+STATES_SUFFIX = '.states.npz'
+
+# One "name: value" pair of a dictionary repr such as "{EGF: False, ...}"
+_LEGACY_PAIR = re.compile(r"([A-Za-z_][\w.]*)\s*:\s*(True|False|1|0)\b")
+
+
+def states_path(filepath):
+    """Path of the packed states file that belongs to a results table"""
+    root, ext = os.path.splitext(filepath)
+    return (root if ext.lower() == '.csv' else filepath) + STATES_SUFFIX
+
+
+def parse_legacy_states(text, nodes=None):
+    """
+    Parse the states column of a results table written as dictionary reprs
+
+    Parameters:
+    -----------
+    text : str
+        Value such as "[{Cyclin_E1: True, EGF: False, ...}, {...}]"; empty or
+        missing values give an empty set
+    nodes : list, optional
+        Node order of the result (order of first appearance by default)
+
+    Returns:
+    --------
+    StateSet : The parsed states, in their original order
+    """
+    if not isinstance(text, str) or not text.strip():
+        return StateSet(nodes or ())
+    states = []
+    for chunk in text.split('}'):
+        pairs = _LEGACY_PAIR.findall(chunk)
+        if pairs:
+            states.append({name: value in ('True', '1') for name, value in pairs})
+    if nodes is None:
+        nodes = list(dict.fromkeys(name for state in states for name in state))
+    return StateSet.from_dicts(nodes, states)
+
+
+def _as_state_set(value, nodes):
+    """Convert the states of one row (StateSet, list of dicts, legacy string) to a StateSet"""
+    if isinstance(value, StateSet):
+        if value.nodes == tuple(nodes):
+            return value
+        return StateSet.from_matrix(nodes, value.to_dataframe().reindex(columns=nodes, fill_value=False))
+    if isinstance(value, str) or value is None or (isinstance(value, float) and np.isnan(value)):
+        return parse_legacy_states(value, nodes)
+    return StateSet.from_dicts(nodes, list(value))
+
+
+def _node_order(values):
+    """Node order of a states column: that of the first StateSet, else order of first appearance"""
+    names = {}
+    for value in values:
+        if isinstance(value, StateSet):
+            return list(value.nodes)
+        if isinstance(value, str):
+            names.update(dict.fromkeys(parse_legacy_states(value).nodes))
+        elif isinstance(value, (list, tuple)):
+            for state in value:
+                names.update(dict.fromkeys(str(k) for k in state))
+    return list(names)
+
+
+def write_results(data, filepath, states_column='states', nodes=None):
+    """
+    Write a results table and the packed states of its rows
+
+    Parameters:
+    -----------
+    data : pandas DataFrame or list of dict
+        Results with one row per perturbation; the states column may hold
+        StateSets, lists of state dictionaries or legacy strings
+    filepath : str
+        Path of the CSV index (the states go to ``states_path(filepath)``)
+    states_column : str
+        Name of the column holding the states
+    nodes : list, optional
+        Node order of the packed states (inferred from the column by default)
+
+    Returns:
+    --------
+    pandas DataFrame : The index table that was written
+    """
+    data = pd.DataFrame(data)
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if states_column not in data.columns:
+        data.to_csv(filepath, index=False)
+        return data
+
+    values = data[states_column].tolist()
+    nodes = [str(n) for n in nodes] if nodes is not None else _node_order(values)
+    sets = [_as_state_set(v, nodes) for v in values]
+    stops = np.cumsum([len(s) for s in sets], dtype=np.int64)
+    starts = stops - np.array([len(s) for s in sets], dtype=np.int64)
+
+    packed = StateSet.concat(sets) if sets else StateSet(nodes)
+    np.savez(states_path(filepath), words=packed.words, nodes=np.array(packed.nodes, dtype=str))
+
+    index = data.drop(columns=[states_column])
+    index['state_start'] = starts
+    index['state_stop'] = stops
+    index.to_csv(filepath, index=False)
+    return index
+
+
+class ResultsWriter:
+    """
+    Write a results table row by row, in the layout of write_results
+
+    Every row is appended to the CSV index and flushed as soon as it is
+    written, so a long screen can be followed (or resumed by hand) while it
+    runs; the packed states file is written by close().
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the CSV index
+    nodes : list
+        Node order of the packed states
+    columns : list
+        Columns of the table other than the states column
+    states_column : str
+        Key of the states in every row
+    """
+
+    def __init__(self, filepath, nodes, columns, states_column='states'):
+        self.filepath = filepath
+        self.nodes = [str(n) for n in nodes]
+        self.columns = list(columns)
+        self.states_column = states_column
+        self._sets = []
+        self._stop = 0
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(filepath, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns + ['state_start', 'state_stop'])
+
+    def write(self, row):
+        """
+        Append one row; its states may be a StateSet, packed codes or state dictionaries
+        """
+        states = row.get(self.states_column)
+        if states is None:
+            states = StateSet(self.nodes)
+        elif not isinstance(states, StateSet) and len(states) and not isinstance(states[0], dict):
+            states = StateSet.from_codes(self.nodes, states)
+        else:
+            states = _as_state_set(states, self.nodes)
+        start = self._stop
+        self._stop += len(states)
+        self._sets.append(states)
+        self._writer.writerow([row.get(c) for c in self.columns] + [start, self._stop])
+        self._file.flush()
+
+    def close(self):
+        """Write the packed states of all rows and close the index"""
+        if self._file.closed:
+            return
+        self._file.close()
+        packed = StateSet.concat(self._sets) if self._sets else StateSet(self.nodes)
+        np.savez(states_path(self.filepath), words=packed.words, nodes=np.array(packed.nodes, dtype=str))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_state_set(filepath):
+    """
+    Read the packed states of a results table at once
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the CSV index
+
+    Returns:
+    --------
+    tuple : (StateSet of the states of all rows, index DataFrame with the
+        state_start and state_stop row range of every row)
+    """
+    index = pd.read_csv(filepath)
+    with np.load(states_path(filepath)) as packed:
+        states = StateSet([str(n) for n in packed['nodes']], packed['words'])
+    return states, index
+
+
+def read_results(filepath, states_column='states'):
+    """
+    Read a results table with the states of every row as a StateSet
+
+    Tables written by write_results are read from their packed states; older
+    tables with the states as dictionary reprs are parsed.
+
+    Parameters:
+    -----------
+    filepath : str
+        Path of the CSV table
+    states_column : str
+        Name of the column to put the states in
+
+    Returns:
+    --------
+    pandas DataFrame : The table, with one StateSet per row in the states column
+    """
+    if not os.path.exists(states_path(filepath)):
+        data = pd.read_csv(filepath)
+        if states_column in data.columns:
+            values = data[states_column].tolist()
+            nodes = _node_order(values)
+            data[states_column] = [parse_legacy_states(v, nodes) for v in values]
+        return data
+
+    states, data = read_state_set(filepath)
+    data[states_column] = [states[int(a):int(b)] for a, b in zip(data['state_start'], data['state_stop'])]
+    return data.drop(columns=['state_start', 'state_stop'])